@@ -0,0 +1,62 @@
+"""Time evaluating posting amounts with util.eval_amount (a fast path
+for plain numbers, cached evaluation for expressions) against how
+get_ledger_posting used to: re.sub, then ast.parse for every amount"""
+
+import ast
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.realpath(os.path.dirname(__file__) + "/.."))
+
+from ledgerbil import util  # isort:skip # noqa: E402
+
+COUNT = 200_000
+EXPRESSIONS = 100  # different ones, turning up over and over
+REPEAT = 3
+
+
+def get_plain_amounts(rand):
+    return [f"${rand.randint(-999999, 999999) / 100:,.2f}" for _ in range(COUNT)]
+
+
+def get_expression_amounts(rand):
+    expressions = [
+        f"(${rand.randint(1, 200)} + ${rand.randint(1, 100)})"
+        for _ in range(EXPRESSIONS)
+    ]
+    return [rand.choice(expressions) for _ in range(COUNT)]
+
+
+def parse_every_time(amount):
+    number = re.sub(r"[$,]", "", amount)
+    return util.to_units(util._eval(ast.parse(number, mode="eval").body))
+
+
+def eval_amount(amount):
+    return util.eval_amount(amount)
+
+
+def main():
+    rand = random.Random(1)
+    for label, amounts in [
+        ("plain", get_plain_amounts(rand)),
+        ("expression", get_expression_amounts(rand)),
+    ]:
+        assert [eval_amount(a) for a in amounts] == [
+            parse_every_time(a) for a in amounts
+        ]
+        for func in [parse_every_time, eval_amount]:
+
+            def evaluate():
+                util.eval_expr.cache_clear()  # start cold, like a new process
+                return [func(a) for a in amounts]
+
+            seconds = min(timeit.repeat(evaluate, number=1, repeat=REPEAT))
+            print(f"{COUNT:,} {label:10} amounts, {func.__name__:16} {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Time amounts as integer units (util.AMOUNT_SCALE) against floats and
+Decimals: parsing, summing and comparing a million posting amounts, and
+how far off the float total ends up"""
+
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.realpath(os.path.dirname(__file__) + "/.."))
+
+from ledgerbil import util  # isort:skip # noqa: E402
+
+COUNT = 1_000_000
+REPEAT = 3
+
+
+def get_amount_strings():
+    rand = random.Random(1)
+    return [f"{rand.randint(-99999, 99999) / 100:.2f}" for _ in range(COUNT)]
+
+
+def add_up(amounts):
+    # one at a time, the way postings are totaled
+    total = 0
+    for amount in amounts:
+        total += amount
+    return total
+
+
+def best_time(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT))
+
+
+def main():
+    strings = get_amount_strings()
+    floats = [util.get_float(s) for s in strings]
+    units = [util.parse_units(s) for s in strings]
+    decimals = [Decimal(s) for s in strings]
+
+    print(f"{COUNT:,} amounts")
+    for label, func in [
+        ("parse: util.get_float", lambda: [util.get_float(s) for s in strings]),
+        ("parse: util.parse_units", lambda: [util.parse_units(s) for s in strings]),
+        ("parse: Decimal", lambda: [Decimal(s) for s in strings]),
+        ("sum: floats", lambda: add_up(floats)),
+        ("sum: units", lambda: add_up(units)),
+        ("sum: Decimals", lambda: add_up(decimals)),
+        ("compare: floats", lambda: [f == 12.34 for f in floats]),
+        ("compare: units", lambda: [u == 12_340_000 for u in units]),
+        ("compare: Decimals", lambda: [d == Decimal("12.34") for d in decimals]),
+    ]:
+        print(f"{label:28} {best_time(func):.3f}s")
+
+    exact = add_up(decimals)
+    assert Decimal(add_up(units)) / util.AMOUNT_SCALE == exact
+    print(f"float total off by {abs(Decimal(add_up(floats)) - exact):.2e}")
+
+
+if __name__ == "__main__":
+    main()
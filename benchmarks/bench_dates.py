@@ -0,0 +1,69 @@
+"""Time parsing transaction dates: strptime, as util.get_date used to,
+against the compiled fixed width parser on its own and behind get_date's
+cache (journals repeat the same dates heavily)"""
+
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.realpath(os.path.dirname(__file__) + "/.."))
+
+from ledgerbil import settings_getter, util  # isort:skip # noqa: E402
+
+COUNT = 100_000
+DAYS = 3650  # about ten years of dates, each turning up many times over
+REPEAT = 5
+DATE_FORMAT = "%Y/%m/%d"
+
+
+def get_date_strings():
+    rand = random.Random(13)
+    start = date(2015, 1, 1).toordinal()
+    return [
+        date.fromordinal(start + rand.randrange(DAYS)).strftime(DATE_FORMAT)
+        for _ in range(COUNT)
+    ]
+
+
+def parse_with_strptime(date_strings):
+    return [datetime.strptime(d, DATE_FORMAT).date() for d in date_strings]
+
+
+def parse_with_parser(date_strings):
+    parser = util.get_date_parser(DATE_FORMAT)
+    return [parser(d) for d in date_strings]
+
+
+def parse_with_get_date(date_strings):
+    util.parse_date_string.cache_clear()  # start cold, like a new process
+    return [util.get_date(d) for d in date_strings]
+
+
+def check_with_is_valid_date(date_strings):
+    util.parse_date_string.cache_clear()
+    return [util.is_valid_date(d) for d in date_strings]
+
+
+def main():
+    date_strings = get_date_strings()
+    expected = parse_with_strptime(date_strings)
+    assert parse_with_parser(date_strings) == expected
+    print(f"{COUNT:,} dates, {len(set(date_strings)):,} different")
+    with settings_getter.override_settings(DATE_FORMAT=DATE_FORMAT):
+        assert parse_with_get_date(date_strings) == expected
+        for label, func in [
+            ("strptime", parse_with_strptime),
+            ("fixed width parser, uncached", parse_with_parser),
+            ("util.get_date", parse_with_get_date),
+            ("util.is_valid_date", check_with_is_valid_date),
+        ]:
+            seconds = min(
+                timeit.repeat(lambda: func(date_strings), number=1, repeat=REPEAT)
+            )
+            print(f"{label:32} {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""account balances in dollars and shares, worked out in-process from
+journal postings (see journal.py) rather than read from ledger's output
+
+Dollars are plain dollar amounts; shares are kept by symbol, as ledger
+shows them with --exchange ., and can be valued with prices.py.
+"""
+
+from collections import defaultdict, namedtuple
+
+Balance = namedtuple("Balance", "dollars shares")  # units, {symbol: units}
+TreeLine = namedtuple("TreeLine", "account depth dollars shares is_leaf")
+
+ACCOUNT_SEPARATOR = ":"
+
+
+def get_balances(postings, matches=None, end_ordinal=None, status=None):
+    """{account: Balance} for postings before end_ordinal (if given) with
+    the status (if given) and matches(account, payee) (if given)"""
+    dollars = defaultdict(int)
+    shares = defaultdict(lambda: defaultdict(int))
+    accounts = {}  # (dicts are ordered: in order first seen)
+    for posting in postings:
+        if end_ordinal is not None and posting.date_ordinal >= end_ordinal:
+            break  # postings are sorted by date
+        if status is not None and posting.status != status:
+            continue
+        if matches and not matches(posting.account, posting.payee):
+            continue
+
+        accounts[posting.account] = True
+        if posting.shares is None:
+            dollars[posting.account] += posting.amount
+        else:
+            shares[posting.account][posting.symbol] += posting.shares
+
+    return {
+        account: Balance(dollars[account], get_nonzero(shares[account]))
+        for account in accounts
+    }
+
+
+def get_nonzero(shares):
+    return {symbol: units for symbol, units in shares.items() if units != 0}
+
+
+class AccountNode:
+    """An account in the tree: its own balance, if it has postings, and
+    totals for it and everything under it"""
+
+    __slots__ = ("name", "children", "has_postings", "dollars", "shares", "display")
+
+    def __init__(self, name):
+        self.name = name
+        self.children = {}
+        self.has_postings = False
+        self.dollars = 0
+        self.shares = defaultdict(int)
+        self.display = False
+
+    def is_zero(self):
+        return self.dollars == 0 and not any(self.shares.values())
+
+
+def get_tree_lines(balances):
+    """TreeLines for the accounts as ledger's balance report shows them:
+    sorted by name, with subaccounts indented under their parents, and
+    parents with only one subaccount to show folded in with it, e.g.
+    "ira: glass idx"; accounts that add up to nothing are left out"""
+    root = get_tree(balances)
+    mark_display(root)
+
+    lines = []
+    for child in get_sorted_children(root):
+        add_lines(lines, child, names=[], depth=0)
+    return lines
+
+
+def get_tree(balances):
+    root = AccountNode("")
+    for account, balance in balances.items():
+        node = root
+        nodes = [root]
+        for name in account.split(ACCOUNT_SEPARATOR):
+            node = node.children.setdefault(name, AccountNode(name))
+            nodes.append(node)
+        node.has_postings = True
+
+        for node in nodes:
+            node.dollars += balance.dollars
+            for symbol, units in balance.shares.items():
+                node.shares[symbol] += units
+
+    return root
+
+
+def mark_display(node):
+    """Which accounts to show, the way ledger decides for its balance tree
+    (see format_accounts::mark_accounts): accounts with more than one
+    subaccount shown are, as are other accounts with a balance, unless
+    they're only there to hold a single subaccount"""
+    children_shown = sum(1 for child in node.children.values() if mark_display(child))
+    if node.name and (
+        children_shown > 1
+        or ((children_shown != 1 or node.has_postings) and not node.is_zero())
+    ):
+        node.display = True
+    return node.display or children_shown > 0
+
+
+def add_lines(lines, node, names, depth):
+    names = names + [node.name]
+    if node.display:
+        position = len(lines)
+        lines.append(None)  # filled in once we know if it's a leaf
+        for child in get_sorted_children(node):
+            add_lines(lines, child, names=[], depth=depth + 1)
+        lines[position] = TreeLine(
+            ACCOUNT_SEPARATOR.join(names),
+            depth,
+            node.dollars,
+            get_nonzero(node.shares),
+            is_leaf=len(lines) == position + 1,
+        )
+    else:
+        for child in get_sorted_children(node):
+            add_lines(lines, child, names, depth)
+
+
+def get_sorted_children(node):
+    return [node.children[name] for name in sorted(node.children)]
@@ -0,0 +1,200 @@
+"""postings from ledger journal files, for reports worked out in-process
+
+This reads the files ledger would (settings.LEDGER_DIR and LEDGER_FILES)
+once, and gives back every posting with its account aliases expanded,
+transaction status applied, and elided amounts filled in, so that reports
+can be added up without running ledger once per period.
+
+Not handled: include directives, automated and periodic transactions
+(their postings are skipped), and lot prices/dates.
+"""
+
+import os
+import re
+from collections import defaultdict, namedtuple
+
+from .ledgerbilexceptions import LdgJournalError
+from .ledgerlexer import NOTE, POSTING, TRANSACTION, tokenize
+from .ledgerthing import REC_CLEARED, get_ledger_posting, get_payee
+from .settings_getter import get_settings
+
+DOLLARS = "$"
+VIRTUAL_CHARS = "()"  # unbalanced virtual accounts, e.g. (budget: food)
+BALANCED_VIRTUAL_CHARS = "[]"
+
+ACCOUNT_DIRECTIVE_REGEX = re.compile(r"^account\s+(.*?)\s*(?:;.*)?$")
+ALIAS_DIRECTIVE_REGEX = re.compile(r"^alias\s+([^=]*?)\s*=\s*(.*?)\s*$")
+SUB_ALIAS_REGEX = re.compile(r"^\s+alias\s+(.*?)\s*(?:;.*)?$")
+
+# amount is in dollars and shares of symbol, both in util.AMOUNT_SCALE
+# units; amount is None for shares without a price, and shares is None
+# for plain dollar amounts
+Posting = namedtuple(
+    "Posting", "date_ordinal payee account status amount shares symbol"
+)
+
+
+def get_journal_filenames():
+    settings = get_settings()
+    return [os.path.join(settings.LEDGER_DIR, f) for f in settings.LEDGER_FILES]
+
+
+def get_postings(filenames=None, may_match=None):
+    """All postings in the files, sorted by date (stable within a date);
+    if given may_match(top_line, lines), transactions it turns down are
+    skipped without reading their postings"""
+    aliases = {}
+    postings = []
+    for filename in filenames or get_journal_filenames():
+        postings.extend(read_postings(filename, aliases, may_match))
+
+    postings.sort(key=get_date_ordinal)
+    return postings
+
+
+def get_date_ordinal(posting):
+    return posting.date_ordinal
+
+
+def read_postings(filename, aliases, may_match=None):
+    """Postings from one file; aliases defined along the way are added to
+    aliases, and only apply to postings after them (as with ledger)"""
+    try:
+        with open(filename, encoding="utf-8") as the_file:
+            lines = [line.rstrip() for line in the_file]
+    except OSError as e:
+        raise LdgJournalError(f"Error reading ledger file: {e}")
+
+    postings = []
+    top_line = None  # of the transaction being read
+    transaction_lines = []
+    account = None  # of the account directive being read
+
+    for token in tokenize(lines):
+        if token.kind == NOTE:
+            continue
+        if token.kind == POSTING:
+            if top_line:
+                transaction_lines.append(token.line)
+            elif account:
+                add_sub_alias(aliases, account, token.line)
+            continue
+
+        if top_line:
+            if may_match is None or may_match(top_line, transaction_lines):
+                postings.extend(
+                    get_transaction_postings(top_line, transaction_lines, aliases)
+                )
+            top_line = None
+            transaction_lines = []
+        account = None
+
+        if token.kind == TRANSACTION:
+            top_line = token.top_line
+        elif token.line.startswith("account"):
+            m = ACCOUNT_DIRECTIVE_REGEX.match(token.line)
+            account = m.group(1) if m else None
+        elif token.line.startswith("alias"):
+            m = ALIAS_DIRECTIVE_REGEX.match(token.line)
+            if m:
+                aliases[m.group(1)] = m.group(2)
+
+    if top_line and (may_match is None or may_match(top_line, transaction_lines)):
+        postings.extend(get_transaction_postings(top_line, transaction_lines, aliases))
+
+    return postings
+
+
+def may_have_cleared(top_line, lines):
+    """For get_postings: whether any of a transaction's postings could be
+    cleared, which is much quicker to rule out than reading them"""
+    return top_line.status == REC_CLEARED or any(REC_CLEARED in line for line in lines)
+
+
+def add_sub_alias(aliases, account, line):
+    """e.g. an "alias e" line under "account expenses" """
+    m = SUB_ALIAS_REGEX.match(line)
+    if m:
+        aliases[m.group(1)] = account
+
+
+def get_account_name(account, aliases):
+    """Expand aliases the way ledger does: the whole account name, or
+    failing that its first part, e.g. "e" in "e: food" """
+    if account[0] in VIRTUAL_CHARS or account[0] in BALANCED_VIRTUAL_CHARS:
+        account = account[1:-1]
+
+    if account in aliases:
+        return aliases[account]
+
+    first, colon, rest = account.partition(":")
+    if colon and first in aliases:
+        return f"{aliases[first]}:{rest}"
+
+    return account
+
+
+def get_transaction_postings(top_line, lines, aliases):
+    date_ordinal = top_line.date.toordinal()
+    payee = get_payee(top_line.payee)
+    top_line_status = top_line.status or ""
+
+    postings = []
+    totals = defaultdict(int)  # symbol: amount, to work out elided amounts
+    elided = None
+
+    for line in lines:
+        ledger_posting = get_ledger_posting(line)
+        if not ledger_posting:
+            continue
+
+        account = get_account_name(ledger_posting.account, aliases)
+        status = ledger_posting.status or top_line_status
+        amount = ledger_posting.amount
+        shares = ledger_posting.shares
+
+        if amount is None and shares is None:
+            if elided:
+                raise LdgJournalError(
+                    "Only one posting with an elided amount is allowed "
+                    f"per transaction:\n{top_line_text(top_line)}\n{line}"
+                )
+            elided = (len(postings), account, status)
+            continue
+
+        if ledger_posting.account[0] not in VIRTUAL_CHARS:
+            if amount is None:
+                totals[ledger_posting.symbol] += shares
+            else:
+                totals[DOLLARS] += amount
+
+        postings.append(
+            Posting(
+                date_ordinal,
+                payee,
+                account,
+                status,
+                amount,
+                shares,
+                ledger_posting.symbol,
+            )
+        )
+
+    if elided:
+        # in its place, with an amount for each symbol left unbalanced
+        position, account, status = elided
+        postings[position:position] = [
+            (
+                Posting(date_ordinal, payee, account, status, -total, None, None)
+                if symbol == DOLLARS
+                else Posting(date_ordinal, payee, account, status, None, -total, symbol)
+            )
+            for symbol, total in totals.items()
+            if total != 0
+        ]
+
+    return postings
+
+
+def top_line_text(top_line):
+    return f"{top_line.date} {top_line.payee}"
@@ -1,11 +1,14 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from textwrap import dedent
 
-from .ledgerbilexceptions import LdgReconcilerError
+from .ledgerbilexceptions import ERROR_RETURN_VALUE, LdgReconcilerError
 from .ledgerfile import LedgerFile
+from .ledgerthing import get_account_matches
 from .reconciler import reconciled_status, run_reconciler
 from .scheduler import print_next_scheduled_date, run_scheduler
-from .util import handle_error
+from .util import assert_only_one_matching_account, handle_error
 
 
 def run_ledgerbil(args):
@@ -21,8 +24,39 @@ def run_ledgerbil(args):
     if not args.file:
         return handle_error("error: -f/--file is required")
 
+    if args.check_sorted:
+        return check_sorted(args.file)
+
+    if args.jobs < 1:
+        return handle_error("error: -j/--jobs must be at least 1")
+
+    if args.sort_run_size is not None and args.sort_run_size < 1:
+        return handle_error("error: --sort-run-size must be at least 1")
+
+    if args.sort_run_size is not None and not args.sort:
+        return handle_error("error: --sort-run-size requires -S/--sort")
+
+    filenames, other_filenames = args.file, []
+    if not args.reconcile and (args.jobs > 1 or args.sort_run_size):
+        # Files are handled start to finish one at a time, in worker
+        # processes if more than one job: sending parsed things back here
+        # costs a good part of parsing them, and an external sort never
+        # holds a whole file. The scheduler's file stays here.
+        keep = 1 if args.schedule else 0
+        filenames, other_filenames = args.file[:keep], args.file[keep:]
+
+    # When reconciling an account with literal text in its name, files
+    # are memory mapped and only things with that text in them are parsed
+    lazy = bool(args.reconcile) and get_account_matches(args.reconcile).literal
     try:
-        ledgerfiles = [LedgerFile(f, args.reconcile) for f in args.file]
+        if args.reconcile and not lazy and args.jobs > 1 and len(filenames) > 1:
+            # (lazy files are memory mapped here, and parse next to nothing)
+            ledgerfiles = load_files(filenames, args.reconcile, args.jobs)
+        else:
+            ledgerfiles = [
+                LedgerFile(f, args.reconcile, lazy=bool(lazy), jobs=args.jobs)
+                for f in filenames
+            ]
     except LdgReconcilerError as e:
         return handle_error(str(e))
 
@@ -41,6 +75,56 @@ def run_ledgerbil(args):
             ledgerfile.sort()
             ledgerfile.write_file()
 
+    if other_filenames:
+        process_files(other_filenames, args.sort, args.jobs, args.sort_run_size)
+
+
+def check_sorted(filenames):
+    if all(LedgerFile(f, stream=True).is_sorted() for f in filenames):
+        return None
+    return ERROR_RETURN_VALUE
+
+
+def load_files(filenames, reconcile_account, jobs):
+    """Load files for the reconciler in worker processes, checking that
+    they all matched the same account, as each file does for itself"""
+    with ProcessPoolExecutor(max_workers=min(jobs, len(filenames))) as executor:
+        ledgerfiles = list(
+            executor.map(LedgerFile, filenames, repeat(reconcile_account))
+        )
+
+    assert_only_one_matching_account(
+        [
+            ledgerfile.rec_account_matched
+            for ledgerfile in ledgerfiles
+            if ledgerfile.rec_account_matched is not None
+        ]
+    )
+    return ledgerfiles
+
+
+def process_files(filenames, sort, jobs, run_size=None):
+    if jobs == 1 or len(filenames) == 1:
+        # (a lone file gets the jobs to parse itself in chunks)
+        for filename in filenames:
+            process_file(filename, sort, run_size, jobs)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(filenames))) as executor:
+        # list() to wait for them all, and to re-raise any worker errors
+        list(executor.map(process_file, filenames, repeat(sort), repeat(run_size)))
+
+
+def process_file(filename, sort, run_size=None, jobs=1):
+    if sort and run_size:
+        LedgerFile(filename, stream=True).sort_external(run_size)
+        return
+
+    ledgerfile = LedgerFile(filename, jobs=jobs)
+    if sort:
+        ledgerfile.sort()
+        ledgerfile.write_file()
+
 
 def matching_account_found(ledgerfiles, reconcile_account):
     if any(lf.rec_account_matched for lf in ledgerfiles):
@@ -98,6 +182,14 @@ def get_args(args):
     parser.add_argument(
         "-S", "--sort", action="store_true", help="sort the file(s) by transaction date"
     )
+    parser.add_argument(
+        "--check-sorted",
+        action="store_true",
+        help=(
+            "check that the file(s) are sorted by transaction date, "
+            "with an exit code of 1 if not"
+        ),
+    )
     parser.add_argument(
         "-r",
         "--reconcile",
@@ -134,6 +226,29 @@ def get_args(args):
         action="store_true",
         help="show the date of the next scheduled transaction",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help=(
+            "use N processes: to load and sort ledger files in parallel, or "
+            "to parse a big file in chunks when it's the only file to sort, "
+            "the scheduler's file, or reconciled with an account regex (a "
+            "plain account name is found without parsing whole files)"
+        ),
+    )
+    parser.add_argument(
+        "--sort-run-size",
+        type=int,
+        metavar="N",
+        help=(
+            "with --sort, sort in bounded memory: at most N transactions "
+            "at a time are sorted in memory and saved to disk, to then be "
+            "merged"
+        ),
+    )
 
     if not args:
         parser.print_help()
@@ -15,3 +15,11 @@ class LdgReconcilerError(LdgException):
 
 class LdgPortfolioError(LdgException):
     pass
+
+
+class LdgJournalError(LdgException):
+    pass
+
+
+class LdgQueryError(LdgException):
+    pass
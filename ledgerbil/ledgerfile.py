@@ -1,41 +1,259 @@
+import heapq
+import marshal
+import mmap
+import os
+import re
 import sys
+import tempfile
+from bisect import insort
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
+from functools import partial
+from itertools import repeat
 from operator import attrgetter
 
-from .ledgerthing import LedgerThing
+from . import parsecache
+from .ledgerlexer import get_line_date, get_top_line
+from .ledgerthing import LedgerThing, get_account_matches
+from .settings_getter import get_settings
 from .util import assert_only_one_matching_account
 
+DIGITS = b"0123456789"
+# only lines starting with a digit can be transaction top lines
+TOP_LINE_CANDIDATE_REGEX = re.compile(rb"^[0-9]", re.MULTILINE)
+MIN_CHUNK_SIZE = 512 * 1024  # smallest piece of a file worth a process
+COPY_SIZE = 1024 * 1024
+RUN_SIZE = 100_000  # things per sorted run in sort_external
+RUN_BLOCK_SIZE = 1000  # things read back from a run at a time
+MAX_SORT_REPAIRS = 1000  # out of order things to move rather than sort all
+
+ThingOffset = namedtuple("ThingOffset", "offset length thing_date")
+# things in the order they're in the file, with their byte offsets (and
+# the end of the file) and the file's (size, mtime_ns) stamp at the time;
+# offsets is None after reading, until checked against the file itself
+Layout = namedtuple("Layout", "things offsets stamp")
+# what was read: the file's size and digest, and where its last thing
+# starts, to tell after a reset if the file has only been appended to
+Parsed = namedtuple("Parsed", "size digest tail_offset")
+
 
 class LedgerFile:
     STARTING_DATE = date(1899, 1, 1)
     thing_counter = -1
+    # can parsed things be kept in the parse cache, or sent back from
+    # other processes? (i.e. is all of their state in their attributes)
+    cacheable = True
 
-    def __init__(self, filename, reconcile_account=None):
+    def __init__(
+        self, filename, reconcile_account=None, stream=False, lazy=False, jobs=1
+    ):
         self.filename = filename
         self.rec_account = reconcile_account  # Could be partial or regex
+        # When streaming, things aren't read into self.things up front;
+        # use iter_things() to work through the file in constant memory
+        self.stream = stream
+        # When lazy, the file is memory mapped and things are only decoded
+        # and parsed when something beyond their number and date is needed
+        self.lazy = lazy
+        # With more than one job, big files are parsed in chunks by
+        # that many processes
+        self.jobs = jobs
+        self.mapped = None  # the file's memory map, when lazy
+        self.layout = None
+        self.parsed = None  # None if the file has been written since
         self.reset()
 
+    def __getstate__(self):
+        """Loaded files are sent back from worker processes with their
+        things as a parse cache dump, much quicker to send and rebuild
+        than pickled things (lazy files, being memory mapped, can't be)"""
+        state = self.__dict__.copy()
+        state["things"] = parsecache.dump_things(self.things)
+        if self.layout is not None:
+            # (as just loaded: the layout's things are the file's things;
+            # otherwise, there's no telling what's in the file as written)
+            unchanged = self.layout.things == self.things
+            state["layout"] = self.layout._replace(things=None) if unchanged else None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.things = parsecache.load_things_dump(self.things)
+        if self.layout is not None:
+            self.layout = self.layout._replace(things=list(self.things))
+
     def reset(self):
+        """(Re)read the file: if it has only been appended to since it was
+        last read or written, things from before are kept and only the
+        new tail is parsed"""
+        previous_map, self.mapped = self.mapped, None
         self.things = []
         self.rec_account_matched = None  # Full account name
-        self.read_file()
+        if not self.stream:
+            # stamped before reading, to be on the safe side of changes
+            stamp = get_file_stamp(self.filename)
+            if self.lazy:
+                self.read_file_lazy()
+            else:
+                self.read_file()
+            self.layout = Layout(list(self.things), None, stamp)
+
+        # (only let go of the old map once kept things have moved off it)
+        if previous_map is not None:
+            previous_map.close()
 
     def read_file(self):
+        data = self.read_data()
+        stamp = parsecache.get_file_stamp(self.filename, data)
+        kept, offset = self.get_unchanged_things(data, stamp.digest)
+        use_cache = self.cacheable and parsecache.get_cache_dir()
+        things = []
+        if not kept and use_cache:
+            things, offset = parsecache.load_things(
+                self.filename, self.rec_account, stamp, data
+            )
+
+        tail_offset = get_last_thing_offset(data)
+        if offset < len(data):
+            # Only parse what's new, which for a file that has been
+            # appended to is its (previous) last thing on
+            things += self.parse_data(data[offset:])
+            if use_cache:
+                parsecache.save_things(
+                    self.filename, self.rec_account, stamp, kept + things, tail_offset
+                )
+
+        self.add_things(kept + things)
+        self.parsed = Parsed(len(data), stamp.digest, tail_offset)
+
+    def read_data(self):
+        if not self.is_writable():
+            sys.exit(-1)
+
+        with open(self.filename, "rb") as the_file:
+            return the_file.read()
+
+    def read_file_lazy(self):
+        mapped = self.map_file()
+        if mapped is None:
+            self.parsed = None
+            return
+
+        digest = parsecache.get_digest(mapped)
+        things, offset = self.get_unchanged_things(mapped, digest)
+        for thing in things:
+            thing.source = mapped
+        self.mapped = mapped
+        self.add_things(things)
+        self.add_things(
+            LazyThing(self, mapped, *thing_offset)
+            for thing_offset in index_things(mapped, offset)
+        )
+        tail_offset = self.things[-1].offset if self.things else 0
+        self.parsed = Parsed(len(mapped), digest, tail_offset)
+
+    def get_unchanged_things(self, data, digest):
+        """Things from before a reset that still hold for file data that's
+        the same or has only been appended to, and the offset in data to
+        parse on from
+
+        After an append, that's all but the last thing, and the offset
+        where the last thing starts, since appended lines may belong to
+        it. Otherwise, nothing: ([], 0). Things changed in memory since
+        they were read or written aren't kept.
+        """
+        layout = self.layout
+        if not self.cacheable or layout is None or not layout.things:
+            return [], 0
+        if any(thing.is_changed() for thing in layout.things):
+            return [], 0
+
+        if self.parsed is None:
+            # Written since: the file should start with the things as
+            # written (set_parsed sees to lazy files, as their things' text
+            # may only be in the file itself)
+            offsets = layout.offsets
+            size, tail_offset = offsets[-1], offsets[-2]
+            for thing, start, end in zip(layout.things, offsets, offsets[1:]):
+                if data[start:end] != get_clean_text(thing).encode("utf-8"):
+                    return [], 0
+        else:
+            size, previous_digest, tail_offset = self.parsed
+            if len(data) < size:
+                return [], 0
+            if len(data) == size:
+                prefix_digest = digest
+            else:
+                prefix_digest = get_prefix_digest(data, size)
+            if prefix_digest != previous_digest:
+                return [], 0
+
+        if len(data) == size:
+            return list(layout.things), size
+        return layout.things[:-1], tail_offset
+
+    def close_map(self):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+
+    def map_file(self):
+        if not self.is_writable():
+            sys.exit(-1)
+
+        with open(self.filename, "rb") as the_file:
+            try:
+                return mmap.mmap(the_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # can't map an empty file
+                return None
+
+    def read_things(self):
+        """Generate things from the file as thing boundaries are found,
+        without numbering them or keeping them around"""
         if not self.is_writable():
             sys.exit(-1)
 
-        current_lines = []
         with open(self.filename, "r", encoding="utf-8") as the_file:
-            for line in the_file:
-                line = line.rstrip()
+            yield from self.parse_lines(line.rstrip() for line in the_file)
+
+    def parse_lines(self, lines):
+        """Generate things from (right stripped) lines"""
+        date_format = get_settings().DATE_FORMAT
+        current_lines = []
+        top_line = None
+        for line in lines:
+            # a transaction top line is currently the only new thing
+            next_top_line = get_top_line(line, date_format)
+            if next_top_line:
+                yield from self.get_things_from_lines(current_lines, top_line)
+                current_lines = []
+                top_line = next_top_line
+
+            current_lines.append(line)
 
-                if LedgerThing.is_new_thing(line):
-                    self.add_thing_from_lines(current_lines)
-                    current_lines = []
+        yield from self.get_things_from_lines(current_lines, top_line)
 
-                current_lines.append(line)
+    def parse_data(self, data):
+        """Return a list of things parsed from file data (bytes); big
+        files are split into chunks at top lines and parsed in parallel"""
+        offsets = get_chunk_offsets(data, self.jobs) if self.cacheable else [0]
+        if len(offsets) == 1:
+            return list(self.parse_lines(get_lines(data)))
 
-        self.add_thing_from_lines(current_lines)
+        ends = offsets[1:] + [len(data)]
+        chunks = [data[start:end] for start, end in zip(offsets, ends)]
+        with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+            dumps = executor.map(parse_chunk, repeat(self.rec_account), chunks)
+            return [
+                thing
+                for dumped in dumps
+                for thing in parsecache.load_things_dump(dumped)
+            ]
+
+    def iter_things(self):
+        """Stream numbered (and reconcile checked) things from the file"""
+        return self.register_things(self.read_things())
 
     def is_writable(self):
         # Catch read-only files as well as bad filenames
@@ -46,17 +264,24 @@ class LedgerFile:
             print(f"error: {e}", file=sys.stderr)
             return False
 
-    def add_thing_from_lines(self, lines):
+    def get_things_from_lines(self, lines, top_line=None):
         lines = remove_trailing_blank_lines(lines)
         if lines:
-            thing = LedgerThing(lines, self.rec_account)
-            self.add_things([thing])
+            yield self.get_thing(lines, top_line)
+
+    def get_thing(self, lines, top_line=None):
+        return LedgerThing(lines, self.rec_account, top_line)
+
+    def add_thing_from_lines(self, lines):
+        self.add_things(self.get_things_from_lines(lines))
 
     def add_things(self, things):
+        self.things.extend(self.register_things(things))
+
+    def register_things(self, things):
         for thing in things:
             self.thing_counter += 1
             thing.thing_number = self.thing_counter
-            self.things.append(thing)
 
             if self.rec_account and thing.rec_account_matched:
                 if not self.rec_account_matched:
@@ -66,7 +291,20 @@ class LedgerFile:
                         {self.rec_account_matched, thing.rec_account_matched}
                     )
 
+            yield thing
+
+    def get_things(self):
+        return self.iter_things() if self.stream else self.things
+
     def sort(self):
+        """Sort things by date, with things without dates kept after the
+        thing before them
+
+        Files are usually sorted but for a few things (e.g. added at the
+        end), so things out of order are moved into place with binary
+        search insertion and the rest are left where they are, and
+        write_file can then write from the first moved thing on.
+        """
         current_date = self.STARTING_DATE
 
         for thing in self.things:
@@ -75,18 +313,502 @@ class LedgerFile:
             else:
                 current_date = thing.thing_date
 
-        self.things.sort(key=attrgetter("thing_date", "thing_number"))
+        key = attrgetter("thing_date", "thing_number")
+        in_order = []
+        out_of_order = []
+        for thing in self.things:
+            if in_order and key(thing) < key(in_order[-1]):
+                out_of_order.append(thing)
+            else:
+                in_order.append(thing)
+
+        if len(out_of_order) > MAX_SORT_REPAIRS:
+            self.things.sort(key=key)
+            return
+
+        for thing in out_of_order:
+            insort(in_order, thing, key=key)
+        self.things[:] = in_order
+
+    def is_sorted(self):
+        """Are things in sort() order? When streaming, the file is
+        scanned for top line dates without parsing things."""
+        if not self.stream:
+            return is_in_date_order(thing.thing_date for thing in self.things)
+
+        mapped = self.map_file()
+        if mapped is None:
+            return True
+        with mapped:
+            return is_in_date_order(
+                thing_offset.thing_date for thing_offset in index_things(mapped)
+            )
+
+    def sort_external(self, run_size=RUN_SIZE):
+        """Sort the file without holding all of it in memory
+
+        Things are streamed from the file into sorted runs of run_size,
+        each saved to a temp file, and the runs are then merged into the
+        file. Sorts the same way as sort(), which has to be done instead
+        for things that were added or changed in memory.
+        """
+        with tempfile.TemporaryDirectory() as run_dir:
+            run_filenames = []
+            for number, run in enumerate(self.get_runs(run_size)):
+                run_filename = os.path.join(run_dir, str(number))
+                write_run(run_filename, sorted(run))
+                run_filenames.append(run_filename)
+
+            merged = heapq.merge(*map(read_run, run_filenames))
+            self.write_texts(text for _, _, text in merged)
+
+    def get_runs(self, run_size):
+        """Generate lists of (date ordinal, thing number, text) from the
+        file, with dates carried forward as in sort()"""
+        current_date = self.STARTING_DATE.toordinal()
+        run = []
+        for thing in self.iter_things():
+            if thing.date_ordinal is None:
+                thing.date_ordinal = current_date
+            else:
+                current_date = thing.date_ordinal
+
+            run.append((current_date, thing.thing_number, get_thing_text(thing)))
+            if len(run) == run_size:
+                yield run
+                run = []
+
+        if run:
+            yield run
 
     def print_file(self):
-        for thing in self.things:
+        for thing in self.get_things():
             for line in thing.get_lines():
                 print(line)
             print()
 
     def write_file(self):
-        with open(self.filename, "w", encoding="utf-8") as the_file:
-            for thing in self.things:
-                the_file.write("\n".join(thing.get_lines()) + "\n\n")
+        if self.stream:
+            self.write_things(self.iter_things())
+        elif not self.write_changes():
+            self.write_things(self.things)
+            self.set_layout()
+
+    def write_changes(self):
+        """Write just what's changed since the file was read or written
+
+        Things are compared with the layout: from the first thing that
+        has been moved or added (e.g. by sort or the scheduler) on, the
+        file is rewritten; before that, things with date or status changes
+        are patched in place if still the same size (e.g. a status mark,
+        or a date in a fixed width format). Returns False if the whole
+        file needs to be written, e.g. if the file has been changed by
+        someone else, or isn't laid out the way it would be written.
+        """
+        layout = self.layout
+        if layout is None:
+            return False
+        stamp = get_file_stamp(self.filename)
+        if stamp is None or stamp != layout.stamp:
+            return False
+
+        first = 0
+        for old, new in zip(layout.things, self.things):
+            if old is not new:
+                break
+            first += 1
+        rewrite = first < len(layout.things) or first < len(self.things)
+
+        offsets = layout.offsets or self.get_offsets(first, check_end=not rewrite)
+        if offsets is None:
+            return False
+
+        changed = [i for i in range(first) if self.things[i].is_changed()]
+        patches = []
+        for i in changed:
+            data = get_thing_text(self.things[i]).encode("utf-8")
+            if len(data) != offsets[i + 1] - offsets[i]:
+                first = i
+                rewrite = True
+                break
+            patches.append((i, data))
+
+        if patches:
+            with open(self.filename, "r+b") as the_file:
+                for i, data in patches:
+                    the_file.seek(offsets[i])
+                    the_file.write(data)
+            for i, _ in patches:
+                self.things[i].update_lines()
+
+        self.layout = Layout(layout.things, offsets, layout.stamp)
+        if rewrite:
+            self.write_things(self.things[first:], keep=offsets[first])
+            self.set_layout(first)
+        elif patches:
+            self.layout = Layout(
+                list(self.things), offsets, get_file_stamp(self.filename)
+            )
+            self.set_parsed()
+
+        return True
+
+    def get_offsets(self, count, check_end):
+        """Offsets of the layout's first count things, if those are in
+        the file as they'd be written, otherwise None"""
+        offsets = [0]
+        with open(self.filename, "rb") as the_file:
+            for thing in self.layout.things[:count]:
+                data = get_clean_text(thing).encode("utf-8")
+                if the_file.read(len(data)) != data:
+                    return None
+                offsets.append(offsets[-1] + len(data))
+            if check_end and the_file.read(1):
+                return None
+
+        return offsets
+
+    def set_layout(self, start=0):
+        """Update lines and offsets for things from start on, as they've
+        just been written out"""
+        offsets = self.layout.offsets[: start + 1] if start else [0]
+        for thing in self.things[start:]:
+            thing.update_lines()
+            offsets.append(offsets[-1] + len(get_thing_text(thing).encode("utf-8")))
+        self.layout = Layout(list(self.things), offsets, get_file_stamp(self.filename))
+        self.set_parsed()
+
+    def set_parsed(self):
+        """After a write, lazy things are all in the file as mapped again,
+        so the map is what was parsed; other files are checked against the
+        layout's offsets instead, on reset"""
+        if self.lazy and self.mapped is not None:
+            tail_offset = self.things[-1].offset if self.things else 0
+            digest = parsecache.get_digest(self.mapped)
+            self.parsed = Parsed(len(self.mapped), digest, tail_offset)
+        else:
+            self.parsed = None
+
+    def write_things(self, things, keep=0):
+        """Write things (any iterable, e.g. from iter_things) to the file,
+        after the first keep bytes of what's already there"""
+        if self.lazy:
+            self.write_lazy_things(things, keep)
+            return
+
+        self.write_texts(
+            map(get_thing_text, things), keep, buffer=not isinstance(things, list)
+        )
+
+    def write_lazy_things(self, things, keep=0):
+        """Stand-ins that haven't been parsed read their text from the
+        memory map, so it's all read (and decoded, which can fail) into a
+        temp file before the file is touched. They're then pointed at
+        where their text is in the file as mapped again."""
+        lengths = []
+        with tempfile.TemporaryFile() as temp_file:
+            for thing in things:
+                data = get_thing_text(thing).encode("utf-8")
+                temp_file.write(data)
+                lengths.append(len(data))
+            self.close_map()
+            write_temp_file(self.filename, temp_file, keep)
+
+        self.mapped = self.map_file()
+        for thing in self.things:
+            thing.source = self.mapped
+        offset = keep
+        for thing, length in zip(things, lengths):
+            thing.offset, thing.length = offset, length
+            offset += length
+
+    def write_texts(self, texts, keep=0, buffer=True):
+        """Write texts into the file in place, which keeps symlinks, hard
+        links, owner, and so on, after the first keep bytes
+
+        Unless told the texts are already in memory, they're buffered in a
+        temp file first, so a stream being read from the file can be
+        written back out to the same file, and an error along the way
+        leaves the file alone.
+        """
+        if not buffer:
+            write_data(self.filename, (text.encode("utf-8") for text in texts), keep)
+            return
+
+        with tempfile.TemporaryFile() as temp_file:
+            for text in texts:
+                temp_file.write(text.encode("utf-8"))
+            write_temp_file(self.filename, temp_file, keep)
+
+
+class LazyThing:
+    """Stand-in for a thing in a memory mapped file
+
+    Number and date are available without parsing (which is all sorting
+    needs), as are lines (so write_file can check the file's layout and
+    patch it in place), and whether the reconcile account matched if
+    the text doesn't have the literal part of the account pattern in it
+    (see ledgerthing.get_required_literal). Anything else decodes and
+    parses the real thing, once.
+    """
+
+    def __init__(self, ledgerfile, source, offset, length, thing_date):
+        self.ledgerfile = ledgerfile
+        self.source = source  # the memory map
+        self.offset = offset
+        self.length = length
+        self.thing = None
+        self._thing_number = None
+        self._thing_date = thing_date
+
+    def __repr__(self):
+        return repr(self.get_thing())
+
+    def __str__(self):
+        return str(self.get_thing())
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the stand-in itself
+        if name.startswith("_") or name in ("thing", "source"):
+            raise AttributeError(name)
+        return getattr(self.get_thing(), name)
+
+    @property
+    def thing_number(self):
+        return self._thing_number
+
+    @thing_number.setter
+    def thing_number(self, value):
+        self._thing_number = value
+        if self.thing is not None:
+            self.thing.thing_number = value
+
+    @property
+    def thing_date(self):
+        return self._thing_date
+
+    @thing_date.setter
+    def thing_date(self, value):
+        if self.thing is None and self._thing_date not in (None, value):
+            self.get_thing()  # for its top line to show the new date
+        self._thing_date = value
+        if self.thing is not None:
+            self.thing.thing_date = value
+
+    @property
+    def rec_account_matched(self):
+        if self.thing is None and not self.may_match():
+            return None
+        return self.get_thing().rec_account_matched
+
+    def may_match(self):
+        """Could the reconcile account match? Searches the bytes without
+        decoding or parsing them"""
+        rec_account = self.ledgerfile.rec_account
+        if not rec_account:
+            return False
+        literal = get_account_matches(rec_account).literal
+        if literal is None:
+            return True
+        end = self.offset + self.length
+        return self.source.find(literal.encode("utf-8"), self.offset, end) != -1
+
+    @property
+    def lines(self):
+        if self.thing is None:
+            return self.read_lines()
+        return self.thing.lines
+
+    def get_lines(self):
+        if self.thing is None:
+            return self.read_lines()
+        return self.thing.get_lines()
+
+    def is_changed(self):
+        return self.thing is not None and self.thing.is_changed()
+
+    def update_lines(self):
+        if self.thing is not None:
+            self.thing.update_lines()
+
+    def read_lines(self):
+        start, end = self.offset, self.offset + self.length
+        text = self.source[start:end]
+        lines = [line.rstrip() for line in text.decode("utf-8").split("\n")]
+        return remove_trailing_blank_lines(lines)
+
+    def get_thing(self):
+        if self.thing is None:
+            thing = self.ledgerfile.get_thing(self.read_lines())
+            thing.thing_number = self._thing_number
+            thing.thing_date = self._thing_date
+            self.thing = thing
+        return self.thing
+
+
+def index_things(mapped, start=0):
+    """Scan memory mapped file contents once for thing boundaries, from
+    start on (which should be where a line starts)
+
+    Yields a ThingOffset for each thing, skipping blank-only stretches
+    (e.g. at the top of a file) which don't make a thing.
+    """
+    date_format = get_settings().DATE_FORMAT
+    size = len(mapped)
+    start_date = None
+    # The regex finds candidates without Python looking at every line
+    for m in TOP_LINE_CANDIDATE_REGEX.finditer(mapped, start):
+        position = m.start()
+        line_end = mapped.find(b"\n", position)
+        if line_end == -1:
+            line_end = size
+
+        line = mapped[position:line_end].decode("utf-8").rstrip()
+        the_date, _ = get_line_date(line, date_format)
+        if the_date is None:
+            continue
+
+        # (only the stretch before the first transaction can be blank)
+        if start_date is not None or mapped[start:position].strip():
+            yield ThingOffset(start, position - start, start_date)
+        start = position
+        start_date = the_date
+
+    if start_date is not None or mapped[start:size].strip():
+        yield ThingOffset(start, size - start, start_date)
+
+
+def is_in_date_order(dates):
+    previous = None
+    for the_date in dates:
+        # things without dates go with the thing before them
+        if the_date is None:
+            continue
+        if previous is not None and the_date < previous:
+            return False
+        previous = the_date
+
+    return True
+
+
+def get_thing_text(thing):
+    return "\n".join(thing.get_lines()) + "\n\n"
+
+
+def get_clean_text(thing):
+    """Text of the thing as it was read or last written"""
+    return "\n".join(thing.lines) + "\n\n"
+
+
+def write_run(filename, run):
+    with open(filename, "wb") as the_file:
+        for start in range(0, len(run), RUN_BLOCK_SIZE):
+            end = start + RUN_BLOCK_SIZE
+            marshal.dump(run[start:end], the_file)
+
+
+def read_run(filename):
+    """Generate a run's records, reading them a block at a time so that
+    merging runs only holds a block from each in memory"""
+    with open(filename, "rb") as the_file:
+        while True:
+            try:
+                block = marshal.load(the_file)
+            except EOFError:
+                return
+            yield from block
+
+
+def get_file_stamp(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_data(filename, blocks, keep=0):
+    """Write blocks of bytes into the file in place after keep bytes"""
+    with open(filename, "r+b" if keep else "wb") as the_file:
+        the_file.seek(keep)
+        for block in blocks:
+            the_file.write(block)
+        the_file.truncate()
+
+
+def write_temp_file(filename, temp_file, keep=0):
+    """Copy a temp file that's been written into the file in place"""
+    temp_file.seek(0)
+    write_data(filename, iter(partial(temp_file.read, COPY_SIZE), b""), keep)
+
+
+def get_prefix_digest(data, size):
+    """Digest of the first size bytes of data, without copying them"""
+    with memoryview(data) as view, view[:size] as prefix:
+        return parsecache.get_digest(prefix)
+
+
+def get_lines(data):
+    return (line.rstrip() for line in data.decode("utf-8").split("\n"))
+
+
+def parse_chunk(reconcile_account, chunk):
+    """Parse a chunk of a file in a worker process, returning the things
+    in a form that is quick to send back and rebuild"""
+    ledgerfile = LedgerFile(None, reconcile_account, stream=True)
+    things = list(ledgerfile.parse_lines(get_lines(chunk)))
+    return parsecache.dump_things(things)
+
+
+def get_chunk_offsets(data, count):
+    """Offsets that split file data into up to count chunks of about the
+    same size, each after the first starting at a transaction top line"""
+    size = len(data)
+    chunk_size = max(-(-size // count), MIN_CHUNK_SIZE)
+    date_format = get_settings().DATE_FORMAT
+    offsets = [0]
+    position = chunk_size
+    while len(offsets) < count and position < size:
+        offset = find_top_line(data, position, date_format)
+        if offset is None:
+            break
+        offsets.append(offset)
+        position = offset + chunk_size
+
+    return offsets
+
+
+def find_top_line(data, position, date_format):
+    """Offset of the first top line starting at or after position"""
+    size = len(data)
+    line_start = data.find(b"\n", position - 1) + 1
+    while 0 < line_start < size:
+        line_end = data.find(b"\n", line_start)
+        if line_end == -1:
+            line_end = size
+        if data[line_start] in DIGITS:
+            line = data[line_start:line_end].decode("utf-8").rstrip()
+            if get_top_line(line, date_format):
+                return line_start
+        line_start = line_end + 1
+
+    return None
+
+
+def get_last_thing_offset(data):
+    """Byte offset where the last thing in file data starts, found by
+    working backwards to the last transaction top line"""
+    date_format = get_settings().DATE_FORMAT
+    line_end = len(data)
+    while line_end > 0:
+        line_start = data.rfind(b"\n", 0, line_end) + 1
+        if line_start < line_end and data[line_start] in DIGITS:
+            line = data[line_start:line_end].decode("utf-8").rstrip()
+            if get_top_line(line, date_format):
+                return line_start
+        line_end = line_start - 1
+
+    return 0
 
 
 def remove_trailing_blank_lines(lines):
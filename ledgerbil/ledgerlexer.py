@@ -0,0 +1,112 @@
+"""classify ledger file lines, with transaction top lines parsed once"""
+
+import re
+from collections import namedtuple
+
+from .settings_getter import get_settings
+from .util import get_date_separator, parse_date_string
+
+TRANSACTION = "transaction"
+POSTING = "posting"
+COMMENT = "comment"
+NOTE = "note"  # an indented comment, belonging to the transaction above
+DIRECTIVE = "directive"  # anything else at column 0, e.g. account, P, ~
+BLANK = "blank"
+
+COMMENT_CHARS = ";#%|*"  # only at column 0
+NOTE_CHAR = ";"
+INDENT_CHARS = " \t"
+DIGITS = "0123456789"
+DATE_REGEX = r"^\d{4}(?:[-/]\d\d){2}(?=\s|$)"
+DATE_AND_SPACE_REGEX = re.compile(DATE_REGEX + r"(?:\s+|$)")
+FIXED_DATE_LENGTH = 10
+
+# everything on a top line after the date and its trailing whitespace
+TOP_LINE_REST_REGEX = re.compile(
+    r"\s*([!*])?\s*"  # optional transaction state (c/p)
+    r"(?:\(([^)]*)\)\s*)?"  # optional transaction # and whitespace
+    r"(.*?)(?=  |$)"  # opt. payee ends with two spaces (or $)
+)
+
+Token = namedtuple("Token", "kind line top_line")
+TopLine = namedtuple("TopLine", "date status code payee")
+
+
+def get_token(line, date_format=None):
+    """Classify a line (without line ending) using its first character,
+    only going further for lines that might be a transaction top line"""
+    if not line or line.isspace():
+        return Token(BLANK, line, None)
+
+    first = line[0]
+    if first in INDENT_CHARS:
+        kind = NOTE if line.lstrip()[0] == NOTE_CHAR else POSTING
+        return Token(kind, line, None)
+
+    if first in COMMENT_CHARS:
+        return Token(COMMENT, line, None)
+
+    if first in DIGITS:
+        top_line = get_top_line(line, date_format)
+        if top_line:
+            return Token(TRANSACTION, line, top_line)
+
+    return Token(DIRECTIVE, line, None)
+
+
+def tokenize(lines, date_format=None):
+    date_format = date_format or get_settings().DATE_FORMAT
+    for line in lines:
+        yield get_token(line, date_format)
+
+
+def get_top_line(line, date_format=None):
+    """Return a TopLine if line starts a transaction, otherwise None"""
+    if not line or line[0] not in DIGITS:
+        return None
+
+    the_date, rest = get_line_date(line, date_format or get_settings().DATE_FORMAT)
+    if the_date is None:
+        return None
+
+    status, code, payee = TOP_LINE_REST_REGEX.match(line, rest).groups()
+    return TopLine(the_date, status, code, payee)
+
+
+def get_line_date(line, date_format):
+    """Return (date, end of date) if line starts with a valid date
+    followed by whitespace or the end of line, else (None, 0)
+
+    For YYYY/MM/DD style formats, fixed positions are checked before
+    handing the date to util's memoized parser, with no regex involved.
+    """
+    separator = get_date_separator(date_format)
+    if separator is None:
+        return get_line_date_from_regex(line, date_format)
+
+    size = len(line)
+    if size < FIXED_DATE_LENGTH:
+        return None, 0
+    if size > FIXED_DATE_LENGTH and not line[FIXED_DATE_LENGTH].isspace():
+        return None, 0
+    if line[4] != separator or line[7] != separator:
+        return None, 0
+
+    try:
+        return (
+            parse_date_string(line[:FIXED_DATE_LENGTH], date_format),
+            FIXED_DATE_LENGTH,
+        )
+    except ValueError:
+        return None, 0
+
+
+def get_line_date_from_regex(line, date_format):
+    """Fallback for date formats we don't know the shape of"""
+    m = DATE_AND_SPACE_REGEX.match(line)
+    if not m:
+        return None, 0
+    try:
+        return parse_date_string(m.group(0).strip(), date_format), m.end()
+    except ValueError:
+        return None, 0
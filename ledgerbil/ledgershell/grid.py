@@ -10,10 +10,13 @@ from textwrap import dedent
 
 from dateutil.relativedelta import relativedelta
 
-from .. import util
+from .. import journal, util
 from ..colorable import Colorable
-from ..settings_getter import get_setting
-from ..util import get_date, parse_args
+from ..ledgerbilexceptions import LdgJournalError, LdgQueryError
+from ..settings_getter import get_settings
+from ..util import get_date, handle_error, parse_args
+from . import native
+from .query import ENGINES, LEDGER_ENGINE, NATIVE_ENGINE
 from .runner import get_ledger_output
 from .util import get_account_balance, get_first_dollar_amount_float, get_payee_subtotal
 
@@ -24,12 +27,18 @@ EMPTY_VALUE = ""
 
 def get_grid_report(args, ledger_args):
     unit = "month" if args.month else "year"
-    period_names, current_period = get_period_names(args, ledger_args, unit)
+    # The native engine reads the journal once instead of running ledger
+    postings = journal.get_postings() if args.engine == NATIVE_ENGINE else None
+    period_names, current_period = get_period_names(
+        args, ledger_args, unit, postings=postings
+    )
     if not period_names:
         return ""
 
     # Row headers: i.e. accounts, payees, net worth (things with amounts)
-    row_headers, columns = get_columns(args, ledger_args, period_names, current_period)
+    row_headers, columns = get_columns(
+        args, ledger_args, period_names, current_period, postings=postings
+    )
     # Many queries with no results will come up empty on period names and
     # return above, but some, for example queries with "and" in them, may not
     if not row_headers:
@@ -189,7 +198,32 @@ def get_flat_report_header_lists(headers, width=14):
     return header_lists
 
 
-def get_period_names(args, ledger_args, unit="year"):
+def get_period_names(args, ledger_args, unit="year", postings=None):
+    """postings: from the journal, if using the native engine"""
+    date_format = get_period_date_format(unit)
+    if postings is None:
+        names = get_ledger_period_names(args, ledger_args, date_format, unit)
+    else:
+        names = native.get_period_names(postings, args, ledger_args, date_format, unit)
+
+    current_period = None
+    if args.current:
+        current_period_date_str = date.today().strftime(date_format)
+        if current_period_date_str in names:
+            current_period = current_period_date_str
+            # remove future periods
+            names = names[: names.index(current_period_date_str) + 1]
+
+    return tuple(names), current_period
+
+
+def get_period_date_format(unit="year"):
+    if unit == "year":
+        return get_settings().DATE_FORMAT_YEAR
+    return get_settings().DATE_FORMAT_MONTH
+
+
+def get_ledger_period_names(args, ledger_args, date_format, unit="year"):
     # --collapse behavior seems suspicous, but with --empty
     # appears to work for our purposes here
     # groups.google.com/forum/?fromgroups=#!topic/ledger-cli/HAKAMYiaL7w
@@ -198,11 +232,9 @@ def get_period_names(args, ledger_args, unit="year"):
     period = ("--period", args.period) if args.period else ()
 
     if unit == "year":
-        date_format = get_setting("DATE_FORMAT_YEAR")
         period_options = ("--yearly", "--date-format", date_format)
         period_len = 4
     else:
-        date_format = get_setting("DATE_FORMAT_MONTH")
         period_options = ("--monthly", "--date-format", date_format)
         period_len = 7
 
@@ -216,20 +248,21 @@ def get_period_names(args, ledger_args, unit="year"):
         + ledger_args
     ).split("\n")
 
-    names = sorted({x[:period_len] for x in lines if x[:period_len].strip() != ""})
+    return sorted({x[:period_len] for x in lines if x[:period_len].strip() != ""})
 
-    current_period = None
-    if args.current:
-        current_period_date_str = date.today().strftime(date_format)
-        if current_period_date_str in names:
-            current_period = current_period_date_str
-            # remove future periods
-            names = names[: names.index(current_period_date_str) + 1]
 
-    return tuple(names), current_period
-
-
-def get_columns(args, ledger_args, period_names, current_period=None):
+def get_columns(args, ledger_args, period_names, current_period=None, postings=None):
+    """postings: from the journal, if using the native engine"""
+    if postings is not None:
+        unit = "month" if args.month else "year"
+        return native.get_columns(
+            postings,
+            args,
+            ledger_args,
+            period_names,
+            get_period_date_format(unit),
+            current_period,
+        )
 
     with futures.ThreadPoolExecutor(max_workers=50) as executor:
         to_do = []
@@ -355,14 +388,15 @@ def get_column_payees(period_name, ledger_args):
 
 
 def get_column_networth(period_name, ledger_args):
+    settings = get_settings()
     if period_name == "tomorrow":
         ending = period_name
     else:
         if len(period_name) == 4:  # year
-            date_format = get_setting("DATE_FORMAT_YEAR")
+            date_format = settings.DATE_FORMAT_YEAR
             networth_relativedelta = relativedelta(years=1)
         else:  # month
-            date_format = get_setting("DATE_FORMAT_MONTH")
+            date_format = settings.DATE_FORMAT_MONTH
             networth_relativedelta = relativedelta(months=1)
 
         # Let's report net worth for the end of the current period,
@@ -372,7 +406,7 @@ def get_column_networth(period_name, ledger_args):
         next_period_date = period_date + networth_relativedelta
         ending = next_period_date.strftime(date_format)
 
-    accounts = tuple(parse_args(get_setting("NETWORTH_ACCOUNTS")))
+    accounts = tuple(parse_args(settings.NETWORTH_ACCOUNTS))
     lines = get_ledger_output(
         ("balance",) + accounts + ("--depth", "1", "--end", ending) + ledger_args
     ).split("\n")
@@ -488,6 +522,11 @@ def get_args(args):
         any accounts, ledger gives odd results for the query used by ledgerbil:
 
         register --group-by '(payee)' --collapse --subtotal --depth 1
+
+        With --engine native, the journal files are read once and periods are
+        added up in-process, rather than running ledger for each period. This
+        handles account and @payee queries with and/or/not, and simple dates
+        and periods, e.g. 2018, 2018/07, or from 2017 to 2019.
     """)
     parser = argparse.ArgumentParser(
         prog=program,
@@ -583,6 +622,15 @@ def get_args(args):
     parser.add_argument(
         "--no-color", action="store_true", default=False, help="output without color"
     )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=LEDGER_ENGINE,
+        help=(
+            "run ledger for each period (default), or add up all periods "
+            "in-process from the journal files"
+        ),
+    )
 
     # workaround for problems with nargs=argparse.REMAINDER
     # see: https://bugs.python.org/issue17050
@@ -595,7 +643,10 @@ def get_args(args):
 def main(argv=None):
     args, ledger_args = get_args(argv or [])
 
-    report = get_grid_report(args, ledger_args)
+    try:
+        report = get_grid_report(args, ledger_args)
+    except (LdgJournalError, LdgQueryError) as e:
+        return handle_error(str(e))
 
     if args.no_color and not args.csv:
         report = Colorable.get_plain_string(report)
@@ -2,9 +2,13 @@ import argparse
 import re
 from textwrap import dedent
 
+from .. import holdings, journal, prices, util
 from ..colorable import Colorable
+from ..ledgerbilexceptions import LdgJournalError, LdgQueryError
 from ..settings_getter import get_setting
-from ..util import parse_args
+from ..util import handle_error, parse_args
+from . import query
+from .query import ENGINES, LEDGER_ENGINE, NATIVE_ENGINE
 from .runner import get_ledger_command, get_ledger_output
 from .util import AccountBalance, get_account_balance
 
@@ -124,6 +128,39 @@ def get_shares(args):
     return listing
 
 
+def get_native_listings(args):
+    """Share and dollar listings the same as get_shares and get_dollars
+    make from ledger's output, but from one pass over the journal's
+    postings; shares are valued at their latest price by the end date"""
+    postings = journal.get_postings()
+    matches = query.get_matcher(tuple(parse_args(args.accounts)))
+    _, end = query.get_date_range(end=args.end)
+    balances = holdings.get_balances(postings, matches, end.toordinal())
+    price_history = prices.get_price_history(postings)
+
+    share_listing = []
+    dollar_listing = []
+    for line in holdings.get_tree_lines(balances):
+        # Indented as in ledger's output, to line up the same in the report
+        account = "  " + "  " * line.depth + line.account
+        units = line.dollars + price_history.get_value(line.shares, end.toordinal() - 1)
+        dollars = AccountBalance(account, round(util.from_units(units), 2), "$")
+        if dollars.amount < -0.02:
+            warn_negative_dollars(dollars.amount, dollars.account)
+        dollar_listing.append(dollars)
+
+        # As with ledger's output, only leaf accounts get shares
+        if line.is_leaf and len(line.shares) == 1:
+            ((symbol, shares),) = line.shares.items()
+            share_listing.append(
+                AccountBalance(account, util.from_units(shares), symbol)
+            )
+        else:
+            share_listing.append(AccountBalance(account, 0, ""))
+
+    return share_listing, dollar_listing
+
+
 def get_investment_report(args):
     """We want to put the separate shares and dollars reports
     together to get something like this:
@@ -136,8 +173,11 @@ def get_investment_report(args):
     15.000 qwrty         $ 150.00      ira: glass idx
      5.000 yyzxx         $ 200.00      mutual: total idx
     """
-    share_listing = get_shares(args)
-    dollar_listing = get_dollars(args)
+    if args.engine == NATIVE_ENGINE:
+        share_listing, dollar_listing = get_native_listings(args)
+    else:
+        share_listing = get_shares(args)
+        dollar_listing = get_dollars(args)
 
     report = ""
 
@@ -168,6 +208,12 @@ def get_args(args):
     description = dedent("""\
         Viewing shares with --exchange is kind of weird in ledger. This creates
         a report that shows share totals and dollar amounts in a nicer way.
+
+        With --engine native, the journal files are read once and balances are
+        added up in-process, with shares valued from the prices file and the
+        prices in postings, rather than running ledger twice. This handles
+        account and @payee queries with and/or/not, and simple end dates, e.g.
+        2018, 2018/07/04, or tomorrow.
     """)
     parser = argparse.ArgumentParser(
         prog=program,
@@ -198,10 +244,25 @@ def get_args(args):
     parser.add_argument(
         "-c", "--command", action="store_true", help="print ledger commands used"
     )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=LEDGER_ENGINE,
+        help=(
+            "run ledger for shares and dollars (default), or add up balances "
+            "in-process from the journal files"
+        ),
+    )
 
     return parser.parse_args(args)
 
 
 def main(argv=None):
     args = get_args(argv or [])
-    print(get_investment_report(args), end="")
+
+    try:
+        report = get_investment_report(args)
+    except (LdgJournalError, LdgQueryError) as e:
+        return handle_error(str(e))
+
+    print(report, end="")
@@ -0,0 +1,221 @@
+"""grid reports worked out in-process, for grid --engine native
+
+Rather than running ledger for the period names and then again for every
+column, postings are read from the journal once (see journal.py) and all
+periods are added up in a single pass over them. Queries, dates, and
+periods are interpreted by query.py.
+
+Unlike ledger with --flat, funds applied to both a parent and a child
+account aren't double counted. Shares are counted at the price they were
+bought or sold for, rather than market value, except for net worth.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from operator import attrgetter
+
+from dateutil.relativedelta import relativedelta
+
+from .. import prices, util
+from ..settings_getter import get_settings
+from . import query
+
+get_account = attrgetter("account")
+get_payee = attrgetter("payee")
+
+
+def get_period_names(postings, args, ledger_args, date_format, unit="year"):
+    """Sorted names of periods from the first to the last matching posting
+    within --begin, --end, and --period, including any without postings
+    in between (as with ledger's --collapse --empty)"""
+    begin, end = query.get_date_range(args.begin, args.end, args.period)
+    begin_ordinal = begin.toordinal() if begin else None
+    end_ordinal = end.toordinal() if end else None
+    matches = query.get_matcher(ledger_args)
+
+    first = last = None
+    for posting in postings:
+        date_ordinal = posting.date_ordinal
+        if begin_ordinal is not None and date_ordinal < begin_ordinal:
+            continue
+        if end_ordinal is not None and date_ordinal >= end_ordinal:
+            break  # postings are sorted by date
+        if not matches(posting.account, posting.payee):
+            continue
+        if first is None:
+            first = date_ordinal
+        last = date_ordinal
+
+    if first is None:
+        return []
+
+    return get_period_range_names(
+        date.fromordinal(first), date.fromordinal(last), date_format, unit
+    )
+
+
+def get_period_range_names(first, last, date_format, unit="year"):
+    if unit == "year":
+        period_date = date(first.year, 1, 1)
+        step = relativedelta(years=1)
+    else:
+        period_date = date(first.year, first.month, 1)
+        step = relativedelta(months=1)
+
+    names = []
+    while period_date <= last:
+        names.append(period_date.strftime(date_format))
+        period_date += step
+
+    return names
+
+
+def get_period_namer(date_format):
+    """Return a function giving the period name for a date ordinal,
+    memoized since postings share relatively few dates"""
+    names = {}
+
+    def get_name(date_ordinal):
+        name = names.get(date_ordinal)
+        if name is None:
+            name = names[date_ordinal] = date.fromordinal(date_ordinal).strftime(
+                date_format
+            )
+        return name
+
+    return get_name
+
+
+def get_columns(
+    postings, args, ledger_args, period_names, date_format, current_period=None
+):
+    """Return row headers and {period name: {row header: amount}} for all
+    the periods, from one pass over postings"""
+    if args.networth:
+        return get_columns_networth(
+            postings, ledger_args, period_names, date_format, args.month, current_period
+        )
+
+    get_row_header = get_payee if args.payees else get_account
+    totals = get_totals(
+        postings, ledger_args, period_names, date_format, current_period, get_row_header
+    )
+
+    row_headers = set()
+    columns = {}
+    for period_name in period_names:
+        if args.payees:
+            column = get_column_payees(totals[period_name])
+        else:
+            column = get_column_accounts(totals[period_name], args.depth)
+        row_headers.update(column.keys())
+        columns[period_name] = column
+
+    return row_headers, columns
+
+
+def get_totals(
+    postings,
+    ledger_args,
+    period_names,
+    date_format,
+    current_period=None,
+    get_row_header=get_account,
+):
+    """{period name: {row header: amount in units}}, where row headers are
+    accounts or payees"""
+    matches = query.get_matcher(ledger_args)
+    get_name = get_period_namer(date_format)
+    wanted = set(period_names)
+    today_ordinal = date.today().toordinal()
+
+    totals = defaultdict(lambda: defaultdict(int))
+    for posting in postings:
+        if posting.amount is None:  # shares without a price
+            continue
+        name = get_name(posting.date_ordinal)
+        if name not in wanted:
+            continue
+        if name == current_period and posting.date_ordinal > today_ordinal:
+            continue
+        if matches(posting.account, posting.payee):
+            totals[name][get_row_header(posting)] += posting.amount
+
+    return totals
+
+
+def get_column_accounts(account_totals, depth=0):
+    """Column amounts as ledger balance --flat would have them: accounts
+    without a balance left out, and each rounded to the cent"""
+    column = defaultdict(int)
+    for account, units in account_totals.items():
+        if units == 0:
+            continue
+        if depth > 0:
+            account = ":".join(account.split(":")[:depth])
+        column[account] += round(util.from_units(units), 2)
+
+    return column
+
+
+def get_column_payees(payee_totals):
+    """Column amounts as ledger's register --group-by (payee) --subtotal
+    would have them: payees without a total left out"""
+    return {
+        payee: round(util.from_units(units), 2)
+        for payee, units in payee_totals.items()
+        if units != 0
+    }
+
+
+def get_columns_networth(
+    postings, ledger_args, period_names, date_format, month=False, current_period=None
+):
+    """Net worth at the end of each period, from one cumulative pass over
+    postings rather than adding everything up again for every period
+
+    Shares are valued at their latest price by the end of the period,
+    from the prices file or postings (see prices.py).
+    """
+    accounts = tuple(util.parse_args(get_settings().NETWORTH_ACCOUNTS))
+    matches = query.get_matcher(accounts + ledger_args)
+    ends = get_period_end_ordinals(period_names, date_format, month, current_period)
+    price_history = prices.get_price_history(postings)
+
+    dollars = 0
+    shares = defaultdict(int)  # symbol: shares
+    position = 0
+    row_header = "net worth"
+    columns = {}
+    for period_name, end in zip(period_names, ends):
+        while position < len(postings) and postings[position].date_ordinal < end:
+            posting = postings[position]
+            position += 1
+            if not matches(posting.account, posting.payee):
+                continue
+            if posting.shares is None:
+                dollars += posting.amount
+            else:
+                shares[posting.symbol] += posting.shares
+
+        networth = dollars + price_history.get_value(shares, end - 1)
+        columns[period_name] = {row_header: round(util.from_units(networth), 2)}
+
+    return {row_header}, columns
+
+
+def get_period_end_ordinals(
+    period_names, date_format, month=False, current_period=None
+):
+    """Exclusive end of each period: the start of the next one, or
+    tomorrow for the current period"""
+    step = relativedelta(months=1) if month else relativedelta(years=1)
+    ends = []
+    for period_name in period_names:
+        if period_name == current_period:
+            end = date.today() + timedelta(days=1)
+        else:
+            end = util.get_date(period_name, date_format) + step
+        ends.append(end.toordinal())
+
+    return ends
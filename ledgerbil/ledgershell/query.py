@@ -0,0 +1,230 @@
+"""ledger arguments worked out in-process, for the native engine
+
+Handles the parts of ledger's query language that reports here use:
+account regexes, @payee (or payee/desc) terms, and not/and/or with
+parentheses, where terms next to each other are or'ed, as with ledger.
+Also simple begin/end dates and period expressions. Anything else is
+an LdgQueryError rather than a quietly different answer.
+"""
+
+import re
+from datetime import date, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from ..ledgerbilexceptions import LdgQueryError
+
+# --engine choices: run ledger, or work the report out in-process
+LEDGER_ENGINE = "ledger"
+NATIVE_ENGINE = "native"
+ENGINES = (LEDGER_ENGINE, NATIVE_ENGINE)
+
+NOT_WORDS = ("not", "!")
+AND_WORDS = ("and", "&")
+OR_WORDS = ("or", "|")
+PAYEE_WORDS = ("payee", "desc")
+UNSUPPORTED_WORDS = ("code", "note", "tag", "meta", "expr", "show", "only", "bold")
+UNSUPPORTED_PREFIXES = ("=", "%", "#")
+
+DATE_ARG_REGEX = re.compile(r"^(\d{4})(?:[-/.](\d\d?)(?:[-/.](\d\d?))?)?$")
+RELATIVE_DAYS = {"yesterday": -1, "today": 0, "tomorrow": 1}
+PERIOD_REGEX = re.compile(
+    r"^(?:(?:from|since)\s+(?P<begin>\S+))?\s*(?:(?:to|until)\s+(?P<end>\S+))?$"
+)
+
+
+def get_matcher(ledger_args):
+    """Return matches(account, payee) for a ledger query, memoized since
+    journals have few accounts and payees but many postings"""
+    tokens = get_tokens(ledger_args)
+    if not tokens:
+        return match_all
+
+    parser = QueryParser(tokens)
+    predicate = parser.parse()
+
+    memo = {}
+
+    def matches(account, payee):
+        key = (account, payee) if parser.uses_payee else account
+        if key not in memo:
+            memo[key] = predicate(account, payee)
+        return memo[key]
+
+    return matches
+
+
+def match_all(account, payee):
+    return True
+
+
+def get_tokens(ledger_args):
+    """Split arguments into query words, with parens as their own tokens,
+    e.g. "(^assets" is "(" and "^assets" (which is how settings like
+    NETWORTH_ACCOUNTS are written)"""
+    tokens = []
+    for arg in ledger_args:
+        if arg.startswith("-"):
+            raise LdgQueryError(f"Ledger option not supported by native engine: {arg}")
+
+        opening = len(arg) - len(arg.lstrip("("))
+        closing = len(arg) - len(arg.rstrip(")"))
+        stop = len(arg) - closing
+        word = arg[opening:stop]
+
+        tokens.extend("(" * opening)
+        if word:
+            tokens.append(word)
+        tokens.extend(")" * closing)
+
+    return tokens
+
+
+class QueryParser:
+    """Recursive descent over query tokens, producing a predicate
+
+    or_expr:  and_expr ([or] and_expr)*
+    and_expr: not_expr (and not_expr)*
+    not_expr: not not_expr | term
+    term:     ( or_expr ) | @payee | payee word | account regex
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+        self.uses_payee = False
+
+    def parse(self):
+        predicate = self.parse_or()
+        if self.peek() is not None:
+            raise LdgQueryError(f"Unexpected in query: {self.peek()}")
+        return predicate
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise LdgQueryError("Query ended unexpectedly")
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        predicates = [self.parse_and()]
+        while self.peek() not in (None, ")"):
+            if self.peek() in OR_WORDS:
+                self.next()
+            predicates.append(self.parse_and())
+
+        if len(predicates) == 1:
+            return predicates[0]
+        return lambda account, payee: any(p(account, payee) for p in predicates)
+
+    def parse_and(self):
+        predicates = [self.parse_not()]
+        while self.peek() in AND_WORDS:
+            self.next()
+            predicates.append(self.parse_not())
+
+        if len(predicates) == 1:
+            return predicates[0]
+        return lambda account, payee: all(p(account, payee) for p in predicates)
+
+    def parse_not(self):
+        if self.peek() in NOT_WORDS:
+            self.next()
+            predicate = self.parse_not()
+            return lambda account, payee: not predicate(account, payee)
+        return self.parse_term()
+
+    def parse_term(self):
+        token = self.next()
+        if token == "(":
+            predicate = self.parse_or()
+            if self.next() != ")":  # pragma: no cover (parse_or stops at ")")
+                raise LdgQueryError("Expected ) in query")
+            return predicate
+        if token == ")":
+            raise LdgQueryError("Unexpected ) in query")
+
+        if token in PAYEE_WORDS or token.startswith("@"):
+            self.uses_payee = True
+            pattern = self.next() if token in PAYEE_WORDS else token[1:]
+            search = get_search(pattern)
+            return lambda account, payee: search(payee) is not None
+
+        if token in UNSUPPORTED_WORDS or token.startswith(UNSUPPORTED_PREFIXES):
+            raise LdgQueryError(f"Query term not supported by native engine: {token}")
+
+        search = get_search(token)
+        return lambda account, payee: search(account) is not None
+
+
+def get_search(pattern):
+    # ledger's regexes ignore case
+    try:
+        return re.compile(pattern, re.IGNORECASE).search
+    except re.error as e:
+        raise LdgQueryError(f"Bad regex in query: {pattern}: {e}")
+
+
+def get_date_span(value, today=None):
+    """(first date, first date after) for a date argument such as 2018,
+    2018/07, 2018/07/04, or today; a year or month covers all of it"""
+    value = value.strip().lower()
+    today = today or date.today()
+    if value in RELATIVE_DAYS:
+        the_date = today + timedelta(days=RELATIVE_DAYS[value])
+        return the_date, the_date + timedelta(days=1)
+
+    m = DATE_ARG_REGEX.match(value)
+    if not m:
+        raise LdgQueryError(f"Date not supported by native engine: {value}")
+
+    year, month, day = m.groups()
+    try:
+        if day:
+            the_date = date(int(year), int(month), int(day))
+            return the_date, the_date + timedelta(days=1)
+        if month:
+            the_date = date(int(year), int(month), 1)
+            return the_date, the_date + relativedelta(months=1)
+        the_date = date(int(year), 1, 1)
+        return the_date, the_date + relativedelta(years=1)
+    except ValueError as e:
+        raise LdgQueryError(f"Invalid date: {value}: {e}")
+
+
+def get_date_range(begin=None, end=None, period=None, today=None):
+    """(begin, end) dates for --begin, --end, and --period, either of which
+    may be None for no limit; end is exclusive, as with ledger"""
+    begin_date = get_date_span(begin, today)[0] if begin else None
+    end_date = get_date_span(end, today)[0] if end else None
+
+    if period:
+        period_begin, period_end = get_period_range(period, today)
+        if period_begin and (begin_date is None or period_begin > begin_date):
+            begin_date = period_begin
+        if period_end and (end_date is None or period_end < end_date):
+            end_date = period_end
+
+    return begin_date, end_date
+
+
+def get_period_range(period, today=None):
+    """(begin, end) for a period: a date (e.g. 2018 is all of 2018), or
+    from/since and/or to/until dates"""
+    period = period.strip().lower()
+    if DATE_ARG_REGEX.match(period) or period in RELATIVE_DAYS:
+        return get_date_span(period, today)
+
+    m = PERIOD_REGEX.match(period)
+    if not m or not (m.group("begin") or m.group("end")):
+        raise LdgQueryError(f"Period not supported by native engine: {period}")
+
+    begin = get_date_span(m.group("begin"), today)[0] if m.group("begin") else None
+    end = get_date_span(m.group("end"), today)[0] if m.group("end") else None
+    return begin, end
@@ -1,14 +1,15 @@
 import os
 import subprocess
 
-from ..settings_getter import get_setting
+from ..settings_getter import get_settings
 
 
 def get_ledger_command(args=None):
+    settings = get_settings()
     files = []
-    for f in get_setting("LEDGER_FILES"):
-        files += ["-f", os.path.join(get_setting("LEDGER_DIR"), f)]
-    return get_setting("LEDGER_COMMAND") + tuple(files) + (args or ())
+    for f in settings.LEDGER_FILES:
+        files += ["-f", os.path.join(settings.LEDGER_DIR, f)]
+    return settings.LEDGER_COMMAND + tuple(files) + (args or ())
 
 
 def get_ledger_output(args=None):
@@ -8,7 +8,7 @@ import pytest
 from ... import settings, settings_getter
 from ...colorable import Colorable
 from ...tests.helpers import OutputFileTester
-from .. import grid
+from .. import grid, query
 
 
 class MockSettings:
@@ -870,8 +870,10 @@ def test_get_grid_report_month(mock_pnames, mock_cols, mock_rows, mock_report):
 
     args, ledger_args = grid.get_args(["--month", "nutmeg", "--transpose"])
     assert grid.get_grid_report(args, ledger_args) == flat_report
-    mock_pnames.assert_called_once_with(args, ledger_args, "month")
-    mock_cols.assert_called_once_with(args, ledger_args, period_names, None)
+    mock_pnames.assert_called_once_with(args, ledger_args, "month", postings=None)
+    mock_cols.assert_called_once_with(
+        args, ledger_args, period_names, None, postings=None
+    )
     mock_rows.assert_called_once_with(
         row_headers, columns, period_names, grid.SORT_DEFAULT, 0, False, no_total=False
     )
@@ -911,8 +913,10 @@ def test_get_grid_report_year(mock_pnames, mock_cols, mock_rows, mock_report):
         ]
     )
     assert grid.get_grid_report(args, ledger_args) == flat_report
-    mock_pnames.assert_called_once_with(args, ledger_args, "year")
-    mock_cols.assert_called_once_with(args, ledger_args, period_names, "basil")
+    mock_pnames.assert_called_once_with(args, ledger_args, "year", postings=None)
+    mock_cols.assert_called_once_with(
+        args, ledger_args, period_names, "basil", postings=None
+    )
     mock_rows.assert_called_once_with(
         row_headers, columns, period_names, "cloves", 20, False, no_total=False
     )
@@ -1126,6 +1130,36 @@ def test_main(mock_get_grid_report, mock_print):
     mock_print.assert_called_once_with("bananas!", end="")
 
 
+@mock.patch(__name__ + ".grid.get_rows")
+@mock.patch(__name__ + ".grid.native")
+@mock.patch(__name__ + ".grid.get_ledger_output")
+@mock.patch(__name__ + ".grid.journal.get_postings")
+def test_get_grid_report_native_engine(
+    mock_get_postings, mock_ledger_output, mock_native, mock_rows
+):
+    mock_get_postings.return_value = "postings"
+    mock_native.get_period_names.return_value = ["2017", "2018"]
+    mock_native.get_columns.return_value = (["e: food"], {})
+    mock_rows.return_value = [[2017, 2018, ""], [1, 2, "e: food"]]
+    args, ledger_args = grid.get_args(["--engine", "native", "--month", "food"])
+    grid.get_grid_report(args, ledger_args)
+
+    assert not mock_ledger_output.called
+    mock_native.get_period_names.assert_called_once_with(
+        "postings", args, ("food",), "%Y/%m", "month"
+    )
+    mock_native.get_columns.assert_called_once_with(
+        "postings", args, ("food",), ("2017", "2018"), "%Y/%m", None
+    )
+
+
+def test_args_engine():
+    args, _ = grid.get_args([])
+    assert args.engine == query.LEDGER_ENGINE
+    args, _ = grid.get_args(["--engine", "native"])
+    assert args.engine == query.NATIVE_ENGINE
+
+
 @mock.patch(__name__ + ".grid.print")
 @mock.patch(__name__ + ".grid.get_grid_report")
 def test_main_no_color(mock_get_grid_report, mock_print):
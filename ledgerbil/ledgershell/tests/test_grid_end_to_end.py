@@ -1,6 +1,5 @@
 # These tests actually run ledger for a bit of integration testing.
 # We'll try to have test_grid.py continue to test 100% of grid.py.
-import subprocess
 from textwrap import dedent
 from unittest import mock
 
@@ -9,20 +8,10 @@ import pytest
 from ... import settings, settings_getter
 from ...colorable import Colorable
 from ...tests import filetester as FT
-from ...tests.helpers import OutputFileTester
+from ...tests import helpers  # noqa: F401 (is used in patch)
+from ...tests.helpers import LEDGER, OutputFileTester, ledger_not_found
 from .. import grid
 
-LEDGER = "ledger"
-
-
-def ledger_not_found():
-    try:
-        subprocess.Popen([LEDGER, "--version"], stdout=subprocess.PIPE)
-        return False
-    except FileNotFoundError:
-        return True
-
-
 pytestmark = pytest.mark.skipif(ledger_not_found(), reason="ledger command not found")
 
 
@@ -46,7 +35,7 @@ def teardown_module():
     settings_getter.settings = settings.Settings()
 
 
-@mock.patch(__name__ + ".LEDGER", "fubar")
+@mock.patch(__name__ + ".helpers.LEDGER", "fubar")
 def test_ledger_not_found():
     assert ledger_not_found()
 
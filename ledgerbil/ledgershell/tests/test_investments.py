@@ -5,7 +5,9 @@ from unittest import mock
 import pytest
 
 from ... import settings, settings_getter
-from .. import investments
+from ...tests import helpers
+from ...tests.helpers import ledger_not_found
+from .. import investments, query
 
 
 class MockSettings:
@@ -415,3 +417,90 @@ def test_args_end_date(test_input, expected):
 def test_args_command(test_input, expected):
     args = investments.get_args(test_input)
     assert args.command is expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [(["--engine", "native"], "native"), ([], query.LEDGER_ENGINE)],
+)
+def test_args_engine(test_input, expected):
+    args = investments.get_args(test_input)
+    assert args.engine == expected
+
+
+class MockSettingsSample(helpers.MockSettingsSample, MockSettings):
+    LEDGER_COMMAND = (
+        helpers.LEDGER,
+        "--market",
+        "--price-db",
+        helpers.MockSettingsSample.PRICES_FILE,
+    )
+    INVESTMENT_DEFAULT_ACCOUNTS = "401k or ira or mutual or abc"
+    INVESTMENT_DEFAULT_END_DATE = "tomorrow"
+
+
+def get_native_report(args):
+    settings_getter.settings = MockSettingsSample()
+    args = investments.get_args(args + ["--engine", "native"])
+    return investments.Colorable.get_plain_string(
+        investments.get_investment_report(args)
+    )
+
+
+def test_get_investment_report_native():
+    expected = (
+        "                         $ 2,754.69   assets\n"
+        "                         $ 1,198.19      401k\n"
+        "       9.897 abcdx         $ 798.19        big co 500 idx\n"
+        "        20.0 lmnop         $ 400.00        bonds idx\n"
+        "                         $ 1,206.50      abc: xyz\n"
+        "        10.0 abcdx         $ 806.50        big co 500 idx\n"
+        "        20.0 lmnop         $ 400.00        bonds idx\n"
+        "        15.0 qwrty         $ 150.00      ira: glass idx\n"
+        "         5.0 yyzxx         $ 200.00      mutual: total idx\n"
+    )
+    # shares valued at prices in postings by the end date (11/03 @ $80.65)
+    # and otherwise from the prices file (lmnop is $20 as of 11/01)
+    assert get_native_report(["--end", "2017/11/04"]) == expected
+
+
+def test_get_investment_report_native_single_account():
+    expected = "        15.0 qwrty         $ 150.00   assets: ira: glass idx\n"
+    assert get_native_report(["-a", "ira", "-e", "2018"]) == expected
+
+
+@mock.patch(__name__ + ".investments.print")
+def test_get_investment_report_native_negative_dollars(mock_print):
+    get_native_report(["-a", "'401k: cash' and not @paycheck", "-e", "2017/11/16"])
+    output = investments.Colorable.get_plain_string(mock_print.call_args[0][0])
+    assert 'Negative dollar amount -189.0 for "assets: 401k: cash"' in output
+
+
+def test_main_native_errors(capsys):
+    settings_getter.settings = MockSettingsSample()
+    assert investments.main(["--engine", "native", "-e", "next month"]) == 1
+    assert investments.main(["--engine", "native", "-a", "ira --real"]) == 1
+    assert capsys.readouterr() == (
+        "",
+        "Date not supported by native engine: next month\n"
+        "Ledger option not supported by native engine: --real\n",
+    )
+
+
+@pytest.mark.skipif(ledger_not_found(), reason="ledger command not found")
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        ["-e", "2017/11/04"],
+        ["-e", "2018/01/01"],
+        ["-a", "401k", "-e", "2017/12"],
+        ["-a", "ira or mutual"],
+        ["-a", "401k and not cash"],
+    ],
+)
+def test_native_report_same_as_ledger_for_sample_data(test_input):
+    settings_getter.settings = MockSettingsSample()
+    args = investments.get_args(test_input)
+    ledger_report = investments.get_investment_report(args)
+    args.engine = query.NATIVE_ENGINE
+    assert investments.get_investment_report(args) == ledger_report
@@ -0,0 +1,292 @@
+from datetime import date
+from textwrap import dedent
+from unittest import mock
+
+import pytest
+
+from ... import settings, settings_getter
+from ...colorable import Colorable
+from ...journal import Posting
+from ...tests import filetester as FT
+from ...tests import helpers
+from ...tests.helpers import LEDGER, OutputFileTester, ledger_not_found
+from .. import grid, native, query
+
+
+class MockSettings:
+    LEDGER_COMMAND = (LEDGER,)
+    LEDGER_DIR = FT.testdir
+    LEDGER_FILES = ["grid-end-to-end.ldg"]
+    NETWORTH_ACCOUNTS = settings_getter.defaults["NETWORTH_ACCOUNTS"]
+    DATE_FORMAT_MONTH = settings_getter.defaults["DATE_FORMAT_MONTH"]
+
+
+class MockSettingsAltDateFormat(MockSettings):
+    DATE_FORMAT_MONTH = "%Y-%m"
+
+
+class MockSettingsSample(helpers.MockSettingsSample, MockSettings):
+    pass
+
+
+def setup_function():
+    settings_getter.settings = MockSettings()
+
+
+def teardown_function():
+    settings_getter.settings = settings.Settings()
+
+
+def get_report(args):
+    args, ledger_args = grid.get_args(args + ["--engine", "native"])
+    return Colorable.get_plain_string(grid.get_grid_report(args, ledger_args))
+
+
+def posting(date_string, account, amount, payee="someone"):
+    the_date = date(*map(int, date_string.split("/")))
+    return Posting(the_date.toordinal(), payee, account, "", amount, None, None)
+
+
+# These are the same reports as in test_grid_end_to_end, where ledger made
+# the expected files, so as to check the native engine gets the same thing
+
+
+@pytest.mark.parametrize(
+    "test_input, testfile",
+    [
+        (["expenses", "--sort", "row", "--transpose"], "flat_expenses"),
+        (["food"], "flat_transposed"),
+        (
+            ["expenses", "--sort", "row", "--month", "--transpose"],
+            "flat_monthly_expenses",
+        ),
+        (["--csv", "--transpose"], "csv_all"),
+        (["--payees", "expenses", "--transpose"], "flat_payees"),
+    ],
+)
+def test_native_report_same_as_ledger_report(test_input, testfile):
+    report = get_report(test_input)
+    helper = OutputFileTester(f"test_grid_end_to_end_{testfile}")
+    assert report == FT.read_file(helper.get_expected_filename(helper.testfile))
+
+
+def test_native_report_single_column():
+    expected = (
+        "          2018\n"
+        "       $ 57.40  expenses: food: groceries\n"
+        "       $ 42.17  expenses: food: dining out\n"
+        "  ------------\n"
+        "       $ 99.57\n"
+    )
+    assert get_report(["food", "--period", "2018", "--transpose"]) == expected
+
+
+def test_native_report_csv_single_row_and_column():
+    expected = ",expenses: food: groceries\n2018,57.4\n"
+    assert get_report(["--csv", "groceries", "--period", "2018"]) == expected
+
+
+def test_native_report_nothing_found():
+    assert get_report(["blarg"]) == ""
+
+
+def test_native_report_depth():
+    report = get_report(["--csv", "expenses", "--depth", "2", "--transpose"])
+    assert report.split("\n")[:3] == [
+        ",2017,2018,Total",
+        "expenses: taxes,458.77,0,458.77",
+        "expenses: healthcare,231.89,0,231.89",
+    ]
+
+
+@mock.patch(__name__ + ".grid.print")
+def test_native_report_errors(mock_print, capsys):
+    assert grid.main(["--engine", "native", "food", "--real"]) == 1
+    assert grid.main(["--engine", "native", "--period", "last year"]) == 1
+    assert not mock_print.called
+    assert capsys.readouterr().err == (
+        "Ledger option not supported by native engine: --real\n"
+        "Period not supported by native engine: last year\n"
+    )
+
+
+def test_get_period_names():
+    postings = [
+        posting("2016/12/31", "a: before", 1),
+        posting("2017/03/01", "e: food", 1),
+        posting("2017/04/01", "e: other", 1),
+        posting("2017/06/30", "e: food", 1),
+        posting("2017/07/01", "e: food", 1),
+    ]
+    args, ledger_args = grid.get_args(["food", "--begin", "2017"])
+    assert native.get_period_names(postings, args, ledger_args, "%Y/%m", "month") == [
+        "2017/03",
+        "2017/04",
+        "2017/05",
+        "2017/06",
+        "2017/07",
+    ]
+    args, ledger_args = grid.get_args(["food", "--end", "2017/07"])
+    assert native.get_period_names(postings, args, ledger_args, "%Y") == ["2017"]
+    args, ledger_args = grid.get_args(["--period", "2018"])
+    assert native.get_period_names(postings, args, ledger_args, "%Y") == []
+
+
+@mock.patch(__name__ + ".native.date")
+def test_get_columns_current_period(mock_date):
+    mock_date.today.return_value = date(2017, 6, 15)
+    mock_date.fromordinal = date.fromordinal
+    postings = [
+        posting("2017/05/31", "e: food", 1000000),
+        posting("2017/06/01", "e: food", 2000000),
+        posting("2017/06/15", "e: food", 3000000),
+        posting("2017/06/16", "e: food", 4000000),
+        posting("2017/06/16", "e: zero", 0),
+    ]
+    args, ledger_args = grid.get_args(["--month"])
+    period_names = ("2017/05", "2017/06")
+    row_headers, columns = native.get_columns(
+        postings, args, ledger_args, period_names, "%Y/%m", "2017/06"
+    )
+    assert row_headers == {"e: food"}
+    assert columns == {"2017/05": {"e: food": 1.0}, "2017/06": {"e: food": 5.0}}
+
+
+def test_get_columns_skips_shares_without_price():
+    postings = [
+        posting("2017/05/31", "a: cash", -5000000),
+        Posting(date(2017, 5, 31).toordinal(), "x", "a: ira", "", None, 1000000, "abc"),
+    ]
+    args, ledger_args = grid.get_args([])
+    assert native.get_columns(postings, args, ledger_args, ("2017",), "%Y") == (
+        {"a: cash"},
+        {"2017": {"a: cash": -5.0}},
+    )
+
+
+def test_get_column_accounts_rounds_to_cents():
+    totals = {"e: a: b": 1234567, "e: a: c": 1, "e: a": 0, "e: b": 5}
+    assert native.get_column_accounts(totals) == {
+        "e: a: b": 1.23,
+        "e: a: c": 0.0,
+        "e: b": 0.0,
+    }
+    assert native.get_column_accounts(totals, depth=2) == {"e: a": 1.23, "e: b": 0.0}
+
+
+def test_get_columns_payees():
+    postings = [
+        posting("2017/05/31", "e: food", 1000000, payee="a"),
+        posting("2017/05/31", "e: other", 5000, payee="a"),
+        posting("2017/05/31", "e: food", 5000, payee="a"),
+        posting("2017/05/31", "a: cash", -2010000, payee="a"),
+        posting("2017/06/01", "e: food", 2000000, payee="b"),
+        posting("2017/06/01", "e: food", -2000000, payee="b"),
+        posting("2017/06/02", "e: food", 3000000, payee="c"),
+    ]
+    args, ledger_args = grid.get_args(["--payees", "--month", "--depth", "1", "e:"])
+    assert native.get_columns(
+        postings, args, ledger_args, ("2017/05", "2017/06"), "%Y/%m"
+    ) == (
+        {"a", "c"},
+        {"2017/05": {"a": 1.01}, "2017/06": {"c": 3.0}},
+    )
+
+
+def test_native_report_networth():
+    expected = "          2017          2018\n    $ 1,427.71    $ 1,304.27  net worth\n"
+    assert get_report(["--net-worth", "--transpose"]) == expected
+
+
+def test_native_report_networth_different_date_format():
+    settings_getter.settings = MockSettingsAltDateFormat()
+    expected = "     net worth\n    $ 1,439.47  2017-11\n    $ 1,427.71  2017-12\n"
+    report = get_report(
+        ["--net-worth", "--month", "--begin", "2017/01", "--end", "2018"]
+    )
+    assert report == expected
+
+
+@mock.patch(__name__ + ".native.date")
+def test_get_columns_networth(mock_date):
+    mock_date.today.return_value = date(2018, 2, 15)
+    mock_date.fromordinal = date.fromordinal
+    settings_getter.settings = MockSettingsAltDateFormat()
+
+    def shares(date_string, account, shares, price):
+        the_date = date(*map(int, date_string.split("/")))
+        amount = None if price is None else shares * price // 1000000
+        return Posting(the_date.toordinal(), "x", account, "", amount, shares, "abc")
+
+    postings = [
+        posting("2017/12/01", "assets: cash", 100000000),
+        shares("2017/12/01", "assets: ira", 2000000, 10000000),
+        posting("2017/12/01", "assets: cash", -20000000),
+        posting("2017/12/31", "liabilities: card", -1000000),
+        # price goes up, even though not bought in an account we're counting
+        shares("2018/01/05", "equity: x", 1000000, 15000000),
+        shares("2018/01/06", "assets: ira", 1000000, None),
+        posting("2018/02/15", "assets: cash", -5000000),
+        posting("2018/02/16", "assets: cash", -7000000),
+        shares("2018/02/16", "assets: ira", 1000000, 20000000),
+    ]
+    args, ledger_args = grid.get_args(["--net-worth", "--month", "and", "not", "card"])
+    row_headers, columns = native.get_columns(
+        postings,
+        args,
+        ledger_args,
+        ("2017-11", "2017-12", "2018-01", "2018-02"),
+        "%Y-%m",
+        current_period="2018-02",
+    )
+    assert row_headers == {"net worth"}
+    assert columns == {
+        "2017-11": {"net worth": 0.0},
+        "2017-12": {"net worth": 100.0},
+        "2018-01": {"net worth": 125.0},
+        "2018-02": {"net worth": 120.0},
+    }
+
+
+def test_period_namer():
+    get_name = native.get_period_namer("%Y-%m")
+    assert get_name(date(2017, 5, 31).toordinal()) == "2017-05"
+    assert get_name(date(2017, 5, 31).toordinal()) == "2017-05"
+
+
+@pytest.mark.skipif(ledger_not_found(), reason="ledger command not found")
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        # (not parent: ledger --flat double counts parent and child accounts)
+        ["expenses", "and", "not", "parent"],
+        ["expenses", "and", "not", "parent", "--month"],
+        ["^i", "liabilities", "--month", "--depth", "2"],
+        ["checking", "cash", "--begin", "2018"],
+        ["food", "--period", "2018"],
+        ["expenses", "and", "not", "parent", "--current"],
+        ["--payees", "expenses", "--month"],
+        ["--payees", "food", "or", "gas", "--period", "2018"],
+        # (net worth without shares: ledger here isn't run with --market)
+        ["--net-worth", "--month", "and", "not", "(401k", "ira", "mutual", "abc)"],
+    ],
+)
+def test_native_report_same_as_ledger_for_sample_data(test_input):
+    settings_getter.settings = MockSettingsSample()
+    args, ledger_args = grid.get_args(test_input + ["--csv"])
+    ledger_report = grid.get_grid_report(args, ledger_args)
+    args.engine = query.NATIVE_ENGINE
+    native_report = grid.get_grid_report(args, ledger_args)
+    assert native_report == ledger_report
+
+
+def test_sample_data_native_report():
+    # same as ledger's, but doesn't double count parent account funds
+    settings_getter.settings = MockSettingsSample()
+    expected = dedent("""\
+        ,2019
+        expenses: parent: child,30.0
+        expenses: parent,20.0
+        Total,50.0
+    """)
+    assert get_report(["parent", "--csv", "--transpose"]) == expected
@@ -0,0 +1,169 @@
+from datetime import date
+
+import pytest
+
+from ...ledgerbilexceptions import LdgQueryError
+from ..query import (
+    get_date_range,
+    get_date_span,
+    get_matcher,
+    get_period_range,
+    get_tokens,
+)
+
+ACCOUNTS = [
+    "assets: checking",
+    "assets: home",
+    "liabilities: credit card",
+    "liabilities: mortgage: home",
+    "expenses: food: groceries",
+    "expenses: food: dining out",
+]
+
+
+def get_matching(*args, payee="someone"):
+    matches = get_matcher(args)
+    return [account for account in ACCOUNTS if matches(account, payee)]
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ((), []),
+        (("(^assets", "^liabilities)"), ["(", "^assets", "^liabilities", ")"]),
+        (("((a))", "b"), ["(", "(", "a", ")", ")", "b"]),
+        (("(", ")"), ["(", ")"]),
+    ],
+)
+def test_get_tokens(test_input, expected):
+    assert get_tokens(test_input) == expected
+
+
+def test_get_tokens_options_not_supported():
+    with pytest.raises(LdgQueryError) as excinfo:
+        get_tokens(("food", "--real"))
+    assert str(excinfo.value) == "Ledger option not supported by native engine: --real"
+
+
+def test_empty_query_matches_everything():
+    assert get_matching() == ACCOUNTS
+
+
+def test_terms_ignore_case_and_are_or_ed():
+    assert get_matching("FOOD") == [
+        "expenses: food: groceries",
+        "expenses: food: dining out",
+    ]
+    expected = ["assets: checking", "expenses: food: dining out"]
+    assert get_matching("checking", "dining") == expected
+    assert get_matching("checking", "or", "dining") == expected
+    assert get_matching("checking", "|", "dining") == expected
+
+
+def test_and_not_and_parens():
+    assert get_matching("(^assets", "^liabilities)", "and", "not", "home") == [
+        "assets: checking",
+        "liabilities: credit card",
+    ]
+    assert get_matching("home", "&", "!", "assets") == ["liabilities: mortgage: home"]
+    assert get_matching("not", "(", "s", ")") == []
+    # and binds tighter than or
+    assert get_matching("checking", "food", "and", "out") == [
+        "assets: checking",
+        "expenses: food: dining out",
+    ]
+
+
+def test_payee_terms():
+    assert get_matching("@some", payee="someone") == ACCOUNTS
+    assert get_matching("payee", "^one", payee="someone") == []
+    assert get_matching("food", "and", "desc", "ONE", payee="someone") == [
+        "expenses: food: groceries",
+        "expenses: food: dining out",
+    ]
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        (("food", ")"), "Unexpected in query: )"),
+        ((")",), "Unexpected ) in query"),
+        (("(", "food"), "Query ended unexpectedly"),
+        (("food", "and"), "Query ended unexpectedly"),
+        (("@(",), "Bad regex in query: (: missing ), unterminated subpattern"),
+        (("tag", "x"), "Query term not supported by native engine: tag"),
+        (("%x",), "Query term not supported by native engine: %x"),
+        (("=note",), "Query term not supported by native engine: =note"),
+    ],
+)
+def test_query_errors(test_input, expected):
+    with pytest.raises(LdgQueryError) as excinfo:
+        get_matcher(test_input)
+    assert str(excinfo.value).startswith(expected)
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("2018", (date(2018, 1, 1), date(2019, 1, 1))),
+        ("2018/12", (date(2018, 12, 1), date(2019, 1, 1))),
+        ("2018-2", (date(2018, 2, 1), date(2018, 3, 1))),
+        ("2018.02.28", (date(2018, 2, 28), date(2018, 3, 1))),
+        ("today", (date(2018, 7, 4), date(2018, 7, 5))),
+        (" Tomorrow", (date(2018, 7, 5), date(2018, 7, 6))),
+        ("yesterday", (date(2018, 7, 3), date(2018, 7, 4))),
+    ],
+)
+def test_get_date_span(test_input, expected):
+    assert get_date_span(test_input, today=date(2018, 7, 4)) == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("last year", "Date not supported by native engine: last year"),
+        ("2018/13", "Invalid date: 2018/13: month must be in 1..12"),
+    ],
+)
+def test_get_date_span_errors(test_input, expected):
+    with pytest.raises(LdgQueryError) as excinfo:
+        get_date_span(test_input)
+    assert str(excinfo.value) == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("2018", (date(2018, 1, 1), date(2019, 1, 1))),
+        ("today", (date(2018, 7, 4), date(2018, 7, 5))),
+        ("from 2017/06", (date(2017, 6, 1), None)),
+        ("since 2017", (date(2017, 1, 1), None)),
+        ("to 2018", (None, date(2018, 1, 1))),
+        ("until 2018/02/03", (None, date(2018, 2, 3))),
+        ("from 2017 to 2018/07", (date(2017, 1, 1), date(2018, 7, 1))),
+    ],
+)
+def test_get_period_range(test_input, expected):
+    assert get_period_range(test_input, today=date(2018, 7, 4)) == expected
+
+
+@pytest.mark.parametrize("test_input", ["last 2 years", "monthly", "from"])
+def test_get_period_range_not_supported(test_input):
+    with pytest.raises(LdgQueryError) as excinfo:
+        get_period_range(test_input)
+    assert str(excinfo.value) == f"Period not supported by native engine: {test_input}"
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ((None, None, None), (None, None)),
+        (("2017", "2019", None), (date(2017, 1, 1), date(2019, 1, 1))),
+        (("2017", "2019", "2018"), (date(2018, 1, 1), date(2019, 1, 1))),
+        (("2018/06", "2018/09", "2018"), (date(2018, 6, 1), date(2018, 9, 1))),
+        ((None, None, "from 2018"), (date(2018, 1, 1), None)),
+        ((None, "2018", "from 2017"), (date(2017, 1, 1), date(2018, 1, 1))),
+    ],
+)
+def test_get_date_range(test_input, expected):
+    assert get_date_range(*test_input) == expected
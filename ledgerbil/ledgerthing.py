@@ -1,21 +1,21 @@
 """objects in ledger file: transactions, etc"""
 
 import re
+import sys
 from collections import namedtuple
+from datetime import date
 
 from . import util
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
 from .ledgerbilexceptions import LdgReconcilerError
+from .ledgerlexer import DATE_REGEX, get_top_line
 
 UNSPECIFIED_PAYEE = "<Unspecified payee>"
 
-DATE_REGEX = r"^\d{4}(?:[-/]\d\d){2}(?=\s|$)"
-# not matching optional comment since we don't do anything with it
-TOP_LINE_REGEX = re.compile(
-    r"(" + DATE_REGEX + r")(?:\s+|$)"  # date with required whitespace (or $)
-    r"\s*([!*])?\s*"  # optional transaction state (c/p)
-    r"(?:\(([^)]*)\)\s*)?"  # optional transaction # and whitespace
-    r"(.*?)(?=  |$)"  # opt. payee ends with two spaces (or $)
-)
 # todo: should require amount when @ symbol is found
 POSTING_REGEX = re.compile(r"""(?x)  # verbose mode
     ^\s+                             # opening indent
@@ -31,6 +31,14 @@ POSTING_REGEX = re.compile(r"""(?x)  # verbose mode
     (?:\s*=\s*[^;]+\s*)?             # optional balance assertion
     (?:;.*$|$)                       # optional end comment
     """)
+# Runs of characters for scan_posting, matched without backtracking
+WHITESPACE_RUN = re.compile(r"\s*")
+SHARES_RUN = re.compile(r"[.,0-9]*")
+SYMBOL_RUN = re.compile(r"[^@; ]*")
+SHARES_START_CHARS = frozenset("-.,0123456789")
+AMOUNT_RUN = re.compile(r"[-+*/()$\d.,\s]*")
+LONG_GAP = " " * 8  # from about where the regex is slower than scan_posting
+
 REC_PENDING = "!"
 REC_CLEARED = "*"
 REC_UNCLEARED = ""
@@ -39,54 +47,313 @@ LedgerPosting = namedtuple("LedgerPosting", "status account shares symbol amount
 
 
 def get_ledger_posting(line):
-    m = POSTING_REGEX.match(line)
-    if not m:
+    groups = get_posting_groups(line)
+    if groups is None:
         return None
 
-    status, account, shares, symbol, amount = m.groups()
+    status, account, shares, symbol, amount = groups
 
+    # shares and amount are in integer units (see util.AMOUNT_SCALE)
     if shares is not None:
-        shares = util.get_float(shares)
+        shares = util.get_units(shares)
 
     if amount is not None:
         amount = amount.strip()
         if amount == "":
             amount = None
         else:
-            amount = util.eval_expr(re.sub(r"[$,]", "", amount))
+            amount = util.eval_amount(amount)
             if shares is not None:
-                amount *= shares
+                amount = util.multiply_units(amount, shares)
 
     return LedgerPosting(status, account, shares, symbol, amount)
 
 
+def get_posting_groups(line):
+    """POSTING_REGEX's groups for line, or None if it doesn't match
+
+    The regex is quickest for ordinary postings, but backtracks over long
+    gaps (e.g. before an aligned amount), and a long way on a line it
+    doesn't match, which for a right stripped line takes a comment or
+    trailing whitespace: those lines are scanned.
+    """
+    if LONG_GAP in line or ";" in line or line[-1:].isspace():
+        return scan_posting(line)
+    m = POSTING_REGEX.match(line)
+    return m.groups() if m else None
+
+
+def scan_posting(line):
+    """Return POSTING_REGEX's groups for line, or None if it doesn't match
+
+    Long lines with comments and odd spacing make the regex backtrack a
+    lot, so this scans for the same thing directly: the possible ends of
+    the account are tried in order, with what follows each checked the
+    way the regex would, first match wins. A few rare shapes (e.g. where
+    ! or * ends up starting the account) are left to the regex itself.
+    """
+    if "\n" in line:  # the regex's $ has its own ideas about these
+        return get_regex_groups(line)
+
+    indent = WHITESPACE_RUN.match(line).end()
+    if indent == 0:
+        return None
+
+    status = None
+    start = indent
+    if start < len(line) and line[start] in "!*":
+        status = line[start]
+        start = WHITESPACE_RUN.match(line, start + 1).end()
+
+    for end in get_account_ends(line, start):
+        rest = scan_posting_rest(line, end)
+        if rest is not None:
+            return (status, line[start:end]) + rest
+
+    if status is not None:
+        return get_regex_groups(line)
+
+    # (starting the account earlier in the indent can't end it anywhere new)
+    return None
+
+
+def get_regex_groups(line):
+    m = POSTING_REGEX.match(line)
+    return m.groups() if m else None
+
+
+def get_account_ends(line, start):
+    """Where the account may end: before two spaces or at the end of the
+    line, after something other than whitespace, and before any ;"""
+    size = len(line)
+    limit = line.find(";", start)
+    if limit == -1:
+        limit = size
+
+    position = start
+    while True:
+        end = line.find("  ", position, limit)
+        if end == -1:
+            break
+        if end > start and not line[end - 1].isspace():
+            yield end
+        position = end + 1
+
+    if limit == size and size > start and not line[-1].isspace():
+        yield size
+
+
+def scan_posting_rest(line, position):
+    """(shares, symbol, amount) for what follows the account, trying
+    with share info first, like the regex, or None if there's no match"""
+    shares_start = WHITESPACE_RUN.match(line, position).end()
+    if shares_start < len(line) and line[shares_start] in SHARES_START_CHARS:
+        options = get_share_info_options(line, shares_start)
+        for shares, symbol, amount_position in options:
+            amount = scan_amount(line, amount_position)
+            if amount is not False:
+                return shares, symbol, amount
+
+    amount = scan_amount(line, position)
+    if amount is not False:
+        return None, None, amount
+
+    return None
+
+
+def get_share_info_options(line, shares_start):
+    """(shares, symbol, where the amount would start) for each way the
+    optional share info can match, in the order the regex tries them"""
+    digits_start = shares_start
+    if line.startswith("-", digits_start):
+        digits_start = WHITESPACE_RUN.match(line, digits_start + 1).end()
+
+    digits_end = SHARES_RUN.match(line, digits_start).end()
+    for shares_end in range(digits_end, digits_start, -1):
+        shares = line[shares_start:shares_end]
+        if shares_end == digits_end:
+            # whitespace given back can start the symbol if it's a tab
+            space_end = WHITESPACE_RUN.match(line, shares_end).end()
+            symbol_starts = range(space_end, shares_end - 1, -1)
+        else:
+            symbol_starts = (shares_end,)
+
+        for symbol_start in symbol_starts:
+            symbol_max_end = SYMBOL_RUN.match(line, symbol_start).end()
+            for symbol_end in range(symbol_max_end, symbol_start, -1):
+                symbol = line[symbol_start:symbol_end]
+                at = WHITESPACE_RUN.match(line, symbol_end).end()
+                if line.startswith("@", at):
+                    yield shares, symbol, WHITESPACE_RUN.match(line, at + 1).end()
+                yield shares, symbol, symbol_end
+
+
+def scan_amount(line, position):
+    """The amount expression starting at position (None if there isn't
+    one) if the rest of the line is only a balance assertion and/or a
+    comment, else False"""
+    # Taking as much as possible is the only way to match: anything
+    # less leaves an amount character where only = or ; can go
+    amount_start = position
+    if line.startswith("(", position):
+        amount_start += 1
+    amount_end = AMOUNT_RUN.match(line, amount_start).end()
+
+    if not is_posting_end(line, amount_end):
+        return False
+    if amount_end == amount_start:
+        return None
+    return line[amount_start:amount_end]
+
+
+def is_posting_end(line, position):
+    """Is the rest of the line nothing, a comment, or a balance
+    assertion (= something) optionally followed by a comment?"""
+    if position == len(line) or line[position] == ";":
+        return True
+    if line[position] != "=":
+        return False
+
+    comment = line.find(";", position + 1)
+    if comment == -1:
+        comment = len(line)
+    return comment > position + 1
+
+
+class AccountMatches(dict):
+    """{account: does it match the reconcile account pattern?}, filled in
+    as accounts turn up, so that each is only searched once
+
+    literal is text any matching account must contain, if known, to
+    rule out most transactions without parsing them.
+    """
+
+    def __init__(self, rec_account):
+        super().__init__()
+        self.search = re.compile(rec_account).search
+        self.literal = get_required_literal(rec_account)
+
+    def __missing__(self, account):
+        matched = self[account] = self.search(account) is not None
+        return matched
+
+
+def get_required_literal(pattern):
+    """The longest literal text a regex can only match by containing,
+    e.g. "a: cash" for ^a: cash$, or None if there isn't any
+
+    Only looks at the top level of the pattern, so e.g. alternations and
+    groups give up, as do patterns ignoring case.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:  # pragma: no cover (re.compile will have complained)
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+
+    literals = []
+    run = []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(value))
+            continue
+        literals.append("".join(run))
+        run = []
+    literals.append("".join(run))
+
+    return max(literals, key=len) or None
+
+
+# Shared by all things for a run: journals have a few hundred accounts
+# but many, many postings
+account_matches_by_rec_account = {}
+
+
+def get_account_matches(rec_account):
+    account_matches = account_matches_by_rec_account.get(rec_account)
+    if account_matches is None:
+        account_matches = AccountMatches(rec_account)
+        account_matches_by_rec_account[rec_account] = account_matches
+    return account_matches
+
+
+def get_payee(payee):
+    """The payee from a top line, as things have it"""
+    if payee is None or payee.strip() == "":
+        return UNSPECIFIED_PAYEE
+    # the same payees turn up over and over
+    return sys.intern(payee.strip())
+
+
+def join_lines(lines):
+    """Lines as one string, or as a tuple if they can't be split back
+    apart from one (i.e. if they have line endings of their own)"""
+    text = "\n".join(lines)
+    if text.count("\n") != len(lines) - 1:
+        return tuple(lines)
+    return text
+
+
 class LedgerThing:
-    def __init__(self, lines, reconcile_account=None):
+    # There's one of these per transaction, so they're kept small: no
+    # __dict__, lines joined into one string, and the date as an ordinal
+    __slots__ = (
+        "thing_number",
+        "date_ordinal",
+        "payee",
+        "transaction_code",
+        "text",
+        "is_transaction",
+        "rec_account",
+        "rec_account_matched",
+        "rec_status",
+        "rec_amount",
+        "rec_is_shares",
+        "rec_symbol",
+        "rec_top_line_status",
+        "clean_date_ordinal",
+        "clean_rec_status",
+    )
+
+    def __init__(self, lines, reconcile_account=None, top_line=None):
         self.thing_number = None
-        self.thing_date = None
+        self.date_ordinal = None
         self.payee = None
         self.transaction_code = ""  # e.g. check number
-        self.lines = list(lines)
+        self.text = join_lines(lines)
         self.is_transaction = False
 
         # reconciliation
         self.rec_account = reconcile_account  # could be partial
         self.rec_account_matched = None  # full account name
         self.rec_status = None
-        self.rec_amount = 0  # can be dollars or num shares if rec_is_shares
+        # dollars or num shares if rec_is_shares, in util.AMOUNT_SCALE units
+        self.rec_amount = 0
         self.rec_is_shares = False
         self.rec_symbol = None
 
         # not currently supported by reconciler - error out if matched account
         self.rec_top_line_status = False  # e.g. 2018/07/07 * payee name
 
-        if self.is_transaction_start(lines[0]):
+        # top_line is the ledgerlexer.TopLine for lines[0], if already known
+        if top_line is None:
+            top_line = get_top_line(lines[0])
+
+        if top_line:
             self.is_transaction = True
-            self.parse_top_line(lines[0])
+            self.set_top_line(top_line)
 
-        if self.is_transaction and self.rec_account:
+        if self.is_transaction and self.rec_account and self.may_match(lines):
             self.parse_transaction_lines(lines[1:])
 
+        # the state lines already show: get_lines only has work to do
+        # once the date or status moves on from it
+        self.clean_date_ordinal = self.date_ordinal
+        self.clean_rec_status = self.rec_status
+        if self.rec_account_matched and self.render_lines(lines) != list(lines):
+            self.clean_date_ordinal = None  # e.g. indent to be evened out
+
     def __repr__(self):
         return (
             f"{self.__class__.__name__}({self.get_lines()}, "
@@ -96,13 +363,27 @@ class LedgerThing:
     def __str__(self):
         return "\n".join(self.get_lines())
 
-    def parse_top_line(self, line):
-        m = TOP_LINE_REGEX.match(line)
+    @property
+    def lines(self):
+        if isinstance(self.text, tuple):
+            return list(self.text)
+        return self.text.split("\n")
+
+    @property
+    def thing_date(self):
+        if self.date_ordinal is None:
+            return None
+        return date.fromordinal(self.date_ordinal)
+
+    @thing_date.setter
+    def thing_date(self, value):
+        self.date_ordinal = None if value is None else value.toordinal()
 
-        the_date, status, code, payee = m.groups()
+    def set_top_line(self, top_line):
+        the_date, status, code, payee = top_line
 
         # date can be modified
-        self.thing_date = util.get_date(the_date)
+        self.thing_date = the_date
 
         if status:
             self.rec_top_line_status = True  # pending or cleared
@@ -110,10 +391,17 @@ class LedgerThing:
         # payee and transaction code are read-only
         if code is not None:
             self.transaction_code = str(code)
-        if payee is None or payee.strip() == "":
-            self.payee = UNSPECIFIED_PAYEE
-        else:
-            self.payee = payee.strip()
+        self.payee = get_payee(payee)
+
+    def may_match(self, lines):
+        """Could any posting's account match rec_account? (If a literal
+        it needs isn't anywhere in the text, there's no need to parse.)"""
+        literal = get_account_matches(self.rec_account).literal
+        if literal is None:
+            return True
+        if isinstance(self.text, str):
+            return literal in self.text
+        return any(literal in line for line in lines)
 
     def parse_transaction_lines(self, lines):
         if not self.rec_account or not lines:
@@ -124,7 +412,7 @@ class LedgerThing:
         # reconciling. We only care about total for the account,
         # but we need to total everything up in case our account
         # doesn't have a dollar amount and we need to calculate it.
-        transaction_total = 0  # Always in dollars
+        transaction_total = 0  # Always in dollars (units, as amounts are)
         account_total = 0  # Dollars or number of shares
         need_math = False
 
@@ -135,6 +423,7 @@ class LedgerThing:
         matched_accounts = set()
         shareses = set()
         symbols = set()
+        account_matches = get_account_matches(self.rec_account)
 
         for line in lines:
             posting = get_ledger_posting(line)
@@ -144,8 +433,7 @@ class LedgerThing:
             if posting.amount is not None:
                 transaction_total += posting.amount
 
-            m = re.search(self.rec_account, posting.account)
-            if not m:
+            if not account_matches[posting.account]:
                 continue
 
             self.assert_not_top_line_status()
@@ -190,23 +478,28 @@ class LedgerThing:
                 self.rec_symbol = symbols.pop()
 
     def get_lines(self):
-        if not self.is_transaction:
-            return list(self.lines)
+        lines = self.lines
+        if not self.is_changed():
+            return lines
+
+        return self.render_lines(lines)
 
-        lines_out = [re.sub(DATE_REGEX, self.get_date_string(), self.lines[0])]
+    def render_lines(self, lines):
+        lines_out = [re.sub(DATE_REGEX, self.get_date_string(), lines[0])]
 
         if self.rec_account_matched is None:
-            return lines_out + self.lines[1:]
+            return lines_out + lines[1:]
 
         current_status = self.rec_status or " "
+        account_matches = get_account_matches(self.rec_account)
 
-        for line in self.lines[1:]:
+        for line in lines[1:]:
             posting = get_ledger_posting(line)
             if not posting:  # i.e. a comment
                 lines_out.append(line)
                 continue
 
-            if re.search(self.rec_account, posting.account):
+            if account_matches[posting.account]:
                 m = re.match(r"^\s+[!*]?\s*(.*)$", line)
                 assert m
                 # going to use a standard 4 space indent; alternatively
@@ -218,6 +511,21 @@ class LedgerThing:
 
         return list(lines_out)
 
+    def is_changed(self):
+        """Is there a date or status change that lines don't show yet?"""
+        return self.is_transaction and (
+            self.date_ordinal != self.clean_date_ordinal
+            or self.rec_status != self.clean_rec_status
+        )
+
+    def update_lines(self):
+        """Make lines show the current date and status, e.g. once the
+        thing has been written out like that"""
+        if self.is_changed():
+            self.text = join_lines(self.get_lines())
+            self.clean_date_ordinal = self.date_ordinal
+            self.clean_rec_status = self.rec_status
+
     @staticmethod
     def is_new_thing(line):
         # currently, is_new_thing == is_transaction_start, but this
@@ -226,11 +534,7 @@ class LedgerThing:
 
     @staticmethod
     def is_transaction_start(line):
-        match = re.match(TOP_LINE_REGEX, line)
-        if match:
-            return util.is_valid_date(match.groups()[0])
-        else:
-            return False
+        return get_top_line(line) is not None
 
     def assert_only_one_status(self, statuses):
         if len(set(statuses)) > 1:
@@ -0,0 +1,225 @@
+"""on-disk cache of parsed ledger files
+
+Cached things are keyed by file path, reconcile account and date format,
+and are only used if the file's size, modification time and content hash
+all still match, or if the file has only been appended to, in which case
+all but the last thing are used and parsing picks up from there. (Ledger
+journals mostly grow at the end.) The cache directory is capped in size,
+with least recently used entries evicted first.
+
+Things are stored with marshal as plain tuples of their attributes, which
+loads several times faster than pickling the objects themselves. The same
+encoding is used to send things parsed in other processes back to this one.
+"""
+
+import gc
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+from operator import attrgetter
+
+from .ledgerthing import LedgerThing
+from .settings_getter import get_setting
+
+# Bump CACHE_VERSION whenever LedgerThing.__slots__ or what they hold change
+CACHE_VERSION = 5
+CACHE_FORMAT = (CACHE_VERSION, marshal.version, sys.version_info[:2])
+CACHE_SUFFIX = ".cache"
+CACHE_ERRORS = (OSError, EOFError, ValueError, TypeError, KeyError)
+
+get_row = attrgetter(*LedgerThing.__slots__)
+
+FileStamp = namedtuple("FileStamp", "size mtime_ns digest")
+
+
+def get_cache_dir():
+    return get_setting("PARSE_CACHE_DIR")
+
+
+def get_file_stamp(filename, data):
+    stat = os.stat(filename)
+    return FileStamp(stat.st_size, stat.st_mtime_ns, get_digest(data))
+
+
+def get_digest(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def get_cache_filename(cache_dir, filename, reconcile_account):
+    key = "\0".join(
+        [
+            os.path.abspath(filename),
+            reconcile_account or "",
+            get_setting("DATE_FORMAT"),
+        ]
+    )
+    name = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, f"{name}{CACHE_SUFFIX}")
+
+
+def load_things(filename, reconcile_account, stamp, data):
+    """Return the cached things that are still good for the file's data,
+    and the byte offset in data from which the rest needs to be parsed
+
+    For an unchanged file, that's all the things and the end of the data.
+    If the file has only been appended to, it's all but the last thing,
+    and the offset where the last thing starts, since appended lines may
+    belong to it. Otherwise, nothing: ([], 0)
+    """
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return [], 0
+
+    cache_filename = get_cache_filename(cache_dir, filename, reconcile_account)
+    try:
+        with open(cache_filename, "rb") as the_file, paused_gc():
+            # (much faster than marshal.load reading from the file)
+            entry = marshal.loads(the_file.read())
+        if entry["format"] != CACHE_FORMAT:
+            return [], 0
+
+        if entry["stamp"] == tuple(stamp):
+            offset = len(data)
+            rows = entry["rows"]
+        elif is_appended(data, FileStamp(*entry["stamp"])) and entry["tail_offset"]:
+            offset = entry["tail_offset"]
+            rows = entry["rows"][:-1]
+        else:
+            return [], 0
+
+        things = get_things(rows)
+    except FileNotFoundError:
+        return [], 0
+    except CACHE_ERRORS as e:
+        print(f"Error reading parse cache: {e}", file=sys.stderr)
+        return [], 0
+
+    try:
+        os.utime(cache_filename)  # least recently used is by mtime
+    except OSError:  # pragma: no cover
+        pass
+
+    return things, offset
+
+
+def is_appended(data, previous_stamp):
+    return len(data) > previous_stamp.size and (
+        get_digest(data[: previous_stamp.size]) == previous_stamp.digest
+    )
+
+
+def save_things(filename, reconcile_account, stamp, things, tail_offset=0):
+    """Save things parsed from the file, along with tail_offset, the byte
+    offset where the last thing starts (0 if it's the only thing)"""
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return
+
+    cache_filename = get_cache_filename(cache_dir, filename, reconcile_account)
+    temp_filename = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=cache_dir, suffix=".tmp", delete=False
+        ) as the_file:
+            temp_filename = the_file.name
+            the_file.write(marshal.dumps(get_entry(stamp, things, tail_offset)))
+        os.replace(temp_filename, cache_filename)
+        evict(cache_dir, get_setting("PARSE_CACHE_SIZE"))
+    except CACHE_ERRORS as e:
+        print(f"Error writing parse cache: {e}", file=sys.stderr)
+        if temp_filename and os.path.exists(temp_filename):
+            os.remove(temp_filename)
+
+
+def get_entry(stamp, things, tail_offset):
+    return {
+        "format": CACHE_FORMAT,
+        "stamp": tuple(stamp),
+        "tail_offset": tail_offset,
+        "rows": get_rows(things),
+    }
+
+
+def get_rows(things):
+    """A tuple of slot values per thing, which marshal can handle"""
+    return [get_row(thing) for thing in things]
+
+
+def get_things(rows):
+    things = []
+    with paused_gc():
+        for row in rows:
+            thing = LedgerThing.__new__(LedgerThing)
+            # in LedgerThing.__slots__ order; unpacking like this is
+            # several times faster than setattr in a loop
+            (
+                thing.thing_number,
+                thing.date_ordinal,
+                thing.payee,
+                thing.transaction_code,
+                thing.text,
+                thing.is_transaction,
+                thing.rec_account,
+                thing.rec_account_matched,
+                thing.rec_status,
+                thing.rec_amount,
+                thing.rec_is_shares,
+                thing.rec_symbol,
+                thing.rec_top_line_status,
+                thing.clean_date_ordinal,
+                thing.clean_rec_status,
+            ) = row
+            things.append(thing)
+
+    return things
+
+
+def dump_things(things):
+    return marshal.dumps(get_rows(things))
+
+
+def load_things_dump(dumped):
+    with paused_gc():
+        return get_things(marshal.loads(dumped))
+
+
+@contextmanager
+def paused_gc():
+    # Building lots of objects at once sets off the garbage collector
+    # over and over, for no benefit since they're all being kept
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def evict(cache_dir, max_size):
+    """Remove least recently used entries until under max_size bytes"""
+    # Entries can disappear underneath us when files are loaded in
+    # parallel (ledgerbil --jobs), with each process evicting
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX):
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
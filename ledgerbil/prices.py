@@ -0,0 +1,133 @@
+"""share price history, for valuing holdings at market prices in-process
+
+Prices come from P directives in the prices file (settings.PRICES_FILE,
+which ledger is given with --price-db), e.g.
+
+    P 2017/11/01 abcdx      $80
+
+and from postings with prices, e.g. 1.5 abcdx @ $81.23, as ledger does.
+They're kept in per-symbol lists sorted by date, so that the price on a
+date is a binary search away.
+"""
+
+import re
+from bisect import bisect_right
+from collections import defaultdict
+
+from . import util
+from .ledgerbilexceptions import LdgJournalError
+from .settings_getter import get_setting
+
+PRICE_REGEX = re.compile(
+    r"^P\s+(?P<date>\S+)(?:\s+\d\d?:\d\d(?::\d\d)?)?"  # date and optional time
+    r"\s+(?P<symbol>[^\s\d$][^\s$]*)"
+    r"\s+(?P<price>\$\s*-?[\d,.]+)\s*(?:;.*)?$"
+)
+
+
+class PriceHistory:
+    def __init__(self, prices=()):
+        """prices: (symbol, date ordinal, price in units) in any order; for
+        several prices on the same date, the last one wins"""
+        by_symbol = defaultdict(list)
+        for position, (symbol, date_ordinal, price) in enumerate(prices):
+            by_symbol[symbol].append((date_ordinal, position, price))
+
+        self.dates = {}
+        self.prices = {}
+        for symbol, symbol_prices in by_symbol.items():
+            symbol_prices.sort()
+            self.dates[symbol] = [date_ordinal for date_ordinal, _, _ in symbol_prices]
+            self.prices[symbol] = [price for _, _, price in symbol_prices]
+
+    def __contains__(self, symbol):
+        return symbol in self.dates
+
+    def get_price(self, symbol, date_ordinal):
+        """Latest price on or before the date, or None if there isn't one"""
+        dates = self.dates.get(symbol)
+        if not dates:
+            return None
+        position = bisect_right(dates, date_ordinal)
+        if position == 0:
+            return None
+        return self.prices[symbol][position - 1]
+
+    def get_prices(self, symbol, date_ordinals):
+        """get_price for many dates at once"""
+        return [self.get_price(symbol, date_ordinal) for date_ordinal in date_ordinals]
+
+    def get_value(self, shares, date_ordinal):
+        """Dollar value in units of {symbol: shares in units} on the date;
+        shares without a price by then aren't counted"""
+        value = 0
+        for symbol, symbol_shares in shares.items():
+            price = self.get_price(symbol, date_ordinal)
+            if price is not None:
+                value += util.multiply_units(symbol_shares, price)
+        return value
+
+    def get_values(self, shares, date_ordinals):
+        """get_value for many dates at once"""
+        return [self.get_value(shares, date_ordinal) for date_ordinal in date_ordinals]
+
+
+def get_price_history(postings=(), filenames=None):
+    """PriceHistory from P directives in the files (by default the prices
+    file from settings, if any) and from postings with prices"""
+    if filenames is None:
+        prices_file = get_setting("PRICES_FILE")
+        filenames = [prices_file] if prices_file else []
+
+    prices = []
+    for filename in filenames:
+        prices.extend(read_prices(filename))
+    prices.extend(get_posting_prices(postings))
+
+    return PriceHistory(prices)
+
+
+def read_prices(filename):
+    """(symbol, date ordinal, price in units) for each P directive"""
+    try:
+        with open(filename, encoding="utf-8") as the_file:
+            lines = the_file.read().splitlines()
+    except OSError as e:
+        raise LdgJournalError(f"Error reading prices file: {e}")
+
+    prices = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.startswith("P"):
+            continue
+        m = PRICE_REGEX.match(line)
+        if not m:
+            continue  # e.g. prices in other commodities than dollars
+        try:
+            the_date = util.get_date(m.group("date"))
+        except ValueError:
+            raise LdgJournalError(
+                f"Invalid date in prices file {filename}, line {line_number}: {line}"
+            )
+        prices.append(
+            (
+                m.group("symbol"),
+                the_date.toordinal(),
+                util.eval_amount(m.group("price")),
+            )
+        )
+
+    return prices
+
+
+def get_posting_prices(postings):
+    """(symbol, date ordinal, price in units) for postings with prices"""
+    return [
+        (posting.symbol, posting.date_ordinal, get_posting_price(posting))
+        for posting in postings
+        if posting.shares and posting.amount is not None
+    ]
+
+
+def get_posting_price(posting):
+    """Price per share in units, e.g. $10 for 1.5 abc @ $10"""
+    return round(posting.amount * util.AMOUNT_SCALE / posting.shares)
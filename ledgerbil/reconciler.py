@@ -6,11 +6,10 @@ import sys
 from dataclasses import dataclass
 from datetime import date
 
-from . import util
+from . import holdings, journal, util
 from .colorable import Colorable
-from .ledgerbilexceptions import LdgReconcilerError
-from .ledgershell.runner import get_ledger_output
-from .ledgershell.util import get_account_balance_generic
+from .ledgerbilexceptions import LdgJournalError, LdgReconcilerError
+from .ledgerthing import REC_CLEARED
 from .settings_getter import get_setting
 
 NO_PREVIOUS_DATE = "-"
@@ -201,6 +200,7 @@ class Reconciler(cmd.Cmd):
     def populate_open_transactions(self):
         self.open_transactions = []
         self.current_listing = {}
+        # totals are in integer units, as rec_amount is
         self.total_cleared = 0
         self.total_pending = 0
         self.is_shares = False
@@ -249,13 +249,15 @@ class Reconciler(cmd.Cmd):
 
     def get_current_listing_index_from_amount(self, amount, mark=True):
         try:
-            matches = [
-                key
-                for key, thing in self.current_listing.items()
-                if float(thing.rec_amount) == float(amount)
-            ]
+            units = util.get_units(amount)
         except ValueError:
-            matches = []
+            return None
+
+        matches = [
+            key
+            for key, thing in self.current_listing.items()
+            if thing.rec_amount == units
+        ]
 
         if not matches:
             return None
@@ -363,7 +365,8 @@ class Reconciler(cmd.Cmd):
                     code=thing.transaction_code,
                     payee=util.Colorable("cyan", thing.payee, fmt="40"),
                     amount=self.get_colored_amount(
-                        thing.rec_amount, colwidth=16 if self.is_shares else 13
+                        util.from_units(thing.rec_amount),
+                        colwidth=16 if self.is_shares else 13,
                     ),
                     status=thing.rec_status or "",
                 )
@@ -392,14 +395,16 @@ class Reconciler(cmd.Cmd):
             "{newline}ending date: {end_date} ending balance: {end_balance} "
             "cleared: {cleared}".format(
                 newline=newline,
-                cleared=self.get_colored_amount(self.total_cleared),
+                cleared=self.get_colored_amount(util.from_units(self.total_cleared)),
                 end_balance=end_balance,
                 end_date=Colorable("cyan", util.get_date_string(self.ending_date)),
             )
         )
 
         if self.ending_balance is not None:
-            to_zero = self.get_colored_amount(self.get_zero_candidate())
+            to_zero = self.get_colored_amount(
+                util.from_units(self.get_zero_candidate())
+            )
             print(f"to zero: {to_zero}")
 
         print()
@@ -487,7 +492,7 @@ class Reconciler(cmd.Cmd):
             print("*** Ending balance must be set in order to finish")
             return
 
-        if util.get_amount_str(self.get_zero_candidate()) != "0.00":
+        if util.get_amount_str(util.from_units(self.get_zero_candidate())) != "0.00":
             print('"To zero" must be zero in order to finish')
             return
 
@@ -507,7 +512,9 @@ class Reconciler(cmd.Cmd):
         self.populate_open_transactions()
 
     def get_zero_candidate(self):
-        return self.ending_balance - (self.total_cleared + self.total_pending)
+        """In units; ending_balance is kept as entered, in dollars or shares"""
+        ending_balance = util.to_units(self.ending_balance)
+        return ending_balance - (self.total_cleared + self.total_pending)
 
     @staticmethod
     def get_response(prompt="", old_value=""):
@@ -623,27 +630,46 @@ def reconciled_status():
         print("No previously reconciled accounts found")
         return
 
-    query = ("balance", "--cleared", "--no-total", "--flat", "--exchange", ".")
-    balance_lines = get_ledger_output(query).split("\n")
-
-    ledger_balances = {}
-    for balance_line in balance_lines:
-        account_balance = get_account_balance_generic(balance_line)
-        # The only way we won't have an AccountBalance object is if there
-        # are no --cleared balances in our ledger data, so that we received
-        # an empty response from ledger which turned into [''] in the split
-        # above. This seems highly unlikely, but we'll still handle it
-        # here, and the report will still accurately point out discrepancies.
-        if account_balance:
-            ledger_balances[account_balance.account] = account_balance.amount
+    try:
+        cleared_balances = get_cleared_balances(accounts)
+    except LdgJournalError as e:
+        return util.handle_error(str(e))
 
-    for account in accounts:
-        if account in ledger_balances:
-            accounts[account].ledger_balance = ledger_balances[account]
+    for account, balance in cleared_balances.items():
+        accounts[account].ledger_balance = balance
 
     return reconciled_status_report(accounts)
 
 
+def get_cleared_balances(accounts, postings=None):
+    """{account: balance} for the accounts with a cleared balance, the same
+    as ledger balance --cleared --flat --exchange . shows: shares for
+    accounts with shares, otherwise dollars
+
+    This adds up postings from the journal in-process rather than running
+    ledger, skipping transactions that have nothing cleared.
+    """
+    if postings is None:
+        postings = journal.get_postings(may_match=journal.may_have_cleared)
+
+    balances = holdings.get_balances(
+        postings,
+        matches=lambda account, payee: account in accounts,
+        status=REC_CLEARED,
+    )
+
+    cleared_balances = {}
+    for account, balance in balances.items():
+        if balance.shares:
+            # (the reconciler only allows one symbol per account)
+            shares = next(iter(balance.shares.values()))
+            cleared_balances[account] = util.from_units(shares)
+        elif balance.dollars != 0:
+            cleared_balances[account] = round(util.from_units(balance.dollars), 2)
+
+    return cleared_balances
+
+
 def get_accounts_reconciled_data():
     cache = get_reconciler_cache()
     accounts = {}
@@ -1,19 +1,19 @@
-from .ledgerfile import LedgerFile, remove_trailing_blank_lines
+from .ledgerfile import LedgerFile
 from .schedulething import ScheduleThing
 
 
 class ScheduleFile(LedgerFile):
+    # parsing sets ScheduleThing class level config
+    cacheable = False
+
     def __init__(self, filename):
         ScheduleThing.do_file_config = True
         ScheduleThing.enter_days = 0
         ScheduleThing.entry_boundary_date = None
         super().__init__(filename, reconcile_account=None)
 
-    def add_thing_from_lines(self, lines):
-        lines = remove_trailing_blank_lines(lines)
-        if lines:
-            thing = ScheduleThing(lines)
-            self.add_things([thing])
+    def get_thing(self, lines, top_line=None):
+        return ScheduleThing(lines)
 
     def next_scheduled_date(self):
         self.sort()
@@ -22,6 +22,8 @@ THING_CONFIG_LABEL = "schedule"
 
 
 class ScheduleThing(LedgerThing):
+    __slots__ = ("first_thing", "interval_uom", "days", "interval")
+
     do_file_config = True
     enter_days = 0
     entry_boundary_date = None
@@ -1,4 +1,6 @@
 import os
+from collections import namedtuple
+from contextlib import contextmanager
 
 try:
     from .settings import Settings
@@ -27,12 +29,64 @@ defaults = {
     "INVESTMENT_DEFAULT_ACCOUNTS": "401k or ira or mutual",
     "INVESTMENT_DEFAULT_END_DATE": "tomorrow",
     "NETWORTH_ACCOUNTS": "(^assets ^liabilities)",
+    "PARSE_CACHE_DIR": None,
+    "PARSE_CACHE_SIZE": 50 * 1024 * 1024,
     "RECONCILER_CACHE_FILE": reconciler_cache_file,
 }
 
 
+_snapshot = None
+_snapshot_source = None
+
+
 def get_setting(setting, default=None):
-    if settings and hasattr(settings, setting):
-        return getattr(settings, setting)
+    return getattr(get_settings(), setting, default)
+
+
+def get_settings():
+    """Return an immutable snapshot of all settings, with defaults filled
+    in, for hot paths to read as plain attributes
+
+    The snapshot is made once and remade only if settings is replaced,
+    e.g. by tests. (Changes made to the settings object itself won't be
+    seen; use override_settings for those.)
+    """
+    global _snapshot, _snapshot_source
+    if _snapshot is None or _snapshot_source is not settings:
+        _snapshot = make_snapshot(settings)
+        _snapshot_source = settings
+
+    return _snapshot
+
+
+def make_snapshot(the_settings, **overrides):
+    values = dict(defaults)
+    if the_settings:
+        values.update(
+            (name, getattr(the_settings, name))
+            for name in dir(the_settings)
+            if is_setting_name(name)
+        )
+    values.update(overrides)
+    snapshot_class = namedtuple("SettingsSnapshot", sorted(values))
+    return snapshot_class(**values)
+
+
+def is_setting_name(name):
+    return name.isupper() and not name.startswith("_")
+
+
+@contextmanager
+def override_settings(**overrides):
+    """Use the current settings with some replaced, e.g. in tests:
 
-    return defaults.get(setting, default)
+    with override_settings(DATE_FORMAT="%Y-%m-%d"):
+        ...
+    """
+    global settings
+    previous = settings
+    settings = make_snapshot(previous, **overrides)
+    try:
+        yield settings
+    finally:
+        settings = previous
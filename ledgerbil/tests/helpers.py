@@ -6,10 +6,15 @@ OutputFileTesterStdout: Redirect standard out to file for easier diffing
                         and maintenance of expected results. Generate
                         and look for files in a standard location with
                         standard suffixes.
+
+ledger_not_found: For skipping tests that need ledger itself
+
+MockSettingsSample: Settings for the journal in the sample directory
 """
 
 import filecmp
 import os
+import subprocess
 import sys
 from io import StringIO
 from unittest import TestCase
@@ -17,6 +22,31 @@ from unittest import TestCase
 from ..colorable import Colorable
 from . import filetester as FT
 
+LEDGER = "ledger"
+SAMPLE_DIR = os.path.join(os.path.dirname(FT.path), "..", "sample")
+
+
+def ledger_not_found():
+    try:
+        subprocess.Popen([LEDGER, "--version"], stdout=subprocess.PIPE)
+        return False
+    except FileNotFoundError:
+        return True
+
+
+class MockSettingsSample:
+    """Mix in ahead of a test module's own MockSettings"""
+
+    LEDGER_DIR = SAMPLE_DIR
+    LEDGER_FILES = [
+        "accounts.ldg",
+        "payees.ldg",
+        "misc.ldg",
+        "investments.ledger",
+        "journal.ledger",
+    ]
+    PRICES_FILE = os.path.join(SAMPLE_DIR, "prices.db.ldg")
+
 
 class OutputFileTesterBase:
     OUT_SUFFIX = ".out"
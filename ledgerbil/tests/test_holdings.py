@@ -0,0 +1,89 @@
+from datetime import date
+
+from ..holdings import Balance, TreeLine, get_balances, get_tree_lines
+from ..journal import Posting
+
+
+def ordinal(year, month, day):
+    return date(year, month, day).toordinal()
+
+
+def dollars(account, amount, status="", the_date=(2018, 1, 1), payee="x"):
+    return Posting(ordinal(*the_date), payee, account, status, amount, None, None)
+
+
+def shares(account, units, symbol, amount=None, status="", the_date=(2018, 1, 1)):
+    return Posting(ordinal(*the_date), "x", account, status, amount, units, symbol)
+
+
+def test_get_balances():
+    postings = [
+        dollars("a: cash", 5000000),
+        shares("a: ira", 1000000, "abc", amount=10000000),
+        shares("a: ira", 500000, "xyz"),
+        shares("a: ira", -500000, "xyz"),
+        dollars("a: cash", -1000000, status="*"),
+        dollars("e: food", 1000000, the_date=(2018, 1, 2)),
+    ]
+    assert get_balances(postings) == {
+        "a: cash": Balance(4000000, {}),
+        "a: ira": Balance(0, {"abc": 1000000}),
+        "e: food": Balance(1000000, {}),
+    }
+    assert get_balances(postings, end_ordinal=ordinal(2018, 1, 2)) == {
+        "a: cash": Balance(4000000, {}),
+        "a: ira": Balance(0, {"abc": 1000000}),
+    }
+    assert get_balances(postings, status="*") == {"a: cash": Balance(-1000000, {})}
+    assert get_balances(postings, matches=lambda account, payee: "ira" in account) == {
+        "a: ira": Balance(0, {"abc": 1000000})
+    }
+
+
+def test_get_tree_lines():
+    balances = {
+        "assets: 401k: big co 500 idx": Balance(0, {"abcdx": 9897000}),
+        "assets: 401k: bonds idx": Balance(0, {"lmnop": 20000000}),
+        "assets: 401k: cash": Balance(189000000, {}),
+        "assets: ira: glass idx": Balance(0, {"qwrty": 15000000}),
+        "assets: mutual: total idx": Balance(0, {"yyzxx": 5000000}),
+        "assets: zero": Balance(0, {}),
+    }
+    all_shares = {
+        "abcdx": 9897000,
+        "lmnop": 20000000,
+        "qwrty": 15000000,
+        "yyzxx": 5000000,
+    }
+    assert get_tree_lines(balances) == [
+        TreeLine("assets", 0, 189000000, all_shares, False),
+        TreeLine(" 401k", 1, 189000000, {"abcdx": 9897000, "lmnop": 20000000}, False),
+        TreeLine(" big co 500 idx", 2, 0, {"abcdx": 9897000}, True),
+        TreeLine(" bonds idx", 2, 0, {"lmnop": 20000000}, True),
+        TreeLine(" cash", 2, 189000000, {}, True),
+        TreeLine(" ira: glass idx", 1, 0, {"qwrty": 15000000}, True),
+        TreeLine(" mutual: total idx", 1, 0, {"yyzxx": 5000000}, True),
+    ]
+
+
+def test_get_tree_lines_single_account():
+    balances = {"assets: ira: glass idx": Balance(0, {"qwrty": 15000000})}
+    assert get_tree_lines(balances) == [
+        TreeLine("assets: ira: glass idx", 0, 0, {"qwrty": 15000000}, True)
+    ]
+
+
+def test_get_tree_lines_parents_with_postings_or_nothing_in_total():
+    balances = {
+        "a: b": Balance(1000000, {}),
+        "a: b: c": Balance(2000000, {}),
+        "x: y": Balance(1000000, {}),
+        "x: z": Balance(-1000000, {}),
+    }
+    assert get_tree_lines(balances) == [
+        TreeLine("a: b", 0, 3000000, {}, False),
+        TreeLine(" c", 1, 2000000, {}, True),
+        TreeLine("x", 0, 0, {}, False),
+        TreeLine(" y", 1, 1000000, {}, True),
+        TreeLine(" z", 1, -1000000, {}, True),
+    ]
@@ -0,0 +1,276 @@
+import os
+from textwrap import dedent
+
+import pytest
+
+from .. import journal, settings, settings_getter
+from ..journal import Posting, get_account_name, get_postings
+from ..ledgerbilexceptions import LdgJournalError
+from . import filetester as FT
+
+
+class MockSettings:
+    LEDGER_DIR = FT.testdir
+    LEDGER_FILES = ["grid-end-to-end.ldg"]
+
+
+def setup_function():
+    settings_getter.settings = MockSettings()
+
+
+def teardown_function():
+    settings_getter.settings = settings.Settings()
+
+
+def get_test_postings(data):
+    with FT.temp_file(data) as filename:
+        return get_postings([filename])
+
+
+def test_get_journal_filenames():
+    assert journal.get_journal_filenames() == [
+        os.path.join(FT.testdir, "grid-end-to-end.ldg")
+    ]
+
+
+def test_get_postings_from_settings_files():
+    postings = get_postings()
+    assert len(postings) == 22
+    # elided amount filled in, in place
+    assert postings[0] == Posting(
+        736634, "food and stuff", "expenses: food: groceries", "", 22870000, None, None
+    )
+    assert postings[1] == Posting(
+        736634, "food and stuff", "expenses: home: stuff: in", "", 10000000, None, None
+    )
+    assert sum(posting.amount for posting in postings) == 0
+
+
+def test_get_postings_sorted_by_date_across_files():
+    second = dedent("""\
+        2017/11/02 in between
+            e: second
+            a: second  $-2
+    """)
+    first = dedent("""\
+        2017/11/03 later
+            e: first  $3
+            a: first
+
+        2017/11/01 earlier
+            e: first  $1
+            a: first
+    """)
+    with FT.temp_file(first) as first_file, FT.temp_file(second) as second_file:
+        postings = get_postings([first_file, second_file])
+    assert [(p.payee, p.account, p.amount) for p in postings] == [
+        ("earlier", "e: first", 1000000),
+        ("earlier", "a: first", -1000000),
+        ("in between", "e: second", 2000000),
+        ("in between", "a: second", -2000000),
+        ("later", "e: first", 3000000),
+        ("later", "a: first", -3000000),
+    ]
+
+
+def test_aliases_only_apply_after_they_are_defined():
+    data = dedent("""\
+        2017/11/01 before
+            e: food  $1
+            a: cash
+
+        account expenses  ; comment
+            note not an alias
+            alias e
+        alias a=assets
+
+        2017/11/02 after
+            e: food  $1
+            a: cash
+            a  $0
+    """)
+    postings = get_test_postings(data)
+    assert [p.account for p in postings] == [
+        "e: food",
+        "a: cash",
+        "expenses: food",
+        "assets: cash",
+        "assets",
+    ]
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("e: food", "expenses: food"),
+        ("e", "expenses"),
+        ("ex: food", "ex: food"),
+        ("(e: budget)", "expenses: budget"),
+        ("[a: b]", "a: b"),
+        ("e:food: e", "expenses:food: e"),
+    ],
+)
+def test_get_account_name(test_input, expected):
+    assert get_account_name(test_input, {"e": "expenses"}) == expected
+
+
+def test_status_from_top_line_or_posting():
+    data = dedent("""\
+        2017/11/01 * cleared
+            e: food  $1
+            a: cash
+
+        2017/11/02 uncleared
+          ! e: food  $1
+          * a: cash
+    """)
+    postings = get_test_postings(data)
+    assert [p.status for p in postings] == ["*", "*", "!", "*"]
+
+
+def test_shares_and_elided_amounts():
+    data = dedent("""\
+        2017/11/01 bought
+            a: ira: abc  1.5 abc @ $10
+            a: checking
+
+        2017/11/02 moved without a price
+            a: ira: abc  -1.5 abc
+            a: ira: xyz  2 xyz @ $5
+            a: 401k: abc
+            a: cash
+    """)
+    with pytest.raises(LdgJournalError) as excinfo:
+        get_test_postings(data)
+    assert str(excinfo.value) == (
+        "Only one posting with an elided amount is allowed per transaction:\n"
+        "2017-11-02 moved without a price\n"
+        "    a: cash"
+    )
+
+    postings = get_test_postings(data.replace("    a: cash\n", "    a: cash  $-10\n"))
+    assert [(p.account, p.amount, p.shares, p.symbol) for p in postings] == [
+        ("a: ira: abc", 15000000, 1500000, "abc"),
+        ("a: checking", -15000000, None, None),
+        ("a: ira: abc", None, -1500000, "abc"),
+        ("a: ira: xyz", 10000000, 2000000, "xyz"),
+        ("a: 401k: abc", None, 1500000, "abc"),
+        ("a: cash", -10000000, None, None),
+    ]
+
+
+def test_virtual_postings_are_not_balanced():
+    data = dedent("""\
+        2017/11/01 budget
+            e: food  $10
+            (b: food)  $-10
+            a: cash
+    """)
+    postings = get_test_postings(data)
+    assert [(p.account, p.amount) for p in postings] == [
+        ("e: food", 10000000),
+        ("b: food", -10000000),
+        ("a: cash", -10000000),
+    ]
+
+
+def test_other_things_are_skipped():
+    data = dedent("""\
+        ; a comment
+        P 2017/11/01 abc $10
+        = expenses
+            (budget)  -1
+
+        ~ monthly
+            e: rent  $100
+            a: checking
+
+        2017/11/01 lunch  ; comment
+            ; comment
+            e: food  $10  ; comment
+            a: cash
+        ; end of transaction
+            a: not a posting  $1
+    """)
+    postings = get_test_postings(data)
+    assert [(p.payee, p.account, p.amount) for p in postings] == [
+        ("lunch", "e: food", 10000000),
+        ("lunch", "a: cash", -10000000),
+    ]
+
+
+def test_unspecified_payee():
+    postings = get_test_postings("2017/11/01\n    e: food  $1\n    a: cash\n")
+    assert {p.payee for p in postings} == {"<Unspecified payee>"}
+    postings = get_test_postings("2017/11/01   \n    e: food  $1\n    a: cash\n")
+    assert {p.payee for p in postings} == {"<Unspecified payee>"}
+
+
+def test_trailing_whitespace():
+    data = (
+        "2017/11/01 payee \n"
+        "    e: food         $1  \n"
+        "    e: misc \n"
+        "    a: cash        $-3\t\n"
+        "\n"
+        "2017/11/02 payee\n"
+        "    e: food         $1\n"
+        "    a: cash\n"
+    )
+    postings = get_test_postings(data)
+    assert [(p.payee, p.account, p.amount) for p in postings] == [
+        ("payee", "e: food", 1000000),
+        ("payee", "e: misc", 2000000),
+        ("payee", "a: cash", -3000000),
+        ("payee", "e: food", 1000000),
+        ("payee", "a: cash", -1000000),
+    ]
+
+
+def test_file_not_found():
+    with pytest.raises(LdgJournalError) as excinfo:
+        get_postings([os.path.join(FT.testdir, "nope.ldg")])
+    assert str(excinfo.value).startswith("Error reading ledger file: ")
+
+
+def test_get_postings_may_match_cleared():
+    data = dedent("""\
+        2017/11/01 * cleared
+            e: food         $1
+            a: cash
+
+        2017/11/02 uncleared
+            e: food         $2
+            a: cash
+
+        2017/11/03 cleared posting
+            e: food         $3
+          * a: cash
+
+        2017/11/04 ! pending
+            e: food         $4
+            a: cash
+    """)
+    with FT.temp_file(data) as filename:
+        postings = get_postings([filename], may_match=journal.may_have_cleared)
+    assert [(p.payee, p.account, p.status) for p in postings] == [
+        ("cleared", "e: food", "*"),
+        ("cleared", "a: cash", "*"),
+        ("cleared posting", "e: food", ""),
+        ("cleared posting", "a: cash", "*"),
+    ]
+
+
+def test_notes_and_cleared_postings():
+    data = dedent("""\
+        2017/11/01 payee
+            ; a note on the transaction
+            e: food         $1
+            ; a note on the posting
+          * a: cash
+    """)
+    postings = get_test_postings(data)
+    assert [(p.account, p.status, p.amount) for p in postings] == [
+        ("e: food", "", 1000000),
+        ("a: cash", "*", -1000000),
+    ]
@@ -5,7 +5,7 @@ from unittest import mock
 import pytest
 from dateutil.relativedelta import relativedelta
 
-from ..ledgerbilexceptions import ERROR_RETURN_VALUE
+from ..ledgerbilexceptions import ERROR_RETURN_VALUE, LdgReconcilerError
 from . import filetester as FT
 from .helpers import Redirector
 from .test_schedulefile import schedule_testdata
@@ -68,13 +68,206 @@ def test_sorting_multiple_files(mock_init, mock_sort, mock_write_file):
         with FT.temp_file("; no data 2") as file2:
             ledgerbil.main(["--file", file1, "--file", file2, "--sort"])
 
-    assert mock_init.call_args_list == [mock.call(file1, None), mock.call(file2, None)]
+    assert mock_init.call_args_list == [
+        mock.call(file1, None, lazy=False, jobs=1),
+        mock.call(file2, None, lazy=False, jobs=1),
+    ]
     # It would be nice to be able to further confirm that each instance
     # of Ledgerfile called these methods
     assert mock_sort.call_args_list == [mock.call(), mock.call()]
     assert mock_write_file.call_args_list == [mock.call(), mock.call()]
 
 
+def test_main_sort_with_jobs():
+    """with --jobs, worker processes should sort and write each file"""
+    testdata = FT.read_file(FT.alpha_unsortedfile)
+    expected = FT.read_file(FT.alpha_sortedfile)
+    with FT.temp_file(testdata) as file1:
+        with FT.temp_file(testdata) as file2:
+            ledgerbil.main(["-f", file1, "-f", file2, "--sort", "--jobs", "2"])
+            assert FT.read_file(file1) == expected
+            assert FT.read_file(file2) == expected
+
+
+@pytest.mark.parametrize("sort", [True, False])
+def test_process_file(sort):
+    """process_file is what --jobs workers run: check it in-process"""
+    testdata = FT.read_file(FT.alpha_unsortedfile)
+    expected = FT.read_file(FT.alpha_sortedfile) if sort else testdata
+    with FT.temp_file(testdata) as templedgerfile:
+        ledgerbil.process_file(templedgerfile, sort)
+        assert FT.read_file(templedgerfile) == expected
+
+
+@mock.patch(__name__ + ".ledgerbil.process_file")
+def test_process_files_with_one_job_stays_in_process(mock_process_file):
+    with mock.patch(__name__ + ".ledgerbil.ProcessPoolExecutor") as mock_executor:
+        ledgerbil.process_files(["a", "b"], True, 1, 5)
+    assert not mock_executor.called
+    assert mock_process_file.call_args_list == [
+        mock.call("a", True, 5, 1),
+        mock.call("b", True, 5, 1),
+    ]
+
+
+@mock.patch(__name__ + ".ledgerbil.process_file")
+def test_process_files_with_one_file_gets_all_jobs(mock_process_file):
+    with mock.patch(__name__ + ".ledgerbil.ProcessPoolExecutor") as mock_executor:
+        ledgerbil.process_files(["a"], True, 4)
+    assert not mock_executor.called
+    mock_process_file.assert_called_once_with("a", True, None, 4)
+
+
+def test_main_sort_one_file_with_jobs_parses_in_chunks():
+    testdata = FT.read_file(FT.alpha_unsortedfile)
+    expected = FT.read_file(FT.alpha_sortedfile)
+    with FT.temp_file(testdata) as templedgerfile:
+        with mock.patch(
+            __name__ + ".ledgerbil.LedgerFile", wraps=ledgerbil.LedgerFile
+        ) as mock_ledgerfile:
+            ledgerbil.main(["-f", templedgerfile, "--sort", "--jobs", "2"])
+        mock_ledgerfile.assert_called_once_with(templedgerfile, jobs=2)
+        assert FT.read_file(templedgerfile) == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [(FT.alpha_sortedfile, None), (FT.alpha_unsortedfile, ERROR_RETURN_VALUE)],
+)
+def test_main_check_sorted(test_input, expected):
+    original = FT.read_file(test_input)
+    with FT.temp_file(original) as templedgerfile:
+        result = ledgerbil.main(["--file", templedgerfile, "--check-sorted"])
+        assert FT.read_file(templedgerfile) == original
+    assert result == expected
+
+
+def test_main_check_sorted_multiple_files():
+    result = ledgerbil.main(
+        ["-f", FT.alpha_sortedfile, "-f", FT.alpha_unsortedfile, "--check-sorted"]
+    )
+    assert result == ERROR_RETURN_VALUE
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_main_sort_with_sort_run_size(jobs):
+    """files should be sorted through sorted runs on disk"""
+    testdata = FT.read_file(FT.alpha_unsortedfile)
+    expected = FT.read_file(FT.alpha_sortedfile)
+    with FT.temp_file(testdata) as file1:
+        with FT.temp_file(testdata) as file2:
+            ledgerbil.main(
+                ["-f", file1, "-f", file2, "-S", "--sort-run-size", "2", "-j", jobs]
+            )
+            assert FT.read_file(file1) == expected
+            assert FT.read_file(file2) == expected
+
+
+@mock.patch(__name__ + ".ledgerbil.LedgerFile.sort_external")
+@mock.patch(__name__ + ".ledgerbil.LedgerFile.sort")
+def test_sort_run_size_uses_external_sort(mock_sort, mock_sort_external):
+    with FT.temp_file("; ledger file") as ledger_filename:
+        ledgerbil.main(["-f", ledger_filename, "-S", "--sort-run-size", "7"])
+    mock_sort_external.assert_called_once_with(7)
+    assert not mock_sort.called
+
+
+@mock.patch(__name__ + ".ledgerbil.process_files")
+@mock.patch(__name__ + ".ledgerbil.LedgerFile.__init__")
+def test_jobs_files_go_to_workers(mock_init, mock_process_files):
+    mock_init.return_value = None
+    ledgerbil.main(["-f", "a", "-f", "b", "--sort", "--jobs", "3"])
+    assert not mock_init.called
+    mock_process_files.assert_called_once_with(["a", "b"], True, 3, None)
+
+
+@mock.patch(__name__ + ".ledgerbil.run_scheduler")
+@mock.patch(__name__ + ".ledgerbil.process_files")
+@mock.patch(__name__ + ".ledgerbil.LedgerFile.__init__")
+def test_jobs_scheduler_file_stays_in_main_process(
+    mock_init, mock_process_files, mock_scheduler
+):
+    mock_init.return_value = None
+    mock_scheduler.return_value = None
+    ledgerbil.main(["-f", "a", "-f", "b", "-s", "sched", "--jobs", "2"])
+    assert mock_init.call_args_list == [mock.call("a", None, lazy=False, jobs=2)]
+    mock_process_files.assert_called_once_with(["b"], False, 2, None)
+
+
+@mock.patch(__name__ + ".ledgerbil.run_reconciler")
+@mock.patch(__name__ + ".ledgerbil.matching_account_found")
+@mock.patch(__name__ + ".ledgerbil.process_files")
+@mock.patch(__name__ + ".ledgerbil.LedgerFile.__init__")
+@pytest.mark.parametrize(
+    "test_input, filenames, lazy",
+    [
+        # lazy if the account has literal text to look for without parsing
+        ("cash", ["a", "b"], True),
+        ("^a: (cash|check)", ["a", "b"], True),
+        ("(?i)cash", ["a"], False),
+    ],
+)
+def test_jobs_with_reconciler_used_for_chunks(
+    mock_init,
+    mock_process_files,
+    mock_match,
+    mock_reconciler,
+    test_input,
+    filenames,
+    lazy,
+):
+    mock_init.return_value = None
+    mock_match.return_value = True
+    args = [arg for filename in filenames for arg in ["-f", filename]]
+    ledgerbil.main(args + ["-r", test_input, "--jobs", "2"])
+    assert mock_init.call_args_list == [
+        mock.call(filename, test_input, lazy=lazy, jobs=2) for filename in filenames
+    ]
+    assert not mock_process_files.called
+    mock_reconciler.assert_called_once()
+
+
+@mock.patch(__name__ + ".ledgerbil.run_reconciler")
+@mock.patch(__name__ + ".ledgerbil.load_files")
+@mock.patch(__name__ + ".ledgerbil.LedgerFile.__init__")
+def test_jobs_with_reconciler_regex_loads_files_in_workers(
+    mock_init, mock_load_files, mock_reconciler
+):
+    mock_load_files.return_value = [mock.Mock(rec_account_matched="a: cash")]
+    ledgerbil.main(["-f", "a", "-f", "b", "-r", "(?i)cash", "--jobs", "3"])
+    assert not mock_init.called
+    mock_load_files.assert_called_once_with(["a", "b"], "(?i)cash", 3)
+    mock_reconciler.assert_called_once_with(mock_load_files.return_value)
+
+
+def test_load_files_same_as_loaded_here():
+    filenames = [FT.test_reconcile, FT.testfile, FT.alpha_sortedfile]
+    ledgerfiles = ledgerbil.load_files(filenames, "(?i)^a: cash", 2)
+    assert [lf.rec_account_matched for lf in ledgerfiles] == ["a: cash"] * 2 + [None]
+    for ledgerfile, filename in zip(ledgerfiles, filenames):
+        expected = ledgerbil.LedgerFile(filename, "(?i)^a: cash")
+        assert ledgerfile.filename == filename
+        assert [thing.get_lines() for thing in ledgerfile.things] == [
+            thing.get_lines() for thing in expected.things
+        ]
+
+
+def test_load_files_only_one_matching_account():
+    testdata = "2020/01/01 payee\n    e: misc\n    {}  $-1\n"
+    with FT.temp_file(testdata.format("a: cash")) as file1:
+        with FT.temp_file(testdata.format("a: petty cash")) as file2:
+            with pytest.raises(LdgReconcilerError) as excinfo:
+                ledgerbil.load_files([file1, file2], "cash$", 2)
+    expected = "More than one matching account:\n    a: cash\n    a: petty cash"
+    assert str(excinfo.value) == expected
+
+
+def test_load_files_error_in_worker():
+    with FT.temp_file(FT.read_file(FT.test_rec_multiple_match)) as file1:
+        with pytest.raises(LdgReconcilerError):
+            ledgerbil.load_files([file1, FT.testfile], "checking", 2)
+
+
 class MainErrors(Redirector):
     def test_main_next_scheduled_date(self):
         ledgerbil.main(["--next-scheduled-date"])
@@ -86,6 +279,23 @@ class MainErrors(Redirector):
         expected = "error: -f/--file is required"
         assert self.redirecterr.getvalue().strip() == expected
 
+    def test_main_jobs_must_be_positive(self):
+        ledgerbil.main(["--file", "a", "--jobs", "0"])
+        expected = "error: -j/--jobs must be at least 1"
+        assert self.redirecterr.getvalue().strip() == expected
+
+    def test_main_sort_run_size_must_be_positive(self):
+        ledgerbil.main(["--file", "a", "--sort-run-size", "0"])
+        expected = "error: --sort-run-size must be at least 1"
+        assert self.redirecterr.getvalue().strip() == expected
+
+    @mock.patch(__name__ + ".ledgerbil.process_files")
+    def test_main_sort_run_size_requires_sort(self, mock_process_files):
+        ledgerbil.main(["--file", "a", "--sort-run-size", "2"])
+        expected = "error: --sort-run-size requires -S/--sort"
+        assert self.redirecterr.getvalue().strip() == expected
+        assert not mock_process_files.called
+
 
 def get_schedule_file(the_date, schedule, enter_days=7):
     return (
@@ -449,3 +659,27 @@ def test_args_reconciled_status(test_input, expected):
         options.append(test_input)
     args = ledgerbil.get_args(options)
     assert args.reconciled_status is expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected", [(["-j", "4"], 4), (["--jobs", "2"], 2), ([], 1)]
+)
+def test_args_jobs(test_input, expected):
+    args = ledgerbil.get_args(["-f", "gargle"] + test_input)
+    assert args.jobs == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected", [(["--sort-run-size", "500"], 500), ([], None)]
+)
+def test_args_sort_run_size(test_input, expected):
+    args = ledgerbil.get_args(["-f", "gargle"] + test_input)
+    assert args.sort_run_size == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected", [(["--check-sorted"], True), ([], False)]
+)
+def test_args_check_sorted(test_input, expected):
+    args = ledgerbil.get_args(["-f", "gargle"] + test_input)
+    assert args.check_sorted is expected
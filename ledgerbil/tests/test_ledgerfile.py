@@ -1,11 +1,14 @@
 import datetime
+import os
+import pickle
 import sys
+import tempfile
 from textwrap import dedent
 from unittest import mock
 
 import pytest
 
-from .. import ledgerfile  # noqa: F401 (is used in patch)
+from .. import ledgerfile, parsecache, settings, settings_getter
 from ..ledgerbilexceptions import LdgReconcilerError
 from ..ledgerfile import LedgerFile
 from ..ledgerthing import LedgerThing
@@ -13,17 +16,29 @@ from . import filetester as FT
 from .helpers import Redirector
 
 
+@pytest.mark.parametrize("kwargs", [{}, {"lazy": True}, {"jobs": 2}])
 @mock.patch(__name__ + ".ledgerfile.open")
 @mock.patch(__name__ + ".ledgerfile.print")
-def test_file_problem(mock_print, mock_open):
+def test_file_problem(mock_print, mock_open, kwargs):
     mock_open.side_effect = IOError("fubar")
     with pytest.raises(SystemExit) as excinfo:
-        LedgerFile("blarg")
+        LedgerFile("blarg", **kwargs)
     assert str(excinfo.value) == "-1"
     mock_print.assert_called_once_with("error: fubar", file=sys.stderr)
     mock_open.assert_called_once_with("blarg", "r+")
 
 
+@mock.patch(__name__ + ".ledgerfile.open")
+@mock.patch(__name__ + ".ledgerfile.print")
+def test_stream_file_problem(mock_print, mock_open):
+    mock_open.side_effect = IOError("fubar")
+    lfile = LedgerFile("blarg", stream=True)
+    with pytest.raises(SystemExit) as excinfo:
+        list(lfile.get_things())
+    assert str(excinfo.value) == "-1"
+    mock_print.assert_called_once_with("error: fubar", file=sys.stderr)
+
+
 class FileParsingOnInit(Redirector):
     def test_parsed_file_unchanged_via_print(self):
         """file output after parsing should be identical to input"""
@@ -194,3 +209,937 @@ def test_reconciler_multiple_matches_within_transaction():
         LedgerFile(FT.test_rec_multiple_match, "cash")
     expected = "More than one matching account:\n    a: cash in\n    a: cash out"
     assert str(excinfo.value) == expected
+
+
+def test_stream_does_not_read_things_up_front():
+    with FT.temp_file(FT.read_file(FT.testfile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, stream=True)
+        assert lfile.things == []
+        things = lfile.iter_things()
+        first = next(things)
+        assert first.thing_number == 0
+        assert lfile.things == []
+        assert [thing.thing_number for thing in things][-1] > 0
+
+
+def test_stream_things_match_loaded_things():
+    lfile = LedgerFile(FT.testfile)
+    streamed = list(LedgerFile(FT.testfile, stream=True).iter_things())
+    assert [thing.get_lines() for thing in streamed] == [
+        thing.get_lines() for thing in lfile.things
+    ]
+    assert [thing.thing_number for thing in streamed] == [
+        thing.thing_number for thing in lfile.things
+    ]
+
+
+class StreamPrint(Redirector):
+    def test_stream_print_file(self):
+        expected = FT.read_file(FT.testfile)
+        LedgerFile(FT.testfile, stream=True).print_file()
+        self.redirect.seek(0)
+        assert self.redirect.read() == expected
+
+
+def test_stream_write_file_to_same_file():
+    expected = FT.read_file(FT.testfile)
+    with FT.temp_file(expected) as templedgerfile:
+        LedgerFile(templedgerfile, stream=True).write_file()
+        actual = FT.read_file(templedgerfile)
+    assert actual == expected
+
+
+def test_write_things_from_stream():
+    testdata = dedent("""\
+        2013/05/06 payee name
+            expenses: misc
+            liabilities: credit card  $-1
+
+        2013/05/07 another payee
+            expenses: misc
+            liabilities: credit card  $-2
+
+        """)
+    with FT.temp_file(testdata) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, stream=True)
+        lfile.write_things(
+            thing for thing in lfile.iter_things() if thing.payee == "another payee"
+        )
+        actual = FT.read_file(templedgerfile)
+    assert actual == testdata.split("\n\n", 1)[1]
+
+
+def test_write_things_error_leaves_file_alone():
+    def things():
+        yield LedgerThing(["2013/05/06 payee name"])
+        raise ValueError("oops")
+
+    with FT.temp_file("; original\n\n") as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        with pytest.raises(ValueError):
+            lfile.write_things(things())
+        actual = FT.read_file(templedgerfile)
+    assert actual == "; original\n\n"
+
+
+def sort_file(filename, how):
+    if how == "external":
+        LedgerFile(filename, stream=True).sort_external(2)
+        return
+    lfile = LedgerFile(filename, lazy=how == "lazy")
+    lfile.sort()
+    lfile.write_file()
+
+
+@pytest.mark.parametrize("how", ["memory", "lazy", "external"])
+def test_write_file_through_links(how):
+    # files are written in place, rather than replaced with new files
+    expected = FT.read_file(FT.alpha_sortedfile)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "real.ldg")
+        symlink = os.path.join(directory, "symlink.ldg")
+        hard_link = os.path.join(directory, "hard_link.ldg")
+        with open(filename, "w", encoding="utf-8") as the_file:
+            the_file.write(FT.read_file(FT.alpha_unsortedfile))
+        os.symlink(filename, symlink)
+        os.link(filename, hard_link)
+        inode = os.stat(filename).st_ino
+
+        sort_file(symlink, how)
+
+        assert os.path.islink(symlink)
+        assert os.stat(filename).st_ino == inode
+        assert FT.read_file(filename) == expected
+        assert FT.read_file(hard_link) == expected
+
+
+def test_stream_reconcile_account_matched():
+    lfile = LedgerFile(FT.test_reconcile, "cash", stream=True)
+    assert lfile.rec_account_matched is None
+    for _ in lfile.iter_things():
+        pass
+    assert lfile.rec_account_matched == "a: cash"
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        FT.testfile,
+        FT.alpha_unsortedfile,
+        FT.test_reconcile,
+        FT.test_rec_multiple_match,
+    ],
+)
+def test_lazy_things_match_loaded_things(test_input):
+    eager = LedgerFile(test_input)
+    lazy = LedgerFile(test_input, lazy=True)
+    assert [thing.get_lines() for thing in lazy.things] == [
+        thing.get_lines() for thing in eager.things
+    ]
+    assert [(t.thing_number, t.thing_date) for t in lazy.things] == [
+        (t.thing_number, t.thing_date) for t in eager.things
+    ]
+
+
+def test_lazy_leading_blank_lines_and_no_final_newline():
+    testdata = "\n\n   \n; comment\n\n2013/05/06 payee\n    e: misc\n    a: cash  $-1"
+    with FT.temp_file(testdata) as templedgerfile:
+        eager = LedgerFile(templedgerfile)
+        lazy = LedgerFile(templedgerfile, lazy=True)
+        actual = [thing.get_lines() for thing in lazy.things]
+
+    assert actual == [thing.get_lines() for thing in eager.things]
+    assert actual == [
+        ["", "", "", "; comment"],
+        ["2013/05/06 payee", "    e: misc", "    a: cash  $-1"],
+    ]
+
+
+def test_lazy_last_line_is_a_top_line_without_newline():
+    testdata = "2013/05/06 payee\n    e: misc\n    a: cash  $-1\n2013/05/07 last"
+    with FT.temp_file(testdata) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, lazy=True)
+        actual = [thing.get_lines() for thing in lfile.things]
+    assert actual == [
+        ["2013/05/06 payee", "    e: misc", "    a: cash  $-1"],
+        ["2013/05/07 last"],
+    ]
+
+
+def test_lazy_line_starting_with_a_digit_but_not_a_date():
+    testdata = (
+        "2013/05/06 payee\n    e: misc\n    a: cash  $-1\n2013/13/45 not a date\n"
+        "\n2013/05/07 last\n    e: misc\n    a: cash  $-1\n"
+    )
+    with FT.temp_file(testdata) as templedgerfile:
+        eager = LedgerFile(templedgerfile)
+        lazy = LedgerFile(templedgerfile, lazy=True)
+        actual = [thing.get_lines() for thing in lazy.things]
+    assert actual == [thing.get_lines() for thing in eager.things]
+    assert len(actual) == 2
+
+
+def test_lazy_empty_file():
+    with FT.temp_file("") as templedgerfile:
+        lfile = LedgerFile(templedgerfile, lazy=True)
+    assert lfile.things == []
+
+
+def test_lazy_sort_does_not_parse():
+    expected = FT.read_file(FT.alpha_sortedfile)
+    with FT.temp_file(FT.read_file(FT.alpha_unsortedfile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, lazy=True)
+        lfile.sort()
+        assert all(thing.thing is None for thing in lfile.things)
+        lfile.write_file()
+        actual = FT.read_file(templedgerfile)
+    assert actual == expected
+
+
+def test_lazy_thing_parsed_once_when_touched():
+    lfile = LedgerFile(FT.testfile, lazy=True)
+    thing = lfile.things[1]
+    assert thing.thing is None
+    assert thing.payee
+    parsed = thing.thing
+    assert isinstance(parsed, LedgerThing)
+    thing.set_pending()
+    assert thing.thing is parsed
+    assert thing.is_pending()
+    assert str(thing) == str(parsed)
+    assert repr(thing) == repr(parsed)
+    assert all(other.thing is None for other in lfile.things[2:])
+
+
+def test_lazy_thing_number_set_before_and_after_parsing():
+    lfile = LedgerFile(FT.testfile, lazy=True)
+    thing = lfile.things[1]
+    thing.thing_number = 100
+    assert thing.payee
+    assert thing.thing.thing_number == 100
+    thing.thing_number = 101
+    assert thing.thing_number == thing.thing.thing_number == 101
+    assert not hasattr(thing, "_not_an_attribute")
+
+
+def test_lazy_thing_date_set_before_and_after_parsing():
+    lfile = LedgerFile(FT.testfile, lazy=True)
+    first, second, third = lfile.things[:3]
+    # (the first has no date of its own, as sort carries dates forward)
+    first.thing_date = datetime.date(2000, 1, 1)
+    assert first.thing is None
+    assert first.get_lines() == LedgerFile(FT.testfile).things[0].get_lines()
+    # a new date for a transaction has to show in its top line
+    second.thing_date = datetime.date(2000, 1, 2)
+    assert second.thing.thing_date == datetime.date(2000, 1, 2)
+    assert second.get_lines()[0].startswith("2000/01/02")
+    third.get_lines()
+    assert third.thing is None
+    third.payee
+    third.thing_date = datetime.date(2000, 1, 3)
+    assert third.thing.thing_date == datetime.date(2000, 1, 3)
+
+
+def test_lazy_reconcile_account_matched():
+    lfile = LedgerFile(FT.test_reconcile, "cash", lazy=True)
+    assert lfile.rec_account_matched == "a: cash"
+
+
+def test_lazy_reconcile_only_parses_things_with_account_text():
+    lfile = LedgerFile(FT.test_reconcile, "a: cash", lazy=True)
+    assert lfile.rec_account_matched == "a: cash"
+    parsed = [thing for thing in lfile.things if thing.thing is not None]
+    assert parsed
+    assert all("a: cash" in str(thing) for thing in parsed)
+    assert len(parsed) < len(lfile.things)
+    assert all(
+        thing.rec_account_matched is None
+        for thing in lfile.things
+        if thing.thing is None
+    )
+
+
+def test_lazy_without_reconcile_account_parses_nothing_to_match():
+    lfile = LedgerFile(FT.test_reconcile, lazy=True)
+    assert lfile.rec_account_matched is None
+    assert all(thing.rec_account_matched is None for thing in lfile.things)
+    assert all(thing.thing is None for thing in lfile.things)
+
+
+def test_lazy_reconcile_account_without_literal_parses_everything():
+    lfile = LedgerFile(FT.test_reconcile, "(?i)cash", lazy=True)
+    assert lfile.rec_account_matched == "a: cash"
+    assert all(thing.thing is not None for thing in lfile.things)
+
+
+def test_lazy_reconcile_write_file_and_reset():
+    data = FT.read_file(FT.test_reconcile)
+    with FT.temp_file(data) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "a: cash", lazy=True)
+        matched = [thing for thing in lfile.things if thing.rec_account_matched]
+        matched[0].set_cleared()
+        lfile.write_file()
+        # things not yet parsed are read from the file as mapped again
+        assert all(thing.source is lfile.mapped for thing in lfile.things)
+        assert lfile.things[-1].thing is None
+        matched[-1].set_cleared()
+        lfile.write_file()
+        expected = LedgerFile(templedgerfile, "a: cash")
+        assert [thing.get_lines() for thing in lfile.things] == [
+            thing.get_lines() for thing in expected.things
+        ]
+        assert expected.things[lfile.things.index(matched[0])].is_cleared()
+        assert expected.things[lfile.things.index(matched[-1])].is_cleared()
+
+        lfile.reset()
+        mapped = lfile.mapped
+        lfile.reset()
+        assert mapped.closed
+    assert len(lfile.things) == len(expected.things)
+
+
+def test_lazy_write_file_patches_status_in_place():
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        LedgerFile(templedgerfile).write_file()  # normalize test file
+        lfile = LedgerFile(templedgerfile, "a: cash", lazy=True)
+        matched = [thing for thing in lfile.things if thing.rec_account_matched]
+        for thing in matched:
+            thing.set_cleared()
+            expected = write_full(lfile)
+            with mock.patch(
+                __name__ + ".ledgerfile.LedgerFile.write_things"
+            ) as mock_write_things:
+                lfile.write_file()
+            assert not mock_write_things.called
+            assert FT.read_file(templedgerfile) == expected
+
+        # only things with the account's text in them were parsed
+        parsed = [thing for thing in lfile.things if thing.thing is not None]
+        assert parsed == [
+            thing for thing in lfile.things if "a: cash" in str(thing.get_lines())
+        ]
+        assert len(parsed) < len(lfile.things)
+
+
+def test_lazy_write_file_rewrites_from_first_moved_thing():
+    with FT.temp_file(FT.read_file(FT.alpha_unsortedfile)) as templedgerfile:
+        LedgerFile(templedgerfile).write_file()  # normalize test file
+        lfile = LedgerFile(templedgerfile, lazy=True)
+        things = list(lfile.things)
+        lfile.sort()
+        first = next(
+            i for i, thing in enumerate(lfile.things) if thing is not things[i]
+        )
+        expected = write_full(lfile)
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things",
+            wraps=lfile.write_things,
+        ) as mock_write_things:
+            lfile.write_file()
+        mock_write_things.assert_called_once_with(
+            lfile.things[first:], keep=lfile.layout.offsets[first]
+        )
+        assert FT.read_file(templedgerfile) == expected
+        assert all(thing.thing is None for thing in lfile.things)
+        assert write_full(lfile) == expected
+
+
+@pytest.mark.parametrize("sort", [False, True])
+def test_lazy_write_file_leaves_file_alone_if_text_cannot_be_decoded(sort):
+    data = FT.read_file(FT.test_reconcile).encode("utf-8")
+    data = data.replace(b"e: misc", b"e: misc \xff", 1)
+    with FT.temp_file("") as templedgerfile:
+        with open(templedgerfile, "wb") as the_file:
+            the_file.write(data)
+        lfile = LedgerFile(templedgerfile, "a: cash", lazy=True)
+        matched = [thing for thing in lfile.things if thing.rec_account_matched]
+        matched[-1].set_cleared()
+        if sort:
+            lfile.things.reverse()  # to be written from the start
+        with pytest.raises(UnicodeDecodeError):
+            lfile.write_file()
+        with open(templedgerfile, "rb") as the_file:
+            assert the_file.read() == data
+
+
+def test_lazy_reconciler_multiple_matches_across_transactions():
+    with pytest.raises(LdgReconcilerError):
+        LedgerFile(FT.test_rec_multiple_match, "checking", lazy=True)
+
+
+def get_state(thing):
+    return [getattr(thing, name) for name in LedgerThing.__slots__]
+
+
+@mock.patch(__name__ + ".ledgerfile.MIN_CHUNK_SIZE", 64)
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        FT.testfile,
+        FT.alpha_unsortedfile,
+        FT.test_reconcile,
+    ],
+)
+def test_chunked_things_match_loaded_things(test_input):
+    serial = LedgerFile(test_input)
+    chunked = LedgerFile(test_input, jobs=3)
+    assert [get_state(thing) for thing in chunked.things] == [
+        get_state(thing) for thing in serial.things
+    ]
+
+
+@mock.patch(__name__ + ".ledgerfile.MIN_CHUNK_SIZE", 64)
+@pytest.mark.parametrize(
+    "test_input, reconcile_account",
+    [(FT.testfile, None), (FT.test_reconcile, "cash")],
+)
+def test_parse_chunk_same_as_sequential_parse(test_input, reconcile_account):
+    """parse_chunk runs in worker processes: check it in-process"""
+    with open(test_input, "rb") as the_file:
+        data = the_file.read()
+    offsets = ledgerfile.get_chunk_offsets(data, 3)
+    assert len(offsets) > 1
+    chunked = []
+    for start, end in zip(offsets, offsets[1:] + [len(data)]):
+        dumped = ledgerfile.parse_chunk(reconcile_account, data[start:end])
+        chunked.extend(parsecache.load_things_dump(dumped))
+
+    sequential = LedgerFile(None, reconcile_account, stream=True)
+    things = sequential.parse_lines(ledgerfile.get_lines(data))
+    assert [get_state(thing) for thing in chunked] == [
+        get_state(thing) for thing in things
+    ]
+
+
+@mock.patch(__name__ + ".ledgerfile.MIN_CHUNK_SIZE", 64)
+def test_chunked_reconcile_account_matched():
+    lfile = LedgerFile(FT.test_reconcile, "cash", jobs=3)
+    assert lfile.rec_account_matched == "a: cash"
+    assert [t.rec_account_matched for t in lfile.things] == [
+        t.rec_account_matched for t in LedgerFile(FT.test_reconcile, "cash").things
+    ]
+
+
+@mock.patch(__name__ + ".ledgerfile.MIN_CHUNK_SIZE", 64)
+def test_chunked_reconciler_multiple_matches_across_chunks():
+    with FT.temp_file(FT.read_file(FT.test_rec_multiple_match)) as templedgerfile:
+        with open(templedgerfile, "rb") as the_file:
+            data = the_file.read()
+        assert len(ledgerfile.get_chunk_offsets(data, 3)) > 1
+        with pytest.raises(LdgReconcilerError) as excinfo:
+            LedgerFile(templedgerfile, "checking", jobs=3)
+    expected = (
+        "More than one matching account:\n    a: checking down\n    a: checking up"
+    )
+    assert str(excinfo.value) == expected
+
+
+def test_pickled_file_same_as_loaded():
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        LedgerFile(templedgerfile).write_file()  # normalize test file
+        lfile = LedgerFile(templedgerfile, "a: cash")
+        copy = pickle.loads(pickle.dumps(lfile))
+        assert [get_state(thing) for thing in copy.things] == [
+            get_state(thing) for thing in lfile.things
+        ]
+        assert copy.rec_account_matched == "a: cash"
+        assert copy.layout.things == copy.things
+        assert copy.parsed == lfile.parsed
+        # layout and all, as if it had been loaded here
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things"
+        ) as mock_write_things:
+            copy.write_file()
+            with count_new("LedgerThing") as mock_thing:
+                copy.reset()
+        assert not mock_write_things.called
+        assert mock_thing.call_count == 0
+
+
+def test_pickled_file_changed_since_loaded_has_no_layout():
+    lfile = LedgerFile(FT.alpha_unsortedfile)
+    lfile.sort()
+    copy = pickle.loads(pickle.dumps(lfile))
+    assert copy.layout is None
+    assert [thing.get_lines() for thing in copy.things] == [
+        thing.get_lines() for thing in lfile.things
+    ]
+
+
+@mock.patch(__name__ + ".ledgerfile.ProcessPoolExecutor")
+def test_small_file_not_chunked(mock_executor):
+    lfile = LedgerFile(FT.testfile, jobs=4)
+    assert not mock_executor.called
+    assert len(lfile.things) == len(LedgerFile(FT.testfile).things)
+
+
+@mock.patch(__name__ + ".ledgerfile.MIN_CHUNK_SIZE", 10)
+@pytest.mark.parametrize(
+    "data, count, expected",
+    [
+        (b"", 4, [0]),
+        (b"2020/01/01 a\n" * 4, 1, [0]),
+        (b"2020/01/01 a\n" * 4, 2, [0, 26]),
+        (b"2020/01/01 a\n" * 4, 4, [0, 13, 26, 39]),
+        (b"2020/01/01 a\n" * 4, 9, [0, 13, 26, 39]),
+        (b"2020/01/01 a\n  e: misc\n  ; 2020/01/01\n2020/01/02 b", 4, [0, 38]),
+        (b"; header\n; more header\n2020/01/01 a\n", 2, [0, 23]),
+        (b"2020/01/01 a\n; no more transactions\n", 2, [0]),
+    ],
+)
+def test_get_chunk_offsets(data, count, expected):
+    assert ledgerfile.get_chunk_offsets(data, count) == expected
+
+
+def write_full(lfile):
+    """What a full write_file would write for lfile's things"""
+    return "".join(ledgerfile.get_thing_text(thing) for thing in lfile.things)
+
+
+def test_write_file_sets_layout():
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "cash")
+        assert lfile.layout.things == lfile.things
+        assert lfile.layout.offsets is None  # not checked against file yet
+        lfile.write_file()
+        assert lfile.layout.things == lfile.things
+        assert lfile.layout.offsets[-1] == os.path.getsize(templedgerfile)
+        first_lines = [thing.get_lines()[0] for thing in lfile.things[1:]]
+        with open(templedgerfile, "rb") as the_file:
+            data = the_file.read()
+        for offset, line in zip(lfile.layout.offsets[1:], first_lines):
+            assert data[offset:].decode("utf-8").startswith(line)
+
+
+@mock.patch(__name__ + ".ledgerfile.LedgerFile.write_things")
+def test_write_file_no_changes_writes_nothing(mock_write_things):
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "cash")
+        lfile.layout = ledgerfile.Layout(
+            list(lfile.things), [0], ledgerfile.get_file_stamp(templedgerfile)
+        )
+        lfile.write_file()
+    assert not mock_write_things.called
+
+
+def test_write_file_status_change_patched_in_place():
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "cash")
+        lfile.write_file()
+        inode = os.stat(templedgerfile).st_ino
+        pending = [thing for thing in lfile.things if thing.rec_account_matched]
+        pending[0].set_cleared()
+        pending[-1].set_pending()
+        expected = write_full(lfile)
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things"
+        ) as mock_write_things:
+            lfile.write_file()
+        assert not mock_write_things.called
+        assert os.stat(templedgerfile).st_ino == inode
+        assert FT.read_file(templedgerfile) == expected
+        assert not any(thing.is_changed() for thing in lfile.things)
+        assert lfile.layout.stamp == ledgerfile.get_file_stamp(templedgerfile)
+
+        # and again, now that the patched things are up to date
+        pending[0].set_uncleared()
+        expected = write_full(lfile)
+        lfile.write_file()
+        assert FT.read_file(templedgerfile) == expected
+        assert LedgerFile(templedgerfile, "cash").things[6].lines == (
+            pending[0].get_lines()
+        )
+
+
+def test_write_file_size_change_rewrites_from_first_change():
+    class MockSettings:
+        DATE_FORMAT = "%Y/%m/%d"
+
+    settings_getter.settings = MockSettings()
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        lfile.write_file()
+        offsets = list(lfile.layout.offsets)
+        with settings_getter.override_settings(DATE_FORMAT="%Y/%m/%d (%a)"):
+            lfile.things[3].thing_date = datetime.date(2016, 10, 4)
+            lfile.things[5].thing_date = datetime.date(2016, 9, 18)
+            expected = write_full(lfile)
+            with mock.patch(
+                __name__ + ".ledgerfile.LedgerFile.write_things",
+                wraps=lfile.write_things,
+            ) as mock_write_things:
+                lfile.write_file()
+        mock_write_things.assert_called_once_with(lfile.things[3:], keep=offsets[3])
+        assert FT.read_file(templedgerfile) == expected
+        assert lfile.layout.offsets[:4] == offsets[:4]
+        assert lfile.layout.offsets[-1] == len(expected.encode("utf-8"))
+        assert lfile.things[3].lines[0] == "2016/10/04 (Tue) splurgly murgle"
+    settings_getter.settings = settings.Settings()
+
+
+@pytest.mark.parametrize(
+    "testdata",
+    [
+        "2016/10/02 abc\n    e: blurg\n    a: smurg   $-25\n",  # one newline
+        "; comment\n\n\n2016/10/02 abc\n    a: smurg   $-25\n\n",  # two blanks
+        "2016/10/02 abc\n    e: blurg\n  a: smurg   $-25\n\n",  # indent
+    ],
+)
+def test_write_file_rewrites_file_not_as_it_would_be_written(testdata):
+    with FT.temp_file(testdata) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "smurg")
+        expected = write_full(lfile)
+        assert expected != testdata
+        lfile.write_file()
+        assert FT.read_file(templedgerfile) == expected
+
+
+def test_write_file_writes_everything_if_file_changed():
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "cash")
+        lfile.write_file()
+        os.utime(templedgerfile, ns=(0, 0))
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things"
+        ) as mock_write_things:
+            lfile.write_file()
+    mock_write_things.assert_called_once_with(lfile.things)
+
+
+def test_write_file_writes_everything_without_layout():
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "cash")
+        lfile.layout = None
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things"
+        ) as mock_write_things:
+            lfile.write_file()
+    mock_write_things.assert_called_once_with(lfile.things)
+
+
+@mock.patch(__name__ + ".ledgerfile.LedgerFile.write_things")
+def test_write_file_after_read_writes_nothing_if_nothing_changed(mock_write_things):
+    with FT.temp_file(FT.read_file(FT.alpha_sortedfile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        lfile.write_file()
+        lfile.reset()
+        lfile.write_file()
+    assert not mock_write_things.called
+
+
+def test_write_file_after_read_patches_status_in_place():
+    with FT.temp_file(FT.read_file(FT.alpha_sortedfile)) as templedgerfile:
+        LedgerFile(templedgerfile).write_file()  # normalize test file
+        lfile = LedgerFile(templedgerfile)
+        lfile.things[2].thing_date = datetime.date(2020, 1, 1)
+        expected = write_full(lfile)
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things"
+        ) as mock_write_things:
+            lfile.write_file()
+        assert not mock_write_things.called
+        assert FT.read_file(templedgerfile) == expected
+        assert lfile.layout.offsets[-1] == len(expected)
+
+
+def test_write_file_after_read_writes_everything_if_file_not_as_written():
+    testdata = (
+        "2013/05/06 payee\n    e: misc\n    a: cash  $-1\n\n"
+        "2013/05/07 last\n    e: misc\n    a: cash  $-1\n\n\n\n"
+    )
+    with FT.temp_file(testdata) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        lfile.things[0].thing_date = datetime.date(2013, 5, 1)
+        expected = write_full(lfile)
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things",
+            wraps=lfile.write_things,
+        ) as mock_write_things:
+            lfile.write_file()
+        mock_write_things.assert_called_once_with(lfile.things)
+        assert FT.read_file(templedgerfile) == expected
+
+
+def test_write_file_after_add_writes_from_added_things():
+    with FT.temp_file(FT.read_file(FT.alpha_sortedfile)) as templedgerfile:
+        LedgerFile(templedgerfile).write_file()
+        size = os.path.getsize(templedgerfile)
+        lfile = LedgerFile(templedgerfile)
+        count = len(lfile.things)
+        lfile.add_thing_from_lines(["2020/01/01 new", "    e: xyz", "    a: abc"])
+        expected = write_full(lfile)
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things",
+            wraps=lfile.write_things,
+        ) as mock_write_things:
+            lfile.write_file()
+        mock_write_things.assert_called_once_with(lfile.things[count:], keep=size)
+        assert FT.read_file(templedgerfile) == expected
+
+
+APPENDED = "2020/01/01 new payee\n    e: misc\n    a: cash  $-1\n\n"
+
+
+def count_new(name):
+    """Patch ledgerfile's LedgerThing or LazyThing to count new ones"""
+    return mock.patch(__name__ + ".ledgerfile." + name, wraps=getattr(ledgerfile, name))
+
+
+def append_to_file(filename, data):
+    with open(filename, "a", encoding="utf-8") as the_file:
+        the_file.write(data)
+
+
+def assert_same_as_loaded(lfile, **kwargs):
+    expected = LedgerFile(lfile.filename, lfile.rec_account, **kwargs)
+    assert [thing.get_lines() for thing in lfile.things] == [
+        thing.get_lines() for thing in expected.things
+    ]
+    assert lfile.rec_account_matched == expected.rec_account_matched
+    numbers = [thing.thing_number for thing in lfile.things]
+    assert numbers == sorted(set(numbers))
+
+
+def test_reset_unchanged_file_parses_nothing():
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "a: cash")
+        things = list(lfile.things)
+        with count_new("LedgerThing") as mock_thing:
+            lfile.reset()
+        assert mock_thing.call_count == 0
+        assert lfile.things == things
+        assert lfile.rec_account_matched == "a: cash"
+
+
+def test_reset_appended_file_only_parses_tail():
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile, "a: cash")
+        things = list(lfile.things)
+        append_to_file(templedgerfile, APPENDED)
+        with count_new("LedgerThing") as mock_thing:
+            lfile.reset()
+        # the previous last thing is parsed again along with the new one
+        assert mock_thing.call_count == 2
+        assert lfile.things[:-2] == things[:-1]
+        assert lfile.things[-1].payee == "new payee"
+        assert_same_as_loaded(lfile)
+
+
+@pytest.mark.parametrize("sort", [False, True])
+def test_reset_appended_file_after_write_only_parses_tail(sort):
+    with FT.temp_file(FT.read_file(FT.alpha_unsortedfile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        if sort:
+            lfile.sort()
+        lfile.things[1].set_cleared()
+        lfile.write_file()
+        things = list(lfile.things)
+        append_to_file(templedgerfile, APPENDED)
+        with count_new("LedgerThing") as mock_thing:
+            lfile.reset()
+        assert mock_thing.call_count == 2
+        assert lfile.things[:-2] == things[:-1]
+        assert lfile.things[1].is_cleared()
+        assert_same_as_loaded(lfile)
+
+
+def change_text(data):
+    return data.replace("assets: cash", "assets: bank", 1) + APPENDED
+
+
+def remove_last_thing(data):
+    return data[: data.rindex("2013/03/30")]
+
+
+@pytest.mark.parametrize("change", [change_text, remove_last_thing])
+@pytest.mark.parametrize("written", [False, True])
+def test_reset_changed_file_parses_everything(written, change):
+    with FT.temp_file(FT.read_file(FT.alpha_sortedfile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        if written:
+            lfile.things[-1].set_cleared()
+            lfile.write_file()
+        data = FT.read_file(templedgerfile)
+        with open(templedgerfile, "w", encoding="utf-8") as the_file:
+            the_file.write(change(data))
+        with count_new("LedgerThing") as mock_thing:
+            lfile.reset()
+        assert mock_thing.call_count == len(lfile.things)
+        assert_same_as_loaded(lfile)
+
+
+def test_reset_parses_everything_if_things_changed_in_memory():
+    with FT.temp_file(FT.read_file(FT.alpha_sortedfile)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        lfile.things[1].set_cleared()
+        with count_new("LedgerThing") as mock_thing:
+            lfile.reset()
+        assert mock_thing.call_count == len(lfile.things)
+        assert not lfile.things[1].is_cleared()
+
+
+@pytest.mark.parametrize("written", [False, True])
+def test_lazy_reset_appended_file_only_indexes_tail(written):
+    with FT.temp_file(FT.read_file(FT.test_reconcile)) as templedgerfile:
+        LedgerFile(templedgerfile).write_file()  # normalize test file
+        lfile = LedgerFile(templedgerfile, "a: cash", lazy=True)
+        matched = [thing for thing in lfile.things if thing.rec_account_matched]
+        if written:
+            matched[0].set_pending()
+            lfile.write_file()
+        things = list(lfile.things)
+        mapped = lfile.mapped
+        append_to_file(templedgerfile, APPENDED)
+        with count_new("LazyThing") as mock_thing:
+            lfile.reset()
+        assert mock_thing.call_count == 2
+        assert lfile.things[:-2] == things[:-1]
+        assert mapped.closed
+        # kept stand-ins read from the new map, parsed or not
+        assert all(thing.source is lfile.mapped for thing in lfile.things)
+        assert matched[0].thing is not None
+        assert matched[0].is_pending() == written
+        assert_same_as_loaded(lfile, lazy=True)
+
+
+@pytest.mark.parametrize("run_size", [1, 2, 3, 1000])
+@pytest.mark.parametrize(
+    "test_input", [FT.alpha_unsortedfile, FT.testfile, FT.test_reconcile]
+)
+def test_sort_external_same_as_sort(test_input, run_size):
+    with FT.temp_file(FT.read_file(test_input)) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        lfile.sort()
+        lfile.write_file()
+        expected = FT.read_file(templedgerfile)
+
+    with FT.temp_file(FT.read_file(test_input)) as templedgerfile:
+        LedgerFile(templedgerfile, stream=True).sort_external(run_size)
+        actual = FT.read_file(templedgerfile)
+
+    assert actual == expected
+
+
+def test_sort_external_runs():
+    lfile = LedgerFile(FT.alpha_unsortedfile, stream=True)
+    runs = list(lfile.get_runs(2))
+    expected_count = len(LedgerFile(FT.alpha_unsortedfile).things)
+    assert [len(run) for run in runs[:-1]] == [2] * (len(runs) - 1)
+    assert sum(len(run) for run in runs) == expected_count
+    # first thing has no date of its own
+    assert runs[0][0][0] == LedgerFile.STARTING_DATE.toordinal()
+
+
+@mock.patch(__name__ + ".ledgerfile.RUN_BLOCK_SIZE", 2)
+def test_sort_external_run_read_back_in_blocks():
+    with FT.temp_file("") as tempfilename:
+        run = [(1, i, f"{i}\n\n") for i in range(5)]
+        ledgerfile.write_run(tempfilename, run)
+        assert list(ledgerfile.read_run(tempfilename)) == run
+
+
+def test_sort_external_empty_file():
+    with FT.temp_file("") as templedgerfile:
+        LedgerFile(templedgerfile, stream=True).sort_external()
+        assert FT.read_file(templedgerfile) == ""
+
+
+def get_sorted_by_full_sort(lfile):
+    things = list(lfile.things)
+    with mock.patch(__name__ + ".ledgerfile.MAX_SORT_REPAIRS", -1):
+        lfile.sort()
+    full = list(lfile.things)
+    lfile.things[:] = things
+    return full
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    [FT.alpha_unsortedfile, FT.alpha_sortedfile, FT.testfile, FT.test_reconcile],
+)
+def test_sort_repair_same_as_full_sort(test_input):
+    lfile = LedgerFile(test_input)
+    expected = get_sorted_by_full_sort(lfile)
+    lfile.sort()
+    assert lfile.things == expected
+
+
+def test_sort_repair_moves_things_into_place():
+    testdata = dedent("""\
+        ; header
+        2016/01/01 a
+        2016/01/03 b
+        ; comment that goes with b
+        2016/01/05 c
+        2016/01/02 late
+        2016/01/03 also late
+        2015/12/31 very late
+        ; comment that goes with very late
+        """)
+    with FT.temp_file(testdata) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+    lfile.sort()
+    assert [thing.get_lines() for thing in lfile.things] == [
+        ["; header"],
+        ["2015/12/31 very late", "; comment that goes with very late"],
+        ["2016/01/01 a"],
+        ["2016/01/02 late"],
+        ["2016/01/03 b", "; comment that goes with b"],
+        ["2016/01/03 also late"],
+        ["2016/01/05 c"],
+    ]
+
+
+@mock.patch(__name__ + ".ledgerfile.insort")
+def test_sort_many_out_of_order_uses_full_sort(mock_insort):
+    lfile = LedgerFile(FT.alpha_unsortedfile)
+    expected = get_sorted_by_full_sort(lfile)
+    with mock.patch(__name__ + ".ledgerfile.MAX_SORT_REPAIRS", 1):
+        lfile.sort()
+    assert not mock_insort.called
+    assert lfile.things == expected
+
+
+def test_sort_then_write_file_writes_from_first_moved_thing():
+    testdata = "".join(f"2016/01/{day:02} thing {day}\n\n" for day in range(1, 10))
+    testdata += "2016/01/05 late\n\n"
+    with FT.temp_file(testdata) as templedgerfile:
+        lfile = LedgerFile(templedgerfile)
+        lfile.sort()
+        expected = write_full(lfile)
+        with mock.patch(
+            __name__ + ".ledgerfile.LedgerFile.write_things",
+            wraps=lfile.write_things,
+        ) as mock_write_things:
+            lfile.write_file()
+        keep = len(testdata.split("2016/01/06")[0])
+        mock_write_things.assert_called_once_with(lfile.things[5:], keep=keep)
+        assert FT.read_file(templedgerfile) == expected
+
+
+@pytest.mark.parametrize("stream", [True, False])
+@pytest.mark.parametrize(
+    "testdata, expected",
+    [
+        ("", True),
+        ("; just a comment\n", True),
+        ("; header\n2016/01/01 a\n; comment\n2016/01/01 b\n2016/01/02 c\n", True),
+        ("2016/01/02 a\n; comment\n2016/01/01 b\n", False),
+        ("2016/01/01 a\n2016/01/03 b\n2016/01/02 c\n2016/01/04 d\n", False),
+    ],
+)
+def test_is_sorted(testdata, expected, stream):
+    with FT.temp_file(testdata) as templedgerfile:
+        assert LedgerFile(templedgerfile, stream=stream).is_sorted() is expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [(FT.alpha_sortedfile, True), (FT.alpha_unsortedfile, False)],
+)
+def test_is_sorted_files(test_input, expected):
+    assert LedgerFile(test_input, stream=True).is_sorted() is expected
+    lfile = LedgerFile(test_input)
+    assert lfile.is_sorted() is expected
+    lfile.sort()
+    assert lfile.is_sorted()
@@ -0,0 +1,174 @@
+import re
+from datetime import date
+
+import pytest
+
+from .. import ledgerlexer, settings, settings_getter, util
+from ..ledgerlexer import (
+    BLANK,
+    COMMENT,
+    DIRECTIVE,
+    NOTE,
+    POSTING,
+    TRANSACTION,
+    TopLine,
+    get_line_date,
+    get_token,
+    get_top_line,
+    tokenize,
+)
+from . import filetester as FT
+
+# The regex that the lexer replaced, for comparing results
+OLD_TOP_LINE_REGEX = re.compile(
+    r"(" + ledgerlexer.DATE_REGEX + r")(?:\s+|$)"
+    r"\s*([!*])?\s*"
+    r"(?:\(([^)]*)\)\s*)?"
+    r"(.*?)(?=  |$)"
+)
+
+
+def get_old_top_line(line):
+    m = OLD_TOP_LINE_REGEX.match(line)
+    if not m or not util.is_valid_date(m.group(1)):
+        return None
+    the_date, status, code, payee = m.groups()
+    return TopLine(util.get_date(the_date), status, code, payee)
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("", BLANK),
+        ("   \t", BLANK),
+        ("; comment", COMMENT),
+        ("# comment", COMMENT),
+        ("% comment", COMMENT),
+        ("| comment", COMMENT),
+        ("* comment", COMMENT),
+        ("    ; indented comment", NOTE),
+        ("\t; tab indented comment", NOTE),
+        ("    e: misc", POSTING),
+        ("  ! a: cash  $5", POSTING),
+        ("    * a: cash  $10", POSTING),
+        ("    # not a comment when indented", POSTING),
+        ("\ta: cash", POSTING),
+        ("2018/07/07 payee", TRANSACTION),
+        ("2018/07/07", TRANSACTION),
+        ("2018/02/30 bad date", DIRECTIVE),
+        ("2018/07/07payee", DIRECTIVE),
+        ("P 2017/11/01 abcdx      $80", DIRECTIVE),
+        ("account a: checking", DIRECTIVE),
+        ("commodity abcdx", DIRECTIVE),
+    ],
+)
+def test_get_token_kind(test_input, expected):
+    token = get_token(test_input)
+    assert token.kind == expected
+    assert token.line == test_input
+    assert (token.top_line is not None) == (expected == TRANSACTION)
+
+
+def test_tokenize():
+    lines = ["; hi", "2018/07/07 * (12) payee  ; note", "    e: misc", ""]
+    tokens = list(tokenize(lines))
+    assert [token.kind for token in tokens] == [COMMENT, TRANSACTION, POSTING, BLANK]
+    assert tokens[1].top_line == TopLine(date(2018, 7, 7), "*", "12", "payee")
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        "2001/04/11 () some1     ; yah",
+        "2001/04/11 (ab)    ; c    ; d",
+        "2001/04/11(abc)",
+        "2001/04/11some1",
+        "2016/02/04    (123)   some1",
+        "2016/02/04   (12)",
+        "2016/02/04 (123)some1",
+        "2016/10/20",
+        "2016/10/20 ",
+        "2016/10/20\t\tsome1",
+        "2018/07/07  !  (123) some1",
+        "2018/07/07 *some1",
+        "2018/07/07 a b c  ; d e",
+        "2013/02/30 abc store",
+        "2013/5/12 abc store",
+        "2013/06/1 abc store",
+        "2013-06-01 abc store",
+        "2013/06-01 abc store",
+        "20a3/06/01 abc store",
+        "2013/0a/01 abc store",
+        "2013/06/0a abc store",
+        "0000/06/01 abc store",
+        "2",
+    ],
+)
+def test_top_line_matches_old_regex(test_input):
+    assert get_top_line(test_input) == get_old_top_line(test_input)
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        FT.testfile,
+        FT.alpha_unsortedfile,
+        FT.test_reconcile,
+        FT.test_rec_multiple_match,
+        FT.test_enter_lessthan1,
+    ],
+)
+def test_top_lines_from_files_match_old_regex(test_input):
+    for line in FT.read_file(test_input).split("\n"):
+        assert get_top_line(line) == get_old_top_line(line)
+
+
+class MockSettingsAltDateFormat:
+    DATE_FORMAT = "%Y-%m-%d"
+
+
+class MockSettingsNotFixedWidth:
+    DATE_FORMAT = "%Y/%d/%m"
+
+
+def test_top_line_different_date_format():
+    settings_getter.settings = MockSettingsAltDateFormat()
+    assert get_top_line("2016/10/20 some1") is None
+    assert get_top_line("2016-10-20 some1") == TopLine(
+        date(2016, 10, 20), None, None, "some1"
+    )
+    settings_getter.settings = settings.Settings()
+
+
+def test_top_line_date_format_not_fixed_width():
+    settings_getter.settings = MockSettingsNotFixedWidth()
+    assert get_top_line("2016/20/10 some1") == TopLine(
+        date(2016, 10, 20), None, None, "some1"
+    )
+    assert get_top_line("2016/10/20 some1") is None
+    assert get_top_line("2016/20/10some1") is None
+    settings_getter.settings = settings.Settings()
+
+
+@pytest.mark.parametrize(
+    "line, date_format, expected",
+    [
+        ("2016/10/20 some1", "%Y/%m/%d", (date(2016, 10, 20), 10)),
+        ("2016/10/20", "%Y/%m/%d", (date(2016, 10, 20), 10)),
+        ("2016.10.20 some1", "%Y.%m.%d", (date(2016, 10, 20), 10)),
+        ("2016/10/20 some1", "%Y.%m.%d", (None, 0)),
+        ("2016/10/20some1", "%Y/%m/%d", (None, 0)),
+        ("2016/13/20 some1", "%Y/%m/%d", (None, 0)),
+        ("2016/10/2", "%Y/%m/%d", (None, 0)),
+        ("2016/20/10   some1", "%Y/%d/%m", (date(2016, 10, 20), 13)),
+        ("2016/10/20 some1", "%Y/%d/%m", (None, 0)),
+    ],
+)
+def test_get_line_date(line, date_format, expected):
+    assert get_line_date(line, date_format) == expected
+
+
+def test_lexer_and_util_share_date_parsing():
+    util.parse_date_string.cache_clear()
+    get_line_date("2016/10/20 some1", "%Y/%m/%d")
+    assert util.parse_date_string.cache_info().currsize == 1
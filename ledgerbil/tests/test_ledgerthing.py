@@ -1,12 +1,17 @@
+import glob
+import os
+import random
+import tracemalloc
 from datetime import date
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import pytest
 
 # (ledgerthing noqa'ed: is used in patch but reported as unused)
-from .. import ledgerthing, settings, settings_getter  # noqa: F401
+from .. import ledgerthing, settings, settings_getter, util  # noqa: F401
 from ..ledgerbilexceptions import LdgReconcilerError
 from ..ledgerthing import (
+    POSTING_REGEX,
     REC_CLEARED,
     REC_PENDING,
     REC_UNCLEARED,
@@ -14,7 +19,12 @@ from ..ledgerthing import (
     LedgerPosting,
     LedgerThing,
     get_ledger_posting,
+    get_payee,
+    get_required_literal,
+    join_lines,
+    scan_posting,
 )
+from . import filetester as FT
 from .helpers import Redirector
 
 
@@ -122,7 +132,7 @@ def test_get_ledger_posting_is_none(test_input):
         ("  !a: bc      ; comment", ("!", "a: bc", None, None, None)),
         # only one space before $10 so it's part of account name
         ("  a: bc $10", (None, "a: bc $10", None, None, None)),
-        # dollar amounts converted to floats and calculations are evaluated
+        # dollar amounts converted to units and calculations are evaluated
         ("  a: bc  $10.25", (None, "a: bc", None, None, 10.25)),
         ("  a: bc  $10.25 ; comment", (None, "a: bc", None, None, 10.25)),
         ("  a: bc  $10.25  ; comment", (None, "a: bc", None, None, 10.25)),
@@ -154,7 +164,108 @@ def test_get_ledger_posting_is_none(test_input):
 )
 def test_get_ledger_posting(test_input, expected):
     # ledger posting = status, account, shares, symbol, amount
-    assert get_ledger_posting(test_input) == LedgerPosting(*expected)
+    status, account, shares, symbol, amount = expected
+    expected = LedgerPosting(
+        status,
+        account,
+        None if shares is None else util.to_units(shares),
+        symbol,
+        None if amount is None else util.to_units(amount),
+    )
+    assert get_ledger_posting(test_input) == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("  the payee ", "the payee"),
+        ("", UNSPECIFIED_PAYEE),
+        ("   ", UNSPECIFIED_PAYEE),
+        (None, UNSPECIFIED_PAYEE),
+    ],
+)
+def test_get_payee(test_input, expected):
+    assert get_payee(test_input) == expected
+
+
+def get_regex_groups(line):
+    m = POSTING_REGEX.match(line)
+    return m.groups() if m else None
+
+
+def test_scan_posting_same_as_regex_for_files():
+    sample_dir = os.path.join(FT.path, "..", "..", "sample")
+    filenames = glob.glob(os.path.join(FT.testdir, "*.l*g*")) + glob.glob(
+        os.path.join(sample_dir, "*.l*g*")
+    )
+    assert filenames
+    for filename in filenames:
+        for line in FT.read_file(filename).split("\n"):
+            assert scan_posting(line) == get_regex_groups(line), line
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        # account ends before a later two spaces if what follows doesn't fit
+        "  a: bc  foo  $10",
+        "  a: bc  $20 =",
+        # whitespace given back after shares to start a symbol
+        "  a: bc  2\t",
+        "  a: bc  1,\t@ $5",
+        # status ends up as the account
+        "  *  12 x ; c",
+        # left to the regex
+        "  a: bc  $10\n",
+        # worst cases for the regex
+        "    a: b" + "  x" * 40 + "   ; " + "c" * 200,
+        "    a: b  " + "1 " * 60 + ";",
+        "    " + "a b " * 100 + "\t",
+        "  " + " " * 100 + "; comment",
+        "",
+        "a: bc  $10",
+    ],
+)
+def test_scan_posting_same_as_regex(test_input):
+    assert scan_posting(test_input) == get_regex_groups(test_input)
+
+
+def test_scan_posting_same_as_regex_fuzzed():
+    chars = [" ", " ", "  ", "\t", "!", "*", "-", "1", "2", ".", ","]
+    chars += ["$", "(", ")", "@", ";", "=", "a", ":", "+", "/", "é", "٣"]
+    rand = random.Random(17)
+    for _ in range(20000):
+        line = rand.choice(["  ", "\t", ""]) + "".join(
+            rand.choice(chars) for _ in range(rand.randint(0, 16))
+        )
+        assert scan_posting(line) == get_regex_groups(line), repr(line)
+
+
+@pytest.mark.parametrize(
+    "test_input, scanned",
+    [
+        ("    e: misc", False),
+        ("    a: b  x  1  $10", False),
+        ("  ! a: bc  2 ABC @ $5 = $10", False),
+        ("", False),
+        ("    a: cash                            $50", True),
+        ("    e: misc  $10  ; note", True),
+        ("    e: misc stuff ; note", True),
+        ("    " + "a b " * 100 + "\t", True),
+    ],
+)
+def test_get_ledger_posting_only_scans_lines_regex_may_backtrack_on(
+    test_input, scanned
+):
+    with mock.patch(
+        __name__ + ".ledgerthing.scan_posting", wraps=ledgerthing.scan_posting
+    ) as mock_scan_posting:
+        posting = get_ledger_posting(test_input)
+    assert mock_scan_posting.called == scanned
+    groups = get_regex_groups(test_input)
+    assert (posting is None) == (groups is None)
+    if posting:
+        assert posting.account == groups[1]
 
 
 class GetLines(Redirector):
@@ -265,6 +376,37 @@ class GetLines(Redirector):
         expected = ("2016/10/24 abc", "  e: xyz", "    a: smurg   $-25")
         assert tuple(thing.get_lines()) == expected
 
+    def test_get_lines_unchanged_does_no_rendering(self):
+        lines = ["2016/10/24 glob", "  e: blurg", "    a: smurg   $-25"]
+        thing = LedgerThing(lines, reconcile_account="smurg")
+        assert not thing.is_changed()
+        with mock.patch(__name__ + ".ledgerthing.get_ledger_posting") as mock_post:
+            with mock.patch(__name__ + ".ledgerthing.re.sub") as mock_sub:
+                assert thing.get_lines() == lines
+        assert not mock_post.called
+        assert not mock_sub.called
+
+    def test_get_lines_changed_and_changed_back(self):
+        lines = ["2016/10/24 glob", "  e: blurg", "    a: smurg   $-25"]
+        thing = LedgerThing(lines, reconcile_account="smurg")
+        thing.rec_status = REC_CLEARED
+        thing.thing_date = date(2016, 10, 25)
+        assert thing.is_changed()
+        assert thing.get_lines() == [
+            "2016/10/25 glob",
+            "  e: blurg",
+            "  * a: smurg   $-25",
+        ]
+        thing.rec_status = None
+        thing.thing_date = date(2016, 10, 24)
+        assert not thing.is_changed()
+        assert thing.get_lines() == lines
+
+    def test_get_lines_needing_indent_change_is_always_rendered(self):
+        lines = ["2016/10/24 glob", "  e: blurg", "  a: smurg   $-25"]
+        thing = LedgerThing(lines, reconcile_account="smurg")
+        assert thing.is_changed()
+
 
 class IsNewThing(TestCase):
     def test_is_new_thing(self):
@@ -340,7 +482,7 @@ class ReconcilerParsing(Redirector):
             assert t.rec_account == account
 
         assert t.rec_account_matched == expected_match
-        assert t.rec_amount == expected_amount
+        assert t.rec_amount == util.to_units(expected_amount)
         assert t.rec_status == expected_status
 
     def test_reconcile_not_a_transaction(self):
@@ -616,7 +758,7 @@ class ReconcilerParsing(Redirector):
             "checking$",
         )
         assert thing.rec_account_matched == "a: checking"
-        assert thing.rec_amount == 20
+        assert thing.rec_amount == util.to_units(20)
 
     def test_multiple_lines_for_same_account(self):
         self.verify_reconcile_vars(
@@ -764,11 +906,85 @@ def test_mixed_shares_and_non_shares_raises_exception_too():
     assert str(excinfo.value) == expected
 
 
+def test_account_matches_searches_each_account_once():
+    lines = [
+        "2018/01/08 blah",
+        "    a: checking  $10",
+        "    e: food",
+    ]
+    ledgerthing.account_matches_by_rec_account.pop("check", None)
+    account_matches = ledgerthing.get_account_matches("check")
+    assert ledgerthing.get_account_matches("check") is account_matches
+    with mock.patch.object(
+        account_matches, "search", wraps=account_matches.search
+    ) as mock_search:
+        things = [LedgerThing(lines, reconcile_account="check") for _ in range(3)]
+
+    assert [thing.rec_account_matched for thing in things] == ["a: checking"] * 3
+    assert sorted(call.args[0] for call in mock_search.call_args_list) == [
+        "a: checking",
+        "e: food",
+    ]
+    assert account_matches == {"a: checking": True, "e: food": False}
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("checking", "checking"),
+        ("checking$", "checking"),
+        ("^a: cash$", "a: cash"),
+        (r"a\.b", "a.b"),
+        ("a: ch.*ing", "a: ch"),
+        ("ab+cdef", "cdef"),
+        ("a: (?:savings|check)", "a: "),
+        ("savings|check", None),
+        ("cash|check", "c"),  # common prefix factored out by sre
+        ("(?i)cash", None),
+        ("", None),
+        (".*", None),
+    ],
+)
+def test_get_required_literal(test_input, expected):
+    assert get_required_literal(test_input) == expected
+
+
+def test_transaction_without_required_literal_is_not_parsed():
+    lines = [
+        "2018/01/08 blah",
+        "    a: checking  $10",
+        "    e: food",
+    ]
+    with mock.patch.object(LedgerThing, "parse_transaction_lines") as mock_parse:
+        thing = LedgerThing(lines, reconcile_account="savings$")
+        LedgerThing(lines, reconcile_account="check")
+        LedgerThing(lines, reconcile_account="sav|check")
+
+    assert mock_parse.call_count == 2
+    assert thing.rec_account_matched is None
+    assert thing.rec_amount == 0
+
+
+def test_required_literal_found_in_lines_that_cannot_be_joined():
+    lines = ["2018/01/08 blah", "    a: checking  $10", "    e: food\n"]
+    with mock.patch.object(LedgerThing, "parse_transaction_lines") as mock_parse:
+        LedgerThing(lines, reconcile_account="savings")
+        LedgerThing(lines, reconcile_account="check")
+
+    mock_parse.assert_called_once_with(lines[1:])
+
+
+def test_required_literal_only_on_top_line():
+    thing = LedgerThing(["2018/01/08 checking"], reconcile_account="checking")
+    assert thing.rec_account_matched is None
+    assert thing.rec_amount == 0
+
+
 def test_shares():
     lines = ["2018/01/08 blah", "    a: xyz  1.234 abc @ $10", "    a: abc"]
     thing = LedgerThing(lines, reconcile_account="xyz")
     assert thing.rec_is_shares is True
-    assert thing.rec_amount == 1.234
+    assert thing.rec_amount == util.to_units(1.234)
 
 
 def test_more_shares():
@@ -780,7 +996,7 @@ def test_more_shares():
     ]
     thing = LedgerThing(lines, reconcile_account="xyz")
     assert thing.rec_is_shares is True
-    assert thing.rec_amount == 1
+    assert thing.rec_amount == util.to_units(1)
 
 
 def test_even_more_shares():
@@ -793,7 +1009,7 @@ def test_even_more_shares():
     ]
     thing = LedgerThing(lines, reconcile_account="xyz")
     assert thing.rec_is_shares is True
-    assert thing.rec_amount == 7
+    assert thing.rec_amount == util.to_units(7)
 
 
 def test_mixed_symbols_raises_exception():
@@ -839,3 +1055,52 @@ def test_lines_is_different_than_get_lines_when_status_changes():
     assert thing.lines == lines
     assert thing.get_lines() == lines_with_status
     assert thing.lines != thing.get_lines()
+
+
+def test_lines_with_line_endings_kept_as_is():
+    lines = ["2018/01/08 blah\n", "    e: xyz\n", "    l: abc  $-10"]
+    thing = LedgerThing(lines)
+    assert thing.lines == lines
+    assert join_lines(lines) == tuple(lines)
+    assert join_lines(["a", "", "b"]) == "a\n\nb"
+
+
+def test_thing_date_stored_as_ordinal():
+    thing = LedgerThing(["2018/01/08 blah", "    e: xyz", "    l: abc  $-10"])
+    assert thing.date_ordinal == date(2018, 1, 8).toordinal()
+    thing.thing_date = date(2019, 2, 3)
+    assert thing.date_ordinal == date(2019, 2, 3).toordinal()
+    assert thing.get_lines()[0] == "2019/02/03 blah"
+    thing.thing_date = None
+    assert thing.thing_date is None
+
+
+def test_payees_are_interned():
+    payee = "".join(["zombie ", "investments"])  # not a constant
+    thing1 = LedgerThing([f"2018/01/08 {payee}", "    e: xyz", "    l: abc"])
+    thing2 = LedgerThing([f"2018/01/09 {payee}", "    e: xyz", "    l: abc"])
+    assert thing1.payee is thing2.payee
+
+
+def test_memory_per_transaction():
+    """A typical transaction should take about half what it did when
+    things had a __dict__ and a list of line strings (~600 bytes here)"""
+    count = 1000
+    tracemalloc.start()
+    try:
+        things = [
+            LedgerThing(
+                [
+                    f"2018/01/{i % 28 + 1:02} payee {i % 50}",
+                    f"    e: groceries: store {i % 3}",
+                    f"    l: credit card                  $-{i}.00",
+                ]
+            )
+            for i in range(count)
+        ]
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert not hasattr(things[0], "__dict__")
+    assert size / count < 400
@@ -27,6 +27,12 @@ def test_main_grid(mock_grid_main):
     mock_grid_main.assert_called_with(["-a", "blah"])
 
 
+@mock.patch("main.grid.main")
+def test_main_other_command_returns_error_code(mock_grid_main):
+    mock_grid_main.return_value = 1
+    assert main.main(["grid", "-a", "blah"]) == 1
+
+
 @mock.patch("main.investments.main")
 def test_main_investments_with_argv_none(mock_investments_main):
     with mock.patch("sys.argv", ["/script", "inv"]):
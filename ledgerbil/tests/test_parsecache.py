@@ -0,0 +1,292 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+import pytest
+
+from .. import ledgerfile  # noqa: F401 (is used in patch)
+from .. import parsecache, settings, settings_getter
+from ..ledgerbilexceptions import LdgReconcilerError
+from ..ledgerfile import LedgerFile
+from ..schedulefile import ScheduleFile
+from . import filetester as FT
+
+
+class MockSettings:
+    DATE_FORMAT = "%Y/%m/%d"
+    PARSE_CACHE_SIZE = 50 * 1024 * 1024
+
+
+def setup_function():
+    MockSettings.PARSE_CACHE_DIR = tempfile.mkdtemp()
+    settings_getter.settings = MockSettings()
+
+
+def teardown_function():
+    shutil.rmtree(MockSettings.PARSE_CACHE_DIR)
+    settings_getter.settings = settings.Settings()
+
+
+def get_cache_entries():
+    return sorted(os.listdir(MockSettings.PARSE_CACHE_DIR))
+
+
+def get_lines(lfile):
+    return [thing.get_lines() for thing in lfile.things]
+
+
+def test_cache_off_without_cache_dir():
+    class MockSettingsNoCache:
+        PARSE_CACHE_DIR = None
+
+    settings_getter.settings = MockSettingsNoCache()
+    assert parsecache.load_things(FT.testfile, None, None, b"") == ([], 0)
+    parsecache.save_things(FT.testfile, None, None, [])
+    LedgerFile(FT.testfile)
+    assert get_cache_entries() == []
+
+
+def test_warm_start_skips_parsing():
+    with FT.temp_file(FT.read_file(FT.testfile)) as templedgerfile:
+        cold = LedgerFile(templedgerfile)
+        assert len(get_cache_entries()) == 1
+
+        with mock.patch(__name__ + ".ledgerfile.LedgerFile.parse_lines") as mock_parse:
+            warm = LedgerFile(templedgerfile)
+
+    assert not mock_parse.called
+    assert get_lines(warm) == get_lines(cold)
+    assert [t.thing_number for t in warm.things] == [
+        t.thing_number for t in cold.things
+    ]
+
+
+def test_changed_file_is_reparsed():
+    with FT.temp_file(FT.read_file(FT.testfile)) as templedgerfile:
+        LedgerFile(templedgerfile)
+        with open(templedgerfile, "a", encoding="utf-8") as the_file:
+            the_file.write("2020/01/01 new payee\n    e: misc\n    a: cash  $-1\n")
+        lfile = LedgerFile(templedgerfile)
+        expected = get_lines(LedgerFile(templedgerfile))
+
+    assert lfile.things[-1].payee == "new payee"
+    assert get_lines(lfile) == expected
+
+
+def test_touched_file_with_same_content_is_reparsed():
+    with FT.temp_file(FT.read_file(FT.testfile)) as templedgerfile:
+        LedgerFile(templedgerfile)
+        stat = os.stat(templedgerfile)
+        os.utime(templedgerfile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        lfile, count = count_parsed_things(templedgerfile)
+
+    assert count == len(lfile.things)
+
+
+def test_empty_file_cached():
+    with FT.temp_file("") as templedgerfile:
+        LedgerFile(templedgerfile)
+        data, stamp = get_data_and_stamp(templedgerfile)
+        assert parsecache.load_things(templedgerfile, None, stamp, data) == ([], 0)
+
+
+def test_reconcile_account_cached_separately():
+    LedgerFile(FT.test_reconcile)
+    lfile = LedgerFile(FT.test_reconcile, "cash")
+    assert len(get_cache_entries()) == 2
+    assert lfile.rec_account_matched == "a: cash"
+    lfile = LedgerFile(FT.test_reconcile, "cash")
+    assert lfile.rec_account_matched == "a: cash"
+
+
+def test_cached_things_still_checked_for_multiple_matches():
+    with pytest.raises(LdgReconcilerError):
+        LedgerFile(FT.test_rec_multiple_match, "checking")
+    with pytest.raises(LdgReconcilerError):
+        LedgerFile(FT.test_rec_multiple_match, "checking")
+
+
+def get_data_and_stamp(filename):
+    with open(filename, "rb") as the_file:
+        data = the_file.read()
+    return data, parsecache.get_file_stamp(filename, data)
+
+
+def test_old_version_is_ignored():
+    LedgerFile(FT.testfile)
+    data, stamp = get_data_and_stamp(FT.testfile)
+    things, offset = parsecache.load_things(FT.testfile, None, stamp, data)
+    assert things
+    assert offset == len(data)
+    with mock.patch(__name__ + ".parsecache.CACHE_FORMAT", (-1,)):
+        assert parsecache.load_things(FT.testfile, None, stamp, data) == ([], 0)
+
+
+@mock.patch(__name__ + ".parsecache.print")
+def test_corrupt_cache_entry(mock_print):
+    data, stamp = get_data_and_stamp(FT.testfile)
+    cache_filename = parsecache.get_cache_filename(
+        MockSettings.PARSE_CACHE_DIR, FT.testfile, None
+    )
+    with open(cache_filename, "wb") as the_file:
+        the_file.write(b"not marshal data")
+    assert parsecache.load_things(FT.testfile, None, stamp, data) == ([], 0)
+    mock_print.assert_called_once_with(mock.ANY, file=sys.stderr)
+    assert mock_print.call_args[0][0].startswith("Error reading parse cache:")
+
+
+@mock.patch(__name__ + ".parsecache.print")
+def test_unwritable_cache_entry(mock_print):
+    _, stamp = get_data_and_stamp(FT.testfile)
+    with mock.patch(__name__ + ".parsecache.marshal.dumps") as mock_dump:
+        mock_dump.side_effect = ValueError("nope")
+        parsecache.save_things(FT.testfile, None, stamp, [])
+    mock_print.assert_called_once_with(
+        "Error writing parse cache: nope", file=sys.stderr
+    )
+    assert os.listdir(MockSettings.PARSE_CACHE_DIR) == []
+
+
+def test_least_recently_used_evicted():
+    cache_dir = MockSettings.PARSE_CACHE_DIR
+    LedgerFile(FT.testfile)
+    LedgerFile(FT.alpha_sortedfile)
+    first, second = (
+        parsecache.get_cache_filename(cache_dir, filename, None)
+        for filename in (FT.testfile, FT.alpha_sortedfile)
+    )
+    os.utime(first, ns=(0, 10**9))
+    os.utime(second, ns=(0, 2 * 10**9))
+    # using the first one makes it the most recently used
+    LedgerFile(FT.testfile)
+
+    with settings_getter.override_settings(PARSE_CACHE_SIZE=os.path.getsize(first) + 1):
+        LedgerFile(FT.alpha_unsortedfile)
+
+    remaining = get_cache_entries()
+    assert os.path.basename(second) not in remaining
+    assert len(remaining) == 1
+
+
+def test_evict_entries_removed_by_another_process():
+    """with --jobs, other processes may evict entries at the same time"""
+    cache_dir = MockSettings.PARSE_CACHE_DIR
+    for name in ("a", "b", "c"):
+        with open(os.path.join(cache_dir, name + parsecache.CACHE_SUFFIX), "w") as f:
+            f.write("x")
+    os.utime(os.path.join(cache_dir, "b" + parsecache.CACHE_SUFFIX), ns=(0, 0))
+    real_stat = os.stat
+
+    def stat(path):
+        if path.endswith("a" + parsecache.CACHE_SUFFIX):
+            raise FileNotFoundError(path)
+        return real_stat(path)
+
+    with mock.patch(__name__ + ".parsecache.os.stat", side_effect=stat):
+        with mock.patch(
+            __name__ + ".parsecache.os.remove", side_effect=FileNotFoundError
+        ) as mock_remove:
+            parsecache.evict(cache_dir, max_size=0)
+
+    assert mock_remove.call_args_list == [
+        mock.call(os.path.join(cache_dir, name + parsecache.CACHE_SUFFIX))
+        for name in ("b", "c")
+    ]
+
+
+def test_schedule_file_not_cached():
+    with FT.temp_file(";; scheduler ; enter 7 days\n") as tempschedulefile:
+        ScheduleFile(tempschedulefile)
+    assert get_cache_entries() == []
+
+
+def count_parsed_things(filename):
+    with mock.patch(
+        __name__ + ".ledgerfile.LedgerThing", wraps=ledgerfile.LedgerThing
+    ) as mock_thing:
+        lfile = LedgerFile(filename)
+    return lfile, mock_thing.call_count
+
+
+def append_to_file(filename, data):
+    with open(filename, "a", encoding="utf-8") as the_file:
+        the_file.write(data)
+
+
+def test_appended_file_only_parses_tail():
+    testdata = FT.read_file(FT.alpha_sortedfile)
+    with FT.temp_file(testdata) as templedgerfile:
+        lfile, count = count_parsed_things(templedgerfile)
+        things_before = len(lfile.things)
+        assert count == things_before
+
+        append_to_file(
+            templedgerfile,
+            "2020/01/01 new payee\n    e: misc\n    a: cash  $-1\n\n"
+            "2020/01/02 newer payee\n    e: misc\n    a: cash  $-2\n\n",
+        )
+        lfile, count = count_parsed_things(templedgerfile)
+        # the old last thing is reparsed along with the two new ones
+        assert count == 3
+        expected = LedgerFile(templedgerfile, stream=True).iter_things()
+        assert get_lines(lfile) == [thing.get_lines() for thing in expected]
+        assert [t.thing_number for t in lfile.things] == list(range(things_before + 2))
+
+        # and the spliced together things are saved for next time
+        lfile, count = count_parsed_things(templedgerfile)
+        assert count == 0
+        assert lfile.things[-1].payee == "newer payee"
+
+
+def test_appended_lines_can_belong_to_last_thing():
+    testdata = "; top\n\n2020/01/01 payee\n    e: misc  $1\n"
+    with FT.temp_file(testdata) as templedgerfile:
+        LedgerFile(templedgerfile)
+        append_to_file(templedgerfile, "    a: cash\n")
+        lfile, count = count_parsed_things(templedgerfile)
+
+    assert count == 1
+    assert get_lines(lfile) == [
+        ["; top"],
+        ["2020/01/01 payee", "    e: misc  $1", "    a: cash"],
+    ]
+
+
+def test_appended_file_without_transactions_parsed_in_full():
+    with FT.temp_file("; just\n; comments\n") as templedgerfile:
+        LedgerFile(templedgerfile)
+        append_to_file(templedgerfile, "; more\n")
+        lfile, count = count_parsed_things(templedgerfile)
+
+    assert count == 1
+    assert get_lines(lfile) == [["; just", "; comments", "; more"]]
+
+
+def test_changed_prefix_parsed_in_full():
+    testdata = FT.read_file(FT.alpha_sortedfile)
+    with FT.temp_file(testdata) as templedgerfile:
+        lfile, _ = count_parsed_things(templedgerfile)
+        things_before = len(lfile.things)
+        with open(templedgerfile, "w", encoding="utf-8") as the_file:
+            the_file.write("; new first line\n" + testdata)
+        lfile, count = count_parsed_things(templedgerfile)
+
+    assert count == things_before
+    assert lfile.things[0].get_lines()[0] == "; new first line"
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        (b"", 0),
+        (b"; no transactions\n", 0),
+        (b"2020/01/01 a\n", 0),
+        (b"; x\n2020/01/01 a\n    e: b\n", 4),
+        (b"; x\n2020/01/01 a\n2020/01/02 b\n    e: c\n\n", 17),
+        (b"; x\n2020/01/01 a\n2020/02/30 b\n    e: c", 4),
+    ],
+)
+def test_get_last_thing_offset(test_input, expected):
+    assert ledgerfile.get_last_thing_offset(test_input) == expected
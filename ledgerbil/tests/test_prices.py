@@ -0,0 +1,140 @@
+import os
+from datetime import date
+from textwrap import dedent
+
+import pytest
+
+from .. import settings, settings_getter
+from ..journal import Posting
+from ..ledgerbilexceptions import LdgJournalError
+from ..prices import PriceHistory, get_posting_price, get_price_history, read_prices
+from . import filetester as FT
+
+SAMPLE_PRICES_FILE = os.path.join(FT.path, "..", "..", "sample", "prices.db.ldg")
+
+
+class MockSettings:
+    PRICES_FILE = SAMPLE_PRICES_FILE
+
+
+class MockSettingsEmpty:
+    pass
+
+
+def setup_function():
+    settings_getter.settings = MockSettings()
+
+
+def teardown_function():
+    settings_getter.settings = settings.Settings()
+
+
+def ordinal(year, month, day):
+    return date(year, month, day).toordinal()
+
+
+def get_history():
+    return PriceHistory(
+        [
+            ("abc", ordinal(2018, 3, 1), 30),
+            ("abc", ordinal(2018, 1, 1), 10),
+            ("xyz", ordinal(2018, 1, 1), 100),
+            ("abc", ordinal(2018, 2, 1), 20),
+            ("abc", ordinal(2018, 2, 1), 25),  # same date: last one wins
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        (("abc", ordinal(2017, 12, 31)), None),
+        (("abc", ordinal(2018, 1, 1)), 10),
+        (("abc", ordinal(2018, 1, 31)), 10),
+        (("abc", ordinal(2018, 2, 1)), 25),
+        (("abc", ordinal(2019, 1, 1)), 30),
+        (("xyz", ordinal(2019, 1, 1)), 100),
+        (("nope", ordinal(2019, 1, 1)), None),
+    ],
+)
+def test_get_price(test_input, expected):
+    assert get_history().get_price(*test_input) == expected
+
+
+def test_get_prices():
+    dates = [ordinal(2017, 1, 1), ordinal(2018, 2, 15), ordinal(2018, 3, 1)]
+    assert get_history().get_prices("abc", dates) == [None, 25, 30]
+
+
+def test_contains():
+    history = get_history()
+    assert "abc" in history
+    assert "nope" not in history
+
+
+def test_get_value():
+    history = get_history()
+    shares = {"abc": 2000000, "xyz": 500000, "nope": 1000000}
+    assert history.get_value(shares, ordinal(2018, 2, 1)) == 50 + 50
+    assert history.get_value(shares, ordinal(2017, 1, 1)) == 0
+    assert history.get_values(shares, [ordinal(2018, 1, 1), ordinal(2018, 3, 1)]) == [
+        20 + 50,
+        60 + 50,
+    ]
+
+
+def test_read_prices():
+    data = dedent("""\
+        ; comment
+        P 2017/11/01 abcdx      $80
+        P 2017/11/02 12:30 lmnop  $ 1,020.50  ; comment
+        P 2017/11/03 12:30:01 abcdx $-1
+        P 2017/11/04 eur 1.1 usd
+        N abcdx
+    """)
+    with FT.temp_file(data) as filename:
+        assert read_prices(filename) == [
+            ("abcdx", ordinal(2017, 11, 1), 80000000),
+            ("lmnop", ordinal(2017, 11, 2), 1020500000),
+            ("abcdx", ordinal(2017, 11, 3), -1000000),
+        ]
+
+
+def test_read_prices_errors():
+    with FT.temp_file("P 2017/13/01 abcdx $80\n") as filename:
+        with pytest.raises(LdgJournalError) as excinfo:
+            read_prices(filename)
+    assert str(excinfo.value) == (
+        f"Invalid date in prices file {filename}, line 1: P 2017/13/01 abcdx $80"
+    )
+
+    with pytest.raises(LdgJournalError) as excinfo:
+        read_prices(os.path.join(FT.testdir, "nope.ldg"))
+    assert str(excinfo.value).startswith("Error reading prices file: ")
+
+
+def test_get_posting_price():
+    posting = Posting(0, "x", "a: ira", "", 141746350, 1745000, "abc")
+    assert get_posting_price(posting) == 81230000
+    posting = Posting(0, "x", "a: ira", "", -8306950, -103000, "abc")
+    assert get_posting_price(posting) == 80650000
+
+
+def test_get_price_history_from_settings_and_postings():
+    postings = [
+        Posting(ordinal(2017, 11, 3), "x", "a: ira", "", -8306950, -103000, "abcdx"),
+        Posting(ordinal(2017, 11, 4), "x", "a: ira", "", None, 1000000, "abcdx"),
+        Posting(ordinal(2017, 11, 5), "x", "a: cash", "", 1000000, None, None),
+    ]
+    history = get_price_history(postings)
+    assert history.get_prices(
+        "abcdx", [ordinal(2017, 11, 2), ordinal(2017, 11, 3), ordinal(2017, 11, 5)]
+    ) == [80000000, 80650000, 80650000]
+    assert history.get_price("yyzxx", ordinal(2017, 11, 1)) == 40000000
+
+
+def test_get_price_history_without_prices_file():
+    settings_getter.settings = MockSettingsEmpty()
+    assert get_price_history().dates == {}
+    history = get_price_history(filenames=[SAMPLE_PRICES_FILE])
+    assert sorted(history.dates) == ["abcdx", "lmnop", "qwrty", "yyzxx"]
@@ -7,11 +7,13 @@ from unittest import TestCase, mock
 import pytest
 from dateutil.relativedelta import relativedelta
 
-from .. import reconciler, settings, settings_getter, util
-from ..ledgerbilexceptions import LdgReconcilerError
+from .. import journal, reconciler, settings, settings_getter, util
+from ..journal import Posting
+from ..ledgerbilexceptions import LdgJournalError, LdgReconcilerError
 from ..ledgerfile import LedgerFile
 from ..reconciler import Reconciler, run_reconciler
 from . import filetester as FT
+from . import helpers
 from .helpers import OutputFileTesterStdout, Redirector
 
 next_week = util.get_date_string(date.today() + relativedelta(weeks=1))
@@ -59,6 +61,10 @@ class MockSettings:
         FT.delete_test_cache_file()
 
 
+class MockSettingsSample(helpers.MockSettingsSample, MockSettings):
+    pass
+
+
 def setup_function():
     # Notice that this is used in class set ups as well...
     settings_getter.settings = MockSettings()
@@ -450,8 +456,8 @@ def test_init_things():
         ledgerfile = LedgerFile(tempfilename, "cash")
         recon = Reconciler([ledgerfile])
 
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-32.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-32.12, util.from_units(recon.total_pending))
     payees = {thing.payee for thing in recon.open_transactions}
     # all open transactions, including the future:
     assert payees == ({"two", "two pt five", "three", "four"})
@@ -485,8 +491,8 @@ def test_list():
     payees = {thing.payee for k, thing in recon.current_listing.items()}
     # future items included only if pending ('three')
     assert payees == ({"two", "two pt five", "three"})
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-32.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-32.12, util.from_units(recon.total_pending))
 
 
 def test_list_shares():
@@ -520,8 +526,8 @@ def test_list_shares():
         recon = Reconciler([LedgerFile(tempfilename, "401k: big co")])
 
     recon.do_list("")
-    assert_equal_floats(3.901233, recon.total_cleared, decimals=6)
-    assert_equal_floats(3.222221, recon.total_pending, decimals=6)
+    assert_equal_floats(3.901233, util.from_units(recon.total_cleared), decimals=6)
+    assert_equal_floats(3.222221, util.from_units(recon.total_pending), decimals=6)
 
 
 def test_list_and_modify():
@@ -529,8 +535,8 @@ def test_list_and_modify():
     with FT.temp_file(testdata) as tempfilename:
         recon = Reconciler([LedgerFile(tempfilename, "cash")])
 
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-32.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-32.12, util.from_units(recon.total_pending))
     recon.do_list("")
     payees = {thing.payee for k, thing in recon.current_listing.items()}
     assert payees == ({"two", "two pt five", "three"})
@@ -541,8 +547,8 @@ def test_list_and_modify():
     # (also, the mark should have triggered a new listing...)
     payees = {thing.payee for k, thing in recon.current_listing.items()}
     assert payees == ({"two", "two pt five"})
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-2.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-2.12, util.from_units(recon.total_pending))
 
     # open transactions shouldn't change
     payees = {thing.payee for thing in recon.open_transactions}
@@ -554,51 +560,51 @@ def test_mark_and_unmark():
     with FT.temp_file(testdata) as tempfilename:
         recon = Reconciler([LedgerFile(tempfilename, "cash")])
 
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-32.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-32.12, util.from_units(recon.total_pending))
     recon.do_mark("1")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-52.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-52.12, util.from_units(recon.total_pending))
     recon.do_unmark("1 2")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-30, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-30, util.from_units(recon.total_pending))
     recon.do_mark("1 2")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-52.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-52.12, util.from_units(recon.total_pending))
     recon.do_unmark("2")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-50, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-50, util.from_units(recon.total_pending))
     recon.do_mark("1 2 blurg")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-52.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-52.12, util.from_units(recon.total_pending))
     recon.do_unmark("blarg 2")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-50, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-50, util.from_units(recon.total_pending))
     recon.do_unmark("1 sdjfkljsdfkljsdl 2")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-30, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-30, util.from_units(recon.total_pending))
     recon.default("1")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-50, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-50, util.from_units(recon.total_pending))
     recon.do_unmark("-20.")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-30, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-30, util.from_units(recon.total_pending))
     recon.do_mark("-20. 2")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-52.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-52.12, util.from_units(recon.total_pending))
 
     # entry with account on multiple lines
     with FT.temp_file(testdata) as tempfilename:
         recon = Reconciler([LedgerFile(tempfilename, "credit")])
 
-    assert_equal_floats(0, recon.total_cleared)
-    assert_equal_floats(0, recon.total_pending)
+    assert_equal_floats(0, util.from_units(recon.total_cleared))
+    assert_equal_floats(0, util.from_units(recon.total_pending))
     recon.do_mark("1")
-    assert_equal_floats(0, recon.total_cleared)
-    assert_equal_floats(-33, recon.total_pending)
+    assert_equal_floats(0, util.from_units(recon.total_cleared))
+    assert_equal_floats(-33, util.from_units(recon.total_pending))
     recon.do_unmark("1")
-    assert_equal_floats(0, recon.total_cleared)
-    assert_equal_floats(0, recon.total_pending)
+    assert_equal_floats(0, util.from_units(recon.total_cleared))
+    assert_equal_floats(0, util.from_units(recon.total_pending))
 
 
 def test_mark_and_unmark_all():
@@ -606,14 +612,14 @@ def test_mark_and_unmark_all():
     with FT.temp_file(testdata) as tempfilename:
         recon = Reconciler([LedgerFile(tempfilename, "cash")])
 
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-32.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-32.12, util.from_units(recon.total_pending))
     recon.do_unmark("all")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(0, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(0, util.from_units(recon.total_pending))
     recon.do_mark("all")
-    assert_equal_floats(-15, recon.total_cleared)
-    assert_equal_floats(-22.12, recon.total_pending)
+    assert_equal_floats(-15, util.from_units(recon.total_cleared))
+    assert_equal_floats(-22.12, util.from_units(recon.total_pending))
 
 
 def test_mark_and_unmark_multiple_amount_matches():
@@ -628,19 +634,19 @@ def test_mark_and_unmark_multiple_amount_matches():
     with FT.temp_file(testdata + multiple_matches) as tempfilename:
         recon = Reconciler([LedgerFile(tempfilename, "cash")])
 
-    assert_equal_floats(-32.12, recon.total_pending)
+    assert_equal_floats(-32.12, util.from_units(recon.total_pending))
     recon.do_mark("-20.")
-    assert_equal_floats(-52.12, recon.total_pending)
+    assert_equal_floats(-52.12, util.from_units(recon.total_pending))
     recon.do_mark("-20.")
-    assert_equal_floats(-72.12, recon.total_pending)
+    assert_equal_floats(-72.12, util.from_units(recon.total_pending))
     recon.do_unmark("-20.")
-    assert_equal_floats(-52.12, recon.total_pending)
+    assert_equal_floats(-52.12, util.from_units(recon.total_pending))
     recon.do_unmark("-20. 2")
-    assert_equal_floats(-30, recon.total_pending)
+    assert_equal_floats(-30, util.from_units(recon.total_pending))
     recon.do_mark("-20. 2 -20.")
-    assert_equal_floats(-72.12, recon.total_pending)
+    assert_equal_floats(-72.12, util.from_units(recon.total_pending))
     recon.do_unmark("-20. -20.")
-    assert_equal_floats(-32.12, recon.total_pending)
+    assert_equal_floats(-32.12, util.from_units(recon.total_pending))
 
 
 def test_finish_balancing_with_errors():
@@ -1114,14 +1120,14 @@ class ReloadTests(TestCase):
     def test_reload(self):
         with FT.temp_file(self.testdata) as tempfilename:
             recon = Reconciler([LedgerFile(tempfilename, "cash")])
-            assert recon.total_cleared == -20
+            assert recon.total_cleared == util.to_units(-20)
 
             with open(tempfilename, "w", encoding="utf-8") as the_file:
                 the_file.write(self.testdata_modified)
 
-            assert recon.total_cleared == -20
+            assert recon.total_cleared == util.to_units(-20)
             recon.do_reload("")
-            assert recon.total_cleared == -55
+            assert recon.total_cleared == util.to_units(-55)
 
 
 @mock.patch(__name__ + ".reconciler.Reconciler.cmdloop")
@@ -1301,39 +1307,38 @@ def test_get_accounts_reconciled_data(mock_get_cache):
     assert accounts == expected
 
 
-@mock.patch(__name__ + ".reconciler.get_ledger_output")
+@mock.patch(__name__ + ".reconciler.journal.get_postings")
 @mock.patch(__name__ + ".reconciler.reconciled_status_report")
 @mock.patch(__name__ + ".reconciler.get_accounts_reconciled_data")
-def test_reconciled_status(mock_get_accounts, mock_status_report, mock_ledger_output):
-    # 'x: y' account with a 0 previous balance tests where ledger won't return
-    # a balance line for it so that we need to check if the account is in the
-    # ledger_balances dictionary.
+def test_reconciled_status(mock_get_accounts, mock_status_report, mock_get_postings):
+    # 'x: y' account with a 0 previous balance tests where there is no
+    # cleared balance for it, so that it isn't in cleared balances
     accounts = {
         "fu: bar": reconciler.ReconData("f: bar", "1997/01/01", 10.0, 0),
         "abc: def": reconciler.ReconData("a: def", "2007/07/07", 15.0, 0),
         "x: y": reconciler.ReconData("x: y", "2012/09/09", 0.0, 0),
     }
     mock_get_accounts.return_value = accounts
-    mock_ledger_output.return_value = dedent("""\
-        1.234 abc  fu: bar
-        $ -98.76 abc: def""")
+    mock_get_postings.return_value = [
+        Posting(1, "x", "fu: bar", "*", None, 1234000, "abc"),
+        Posting(1, "x", "abc: def", "*", -98760000, None, None),
+        Posting(1, "x", "x: y", "", -5000000, None, None),
+    ]
 
     reconciler.reconciled_status()
 
-    mock_ledger_output.assert_called_once_with(
-        ("balance", "--cleared", "--no-total", "--flat", "--exchange", ".")
-    )
+    mock_get_postings.assert_called_once_with(may_match=journal.may_have_cleared)
 
     accounts["fu: bar"].ledger_balance = 1.234
     accounts["abc: def"].ledger_balance = -98.76
     mock_status_report.assert_called_once_with(accounts)
 
 
-@mock.patch(__name__ + ".reconciler.get_ledger_output")
+@mock.patch(__name__ + ".reconciler.get_cleared_balances")
 @mock.patch(__name__ + ".reconciler.print")
 @mock.patch(__name__ + ".reconciler.get_accounts_reconciled_data")
 def test_reconciled_status_no_previously_reconciled(
-    mock_get_accounts_reconciled_data, mock_print, mock_get_ledger_output
+    mock_get_accounts_reconciled_data, mock_print, mock_get_cleared_balances
 ):
     accounts = {"fu: bar": reconciler.ReconData("f: bar", "-", 0, 0)}
     mock_get_accounts_reconciled_data.return_value = accounts
@@ -1341,23 +1346,80 @@ def test_reconciled_status_no_previously_reconciled(
     reconciler.reconciled_status()
 
     mock_print.assert_called_once_with("No previously reconciled accounts found")
-    assert not mock_get_ledger_output.called
+    assert not mock_get_cleared_balances.called
 
 
 @mock.patch(__name__ + ".reconciler.reconciled_status_report")
-@mock.patch(__name__ + ".reconciler.get_ledger_output")
+@mock.patch(__name__ + ".reconciler.journal.get_postings")
 @mock.patch(__name__ + ".reconciler.get_accounts_reconciled_data")
 def test_reconciled_status_no_cleared_balance_for_previously_reconciled(
-    mock_get_accounts_reconciled_data, mock_get_ledger_output, mock_status_report
+    mock_get_accounts_reconciled_data, mock_get_postings, mock_status_report
 ):
     # This test covers the exceedingly unlikely event that we have a previous
-    # balance in reconciler cache, but no --cleared balances. We don't want to
+    # balance in reconciler cache, but no cleared balances. We don't want to
     # blow up accessing a None. We'll still accurately report a problem with
     # the balance in the report.
     accounts = {"fu: bar": reconciler.ReconData("f: bar", "1997/01/01", 10.0, 0.0)}
     mock_get_accounts_reconciled_data.return_value = accounts
-    mock_get_ledger_output.return_value = ""
+    mock_get_postings.return_value = []
 
     reconciler.reconciled_status()
 
     mock_status_report.assert_called_once_with(accounts)
+
+
+@mock.patch(__name__ + ".reconciler.journal.get_postings")
+@mock.patch(__name__ + ".reconciler.get_accounts_reconciled_data")
+def test_reconciled_status_journal_error(mock_get_accounts, mock_get_postings, capsys):
+    mock_get_accounts.return_value = {
+        "fu: bar": reconciler.ReconData("f: bar", "1997/01/01", 10.0, 0)
+    }
+    mock_get_postings.side_effect = LdgJournalError("Error reading ledger file: x")
+
+    assert reconciler.reconciled_status() == util.ERROR_RETURN_VALUE
+    assert capsys.readouterr().err == "Error reading ledger file: x\n"
+
+
+def test_get_cleared_balances():
+    testdata = dedent("""\
+        2018/01/01 * opening balances
+            a: cash         $100.004
+            a: ira          10.000 abcdx @ $20
+            a: 401k         5.000 lmnop @ $2
+            equity
+
+        2018/01/02 uncleared
+            a: cash         $-50
+          * a: ira          1.5 abcdx
+            e: other
+
+        2018/01/03 ! pending
+          * a: cash         $-20
+            a: ira          -2 abcdx
+            e: other
+
+        2018/01/04 * cleared to zero
+            a: checking     $10
+            a: checking     $-10
+            e: other
+    """)
+    accounts = {"a: cash": None, "a: ira": None, "a: checking": None}
+    with FT.temp_file(testdata) as filename:
+        postings = journal.get_postings([filename])
+    assert reconciler.get_cleared_balances(accounts, postings) == {
+        "a: cash": 80.0,
+        "a: ira": 11.5,
+    }
+
+
+def test_get_cleared_balances_from_settings_files():
+    settings_getter.settings = MockSettingsSample()
+    accounts = {
+        "assets: ira: glass idx": None,
+        "assets: 401k: big co 500 idx": None,
+        "assets: 401k: bonds idx": None,
+    }
+    assert reconciler.get_cleared_balances(accounts) == {
+        "assets: ira: glass idx": 15.0,
+        "assets: 401k: big co 500 idx": 1.745,
+    }
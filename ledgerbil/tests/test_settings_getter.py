@@ -63,3 +63,32 @@ def test_settings_more_defaulting():
 
     actual = settings_getter.get_setting("FUBAR", default="fubariffic")
     assert actual == "fubariffic"
+
+
+def test_get_settings_snapshot():
+    snapshot = settings_getter.get_settings()
+    assert snapshot.DATE_FORMAT == "%Y-%m-%d"
+    assert snapshot.DATE_FORMAT_MONTH == "%Y/%m"  # from defaults
+    assert settings_getter.get_settings() is snapshot
+
+
+def test_get_settings_snapshot_is_immutable():
+    with pytest.raises(AttributeError):
+        settings_getter.get_settings().DATE_FORMAT = "%Y"
+
+
+def test_get_settings_remade_when_settings_replaced():
+    snapshot = settings_getter.get_settings()
+    settings_getter.settings = MockSettingsEmpty()
+    assert settings_getter.get_settings() is not snapshot
+    assert settings_getter.get_settings().DATE_FORMAT == "%Y/%m/%d"
+
+
+def test_override_settings():
+    with settings_getter.override_settings(DATE_FORMAT="%Y", FUBAR="fubariffic"):
+        assert settings_getter.get_setting("DATE_FORMAT") == "%Y"
+        assert settings_getter.get_settings().FUBAR == "fubariffic"
+        assert settings_getter.get_setting("DATE_FORMAT_YEAR") == "%Y"
+
+    assert settings_getter.get_setting("DATE_FORMAT") == "%Y-%m-%d"
+    assert settings_getter.get_setting("FUBAR") is None
@@ -1,5 +1,5 @@
 import sys
-from datetime import date
+from datetime import date, datetime
 from unittest import mock
 
 import pytest
@@ -38,9 +38,31 @@ def test_eval_expr(test_input, expected):
     assert util.eval_expr(test_input) == expected
 
 
-def test_eval_expr_error():
+@pytest.mark.parametrize("test_input", ["a", "'a'", "True", "[1]"])
+def test_eval_expr_error(test_input):
     with pytest.raises(TypeError):
-        util.eval_expr("a")
+        util.eval_expr(test_input)
+
+
+def test_eval_expr_is_cached():
+    util.eval_expr.cache_clear()
+    assert util.eval_expr("126 + 63") == 189
+    assert util.eval_expr("126 + 63") == 189
+    assert util.eval_expr.cache_info().hits == 1
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("$1,241.67", 1_241_670_000),
+        ("-1241.67", -1_241_670_000),
+        ("($126 + $63)", 189_000_000),
+        ("$-2 * 4 / (3 + 1) - 5", -7_000_000),
+        ("12*1.07275", 12_873_000),
+    ],
+)
+def test_eval_amount(test_input, expected):
+    assert util.eval_amount(test_input) == expected
 
 
 def test_get_date_string():
@@ -72,9 +94,66 @@ def test_get_date_with_format():
     assert util.get_date("1999/12", "%Y/%m") == date(1999, 12, 1)
 
 
+@pytest.mark.parametrize(
+    "the_format, date_string",
+    [
+        ("%Y/%m/%d", "2016/10/26"),
+        ("%Y/%m/%d", "2016/1/5"),  # not fixed width, but strptime allows
+        ("%Y-%m-%d", "2016-01-05"),
+        ("%Y.%m.%d", "2016.01.05"),
+        ("%Y/%d/%m", "2016/26/10"),  # not handled by fixed width parser
+    ],
+)
+def test_date_parser_same_as_strptime(the_format, date_string):
+    expected = datetime.strptime(date_string, the_format).date()
+    assert util.get_date_parser(the_format)(date_string) == expected
+
+
+@pytest.mark.parametrize(
+    "date_string",
+    ["2016/02/30", "2016/1a/05", "2016-01-05", "2016/01/05 ", ""],
+)
+def test_date_parser_errors_same_as_strptime(date_string):
+    with pytest.raises(ValueError):
+        datetime.strptime(date_string, "%Y/%m/%d")
+    with pytest.raises(ValueError):
+        util.get_date_parser("%Y/%m/%d")(date_string)
+
+
+@pytest.mark.parametrize(
+    "the_format, expected",
+    [("%Y/%m/%d", "/"), ("%Y-%m-%d", "-"), ("%Y.%m.%d", "."), ("%Y/%d/%m", None)],
+)
+def test_get_date_separator(the_format, expected):
+    assert util.get_date_separator(the_format) == expected
+
+
+def test_date_parsers_are_reused():
+    assert util.get_date_parser("%Y/%m/%d") is util.get_date_parser("%Y/%m/%d")
+
+
+def test_get_date_is_memoized():
+    util.parse_date_string.cache_clear()
+    assert util.get_date("1999/12/03") == date(1999, 12, 3)
+    assert util.get_date("1999/12/03") == date(1999, 12, 3)
+    assert util.parse_date_string.cache_info().hits == 1
+
+
+def test_get_date_memoized_by_format():
+    assert util.get_date("1999/12/03") == date(1999, 12, 3)
+    settings_getter.settings = MockSettingsAltDateFormat()
+    with pytest.raises(ValueError):
+        util.get_date("1999/12/03")
+
+
 @pytest.mark.parametrize(
     "test_input, expected",
-    [("2016/10/26", True), ("2016/1/5", True), ("2016/5/5 10:23", False)],
+    [
+        ("2016/10/26", True),
+        ("2016/1/5", True),
+        ("2016/5/5 10:23", False),
+        ("2016/02/30", False),
+    ],
 )
 def test_is_valid_date(test_input, expected):
     assert util.is_valid_date(test_input) is expected
@@ -128,6 +207,62 @@ def test_get_float(test_input, expected):
     assert util.get_float(test_input) == expected
 
 
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("5", 5_000_000),
+        ("-5", -5_000_000),
+        ("$ -1,234.56", -1_234_560_000),
+        ("-.5", -500_000),
+        ("0.000001", 1),
+        ("1.0000005", 1_000_000),  # more decimals than we keep: half to even
+        ("1.0000015", 1_000_002),
+        ("1e3", 1_000_000_000),
+        ("12345678901.25", 12_345_678_901_250_000),  # too big to go by float
+    ],
+)
+def test_get_units(test_input, expected):
+    assert util.get_units(test_input) == expected
+
+
+@pytest.mark.parametrize("test_input", ["", "-", "abc", "1.2.3", "nan", "inf"])
+def test_get_units_error(test_input):
+    with pytest.raises(ValueError):
+        util.get_units(test_input)
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [("12.34", 12_340_000), ("-0.1", -100_000), ("(2 * 3)", None), ("1 2", None)],
+)
+def test_parse_units(test_input, expected):
+    assert util.parse_units(test_input) == expected
+
+
+def test_units_are_exact():
+    amounts = ["0.1", "0.2", "-0.3"] * 1000
+    assert sum(float(amount) for amount in amounts) != 0
+    assert sum(util.get_units(amount) for amount in amounts) == 0
+
+
+def test_units_round_trip():
+    assert util.from_units(util.to_units(-1234.56)) == -1234.56
+
+
+@pytest.mark.parametrize(
+    "units1, units2, expected",
+    [
+        (2_125_000, 10_000_000, 21_250_000),  # 2.125 * 10
+        (1_500_000, 1, 2),  # 0.0000015: half to even
+        (2_500_000, 1, 2),  # 0.0000025: half to even
+        (-1_500_000, 1, -2),
+        (3_000_000, -333_333, -999_999),
+    ],
+)
+def test_multiply_units(units1, units2, expected):
+    assert util.multiply_units(units1, units2) == expected
+
+
 @pytest.mark.parametrize(
     "test_input, expected",
     [
@@ -3,12 +3,23 @@ import operator as op
 import re
 import shlex
 import sys
-from datetime import datetime
-from functools import reduce
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache, reduce
 
 from .colorable import Colorable
 from .ledgerbilexceptions import ERROR_RETURN_VALUE, LdgReconcilerError
-from .settings_getter import get_setting
+from .settings_getter import get_settings
+
+# Amounts (dollars and shares alike) are kept as integer millionths:
+# exact, and quicker to add up and compare than floats or Decimals
+AMOUNT_DECIMALS = 6
+AMOUNT_SCALE = 10**AMOUNT_DECIMALS
+MAX_FLOAT_AMOUNT = 10**9
+
+EXPR_CACHE_SIZE = 256  # amount expressions, e.g. ($126 + $63)
+DATE_CACHE_SIZE = 4096  # journals repeat the same dates over and over
+FIXED_WIDTH_DATE_FORMAT_REGEX = re.compile(r"^%Y([-/.])%m\1%d$")
 
 # supported operators
 operators = {
@@ -24,13 +35,15 @@ operators = {
 
 
 # eval_expr / _eval from: http://stackoverflow.com/a/9558001/2374860
+# (results are cached: the same expressions tend to turn up repeatedly)
+@lru_cache(maxsize=EXPR_CACHE_SIZE)
 def eval_expr(expr):
     return _eval(ast.parse(expr, mode="eval").body)
 
 
 def _eval(node):
-    if isinstance(node, ast.Num):  # <number> e.g. 1 or -1
-        return node.n
+    if isinstance(node, ast.Constant) and is_number(node.value):  # e.g. 1
+        return node.value
     elif isinstance(node, ast.BinOp):  # <left> <operator> <right>
         return operators[type(node.op)](_eval(node.left), _eval(node.right))
     elif isinstance(node, ast.UnaryOp):  # <operator> <operand> e.g., ~1
@@ -41,14 +54,53 @@ def _eval(node):
 
 def get_date_string(the_date, the_format=None):
     if not the_format:
-        the_format = get_setting("DATE_FORMAT")
+        the_format = get_settings().DATE_FORMAT
     return the_date.strftime(the_format)
 
 
 def get_date(date_string, the_format=None):
     if not the_format:
-        the_format = get_setting("DATE_FORMAT")
-    return datetime.strptime(date_string, the_format).date()
+        the_format = get_settings().DATE_FORMAT
+    return parse_date_string(date_string, the_format)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date_string(date_string, the_format):
+    return get_date_parser(the_format)(date_string)
+
+
+@lru_cache(maxsize=None)
+def get_date_parser(the_format):
+    """Compile a date format into a function of a date string that
+    works like strptime, but faster for YYYY/MM/DD style formats"""
+    separator = get_date_separator(the_format)
+    if separator is None:
+        return lambda date_string: datetime.strptime(date_string, the_format).date()
+
+    def parse_fixed_width_date(date_string):
+        # Slice the numbers out of fixed positions, leaving anything
+        # else (e.g. 2016/1/5, which strptime allows) to strptime
+        if (
+            len(date_string) == 10
+            and date_string[4] == separator
+            and date_string[7] == separator
+            and date_string.isascii()
+        ):
+            year, month, day = date_string[:4], date_string[5:7], date_string[8:]
+            if year.isdigit() and month.isdigit() and day.isdigit():
+                return date(int(year), int(month), int(day))
+
+        return datetime.strptime(date_string, the_format).date()
+
+    return parse_fixed_width_date
+
+
+@lru_cache(maxsize=None)
+def get_date_separator(the_format):
+    """The separator for YYYY/MM/DD style (fixed width) formats, e.g. "/",
+    or None for other formats"""
+    m = FIXED_WIDTH_DATE_FORMAT_REGEX.match(the_format)
+    return m.group(1) if m else None
 
 
 def is_valid_date(date_string):
@@ -78,6 +130,67 @@ def get_float(value):
     return float(re.sub(r"[ $,]", "", value))
 
 
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def eval_amount(expr):
+    """Integer units for a posting amount, e.g. $1,241.67 or ($126 + $63)"""
+    number = expr.replace("$", "").replace(",", "")
+    # plain numbers are the usual thing and don't need evaluating
+    units = parse_units(number)
+    if units is None:
+        units = to_units(eval_expr(number))
+    return units
+
+
+def get_units(value):
+    """Like get_float, but in exact integer units of AMOUNT_SCALE"""
+    number = re.sub(r"[ $,]", "", value)
+    units = parse_units(number)
+    if units is not None:
+        return units
+
+    # e.g. 1e3, or more decimals than we keep
+    try:
+        return int(Decimal(number).scaleb(AMOUNT_DECIMALS).to_integral_value())
+    except (ArithmeticError, ValueError) as e:  # e.g. InvalidOperation, NaN
+        raise ValueError(f"could not convert string to amount: {value!r}") from e
+
+
+def parse_units(number):
+    """Integer units for a plain decimal number like -12.34, else None"""
+    try:
+        value = float(number)
+    except ValueError:
+        return None
+
+    # Going through a float is exact for up to AMOUNT_DECIMALS decimals
+    # and amounts well short of 2**53 units, and faster than the rest
+    dot = number.find(".")
+    if dot >= 0 and len(number) - dot - 1 > AMOUNT_DECIMALS:
+        return None
+    if not abs(value) < MAX_FLOAT_AMOUNT:
+        return None
+    return round(value * AMOUNT_SCALE)
+
+
+def to_units(number):
+    return round(number * AMOUNT_SCALE)
+
+
+def from_units(units):
+    return units / AMOUNT_SCALE
+
+
+def multiply_units(units1, units2):
+    """Product of two amounts in units, rounded half to even"""
+    quotient, remainder = divmod(units1 * units2, AMOUNT_SCALE)
+    if remainder * 2 > AMOUNT_SCALE or (remainder * 2 == AMOUNT_SCALE and quotient % 2):
+        quotient += 1
+    return quotient
+
+
 def get_start_and_end_range(numbers):
     int_nums = [int(num) for num in numbers]
     return min(int_nums), max(int_nums) + 1
@@ -23,7 +23,7 @@ def main(argv=None):
     if command not in other:
         return ledgerbil.main(argv)
     else:
-        other[command].main(argv[1:])
+        return other[command].main(argv[1:])
 
 
 if __name__ == "__main__":